@@ -1,17 +1,99 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
+import json
+from typing import Any, AsyncIterator, Iterable, List
 import logging
 
 from app.models.portfolio import (
-    PortfolioRequest, PortfolioAnalysis, HealthCheckResponse
+    PortfolioRequest, PortfolioAnalysis, HealthCheckResponse,
+    BatchPortfolioRequest, BatchAnalysisItem, InsightJobResponse, WhatIfRequest,
+    BacktestRequest, BacktestResult, MonteCarloRequest, MonteCarloResult, SymbolMatch, StockHolding
 )
-from app.services.portfolio_analyzer import PortfolioAnalyzer
+from app.core.metrics import registry
+from app.services.admission import Overloaded, admission
+from app.services.backtest import run_backtest
+from app.services.correlation import correlation_cache
+from app.services.fetch_engine import fetch_engine
+from app.services.insight_jobs import insight_jobs
+from app.services.monte_carlo import run_simulation
+from app.services.portfolio_analyzer import get_portfolio_analyzer
+from app.services.price_store import price_store
+from app.services.refresh_ahead import refresh_scheduler
+from app.services.shared_cache import shared_market_cache
+from app.services.stock_data_service import StockDataService
+from app.services.symbol_universe import symbol_universe
+from app.services.warmup import warm_up
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-analyzer = PortfolioAnalyzer()
+
+
+def _insight_cache_stats():
+    # Scrapes during warm-up must not build the analyzer on the event loop
+    return get_portfolio_analyzer().llm_service.cache_stats() if warm_up.ready else None
+
+
+def _hedge_stats():
+    # Same guard as _insight_cache_stats
+    return get_portfolio_analyzer().llm_service.hedge_stats() if warm_up.ready else None
+
+
+def _check_symbols(holdings: Iterable[StockHolding]):
+    """Reject holdings missing from the symbol universe with a 422, before any upstream call"""
+    try:
+        symbol_universe.check(holding.symbol for holding in holdings)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+
+def _shed(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def _admitted(items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Run a streamed analysis up to its first item before the response starts.
+
+    Admission happens before the first item, so a shed request raises Overloaded
+    here and can still get a 503. Any other error is raised again from the
+    returned iterator, where the stream reports it.
+    """
+    first: List[Any] = []
+    error = None
+    try:
+        first.append(await items.__anext__())
+    except Overloaded:
+        raise
+    except StopAsyncIteration:
+        pass
+    except Exception as e:
+        error = e
+
+    async def replay() -> AsyncIterator[Any]:
+        if error is not None:
+            raise error
+        for item in first:
+            yield item
+        async for item in items:
+            yield item
+
+    return replay()
+
+
+registry.register_cache("stock_info", StockDataService.cache_stats)
+registry.register_cache("shared", shared_market_cache.stats)
+registry.register_cache("correlation", correlation_cache.stats)
+registry.register_cache("price_downloads", price_store.downloads.stats)
+registry.register_cache("insights", _insight_cache_stats)
 
 
 @router.get("/health", response_model=HealthCheckResponse)
@@ -24,6 +106,31 @@ async def health_check():
     )
 
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has loaded heavy libraries and clients"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warm_up.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=warm_up.status()
+    )
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Cache counters for sizing the stock info and insight caches"""
+    return {
+        "stock_info": StockDataService.cache_stats(),
+        "shared": shared_market_cache.stats(),
+        "correlation": correlation_cache.stats(),
+        "insights": _insight_cache_stats(),
+        "refresh_ahead": refresh_scheduler.stats(),
+        "price_downloads": price_store.downloads.stats(),
+        "rate_limits": fetch_engine.rate_limit_stats(),
+        "llm_hedging": _hedge_stats(),
+        "admission": admission.stats(),
+    }
+
+
 @router.post("/analyze", response_model=PortfolioAnalysis)
 async def analyze_portfolio(portfolio: PortfolioRequest):
     """
@@ -37,14 +144,17 @@ async def analyze_portfolio(portfolio: PortfolioRequest):
     - AI-powered insights
     - Actionable recommendations
     """
+    _check_symbols(portfolio.holdings)
     try:
         logger.info(f"Analyzing portfolio with {len(portfolio.holdings)} holdings")
 
-        analysis = await analyzer.analyze_portfolio(portfolio)
+        analysis = await get_portfolio_analyzer().analyze_portfolio(portfolio)
 
         logger.info(f"Portfolio analysis completed: {analysis.request_id}")
         return analysis
 
+    except Overloaded as e:
+        raise _shed(e)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
@@ -59,6 +169,219 @@ async def analyze_portfolio(portfolio: PortfolioRequest):
         )
 
 
+@router.post("/analyze/stream")
+async def analyze_portfolio_stream(portfolio: PortfolioRequest):
+    """
+    Analyze a portfolio, streaming results as Server-Sent Events
+
+    Events are sent in this order as soon as each part is ready:
+    - summary: request id, portfolio summary and stock details
+    - sector_breakdown
+    - risk_metrics
+    - recommendations: diversification analysis and recommendations
+    - ai_insights: one event per chunk of generated text
+    - done
+    An error event is sent instead if the analysis fails part way. A request shed
+    by admission control gets a 503 with Retry-After, as for /analyze.
+    """
+    _check_symbols(portfolio.holdings)
+    logger.info(f"Streaming analysis of portfolio with {len(portfolio.holdings)} holdings")
+    try:
+        events = await _admitted(get_portfolio_analyzer().stream_analysis(portfolio))
+    except Overloaded as e:
+        raise _shed(e)
+
+    async def stream_events():
+        try:
+            async for event, payload in events:
+                yield f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming portfolio analysis: {str(e)}")
+            error = {"detail": "An error occurred while analyzing the portfolio"}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/analyze/{request_id}/whatif", response_model=PortfolioAnalysis)
+async def analyze_what_if(request_id: str, changes: WhatIfRequest):
+    """
+    Re-analyze an earlier analysis with changed allocations
+
+    Reuses the stock details and price history of the analysis identified by
+    request_id (from /analyze or /analyze/stream), so nothing is refetched and
+    volatility is updated incrementally for the holdings that moved. AI insights
+    are only regenerated when include_ai_insights is set; otherwise the
+    rule-based insights are returned. Earlier analyses are kept in memory on the
+    replica that served them for WHATIF_SESSION_TTL seconds after their last use.
+    """
+    try:
+        analysis = await get_portfolio_analyzer().what_if(request_id, changes)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analysis {request_id} not found or expired"
+        )
+    return analysis
+
+
+@router.post("/analyze/batch")
+async def analyze_portfolio_batch(batch: BatchPortfolioRequest):
+    """
+    Analyze many portfolios in one request
+
+    Stock data and price history are fetched once for the union of all symbols
+    and volatility is computed for every portfolio from one covariance matrix.
+    Results stream back as NDJSON, one line per portfolio in completion order,
+    each tagged with the portfolio's index in the request. The batch is admitted
+    as one request; if it is shed the response is a 503 with Retry-After.
+    """
+    if len(batch.portfolios) > settings.BATCH_MAX_PORTFOLIOS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch may contain at most {settings.BATCH_MAX_PORTFOLIOS} portfolios"
+        )
+    _check_symbols(holding for portfolio in batch.portfolios for holding in portfolio.holdings)
+
+    logger.info(f"Analyzing batch of {len(batch.portfolios)} portfolios")
+    try:
+        results = await _admitted(get_portfolio_analyzer().analyze_batch(batch.portfolios))
+    except Overloaded as e:
+        raise _shed(e)
+
+    async def stream_results():
+        async for index, result in results:
+            if isinstance(result, Exception):
+                item = BatchAnalysisItem(
+                    index=index, error="An error occurred while analyzing the portfolio"
+                )
+            else:
+                item = BatchAnalysisItem(index=index, analysis=result)
+            yield item.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.post("/backtest", response_model=BacktestResult)
+async def backtest_portfolio(request: BacktestRequest):
+    """
+    Backtest an allocation over historical daily closes
+
+    Buys the allocation at the first close of the range and either holds it or
+    rebalances back to it monthly, quarterly, or whenever a weight drifts more
+    than drift_threshold points. Returns the equity curve, drawdowns, CAGR,
+    volatility and turnover. History is limited to what the price store holds
+    (PRICE_STORE_HISTORY_PERIOD back from when a symbol was first stored); a
+    shorter range is flagged truncated, or rejected when require_full_range is set.
+    """
+    _check_symbols(request.holdings)
+    try:
+        logger.info(
+            f"Backtesting portfolio with {len(request.holdings)} holdings, rebalance={request.rebalance}"
+        )
+        return await run_backtest(request)
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error backtesting portfolio: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while backtesting the portfolio"
+        )
+
+
+@router.post("/simulate", response_model=MonteCarloResult)
+async def simulate_portfolio(request: MonteCarloRequest):
+    """
+    Monte Carlo forward simulation of an allocation
+
+    Draws correlated daily log returns from the holdings' last year of history
+    (through a Cholesky factor of their covariance), holds the allocation for
+    horizon_days, and returns percentile wealth bands and the probability of
+    loss. The same seed reproduces the same result; large path counts are
+    spread across worker processes.
+    """
+    _check_symbols(request.holdings)
+    if request.paths > settings.MONTE_CARLO_MAX_PATHS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A simulation may use at most {settings.MONTE_CARLO_MAX_PATHS} paths"
+        )
+
+    try:
+        logger.info(
+            f"Simulating portfolio with {len(request.holdings)} holdings, "
+            f"{request.paths} paths over {request.horizon_days} days"
+        )
+        return await run_simulation(request)
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error simulating portfolio: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while simulating the portfolio"
+        )
+
+
+@router.get("/insights/{job_id}", response_model=InsightJobResponse)
+async def get_insight_job(job_id: str):
+    """
+    Fetch an AI insight that missed the /analyze latency budget
+
+    Poll until status is complete (or failed, in which case ai_insights holds
+    the fallback text). Jobs are kept in memory on the replica that served the
+    original request and expire after LLM_JOB_TTL seconds.
+    """
+    job = insight_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Insight job {job_id} not found or expired"
+        )
+    return InsightJobResponse(**job)
+
+
+@router.get("/symbols", response_model=List[SymbolMatch])
+async def search_symbols(
+    prefix: str = Query(..., min_length=1, max_length=32, description="Start of a ticker or company name"),
+    limit: int = Query(settings.SYMBOL_SEARCH_MAX_RESULTS, ge=1, le=100)
+):
+    """
+    Autocomplete ticker symbols from the local symbol universe
+
+    Symbols starting with the prefix come first, then symbols whose company
+    name starts with it. Returns 503 when no universe file is configured.
+    """
+    if not symbol_universe.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Symbol universe not loaded; create {settings.SYMBOL_UNIVERSE_FILE}"
+        )
+    return [
+        SymbolMatch(symbol=symbol, name=name, exchange=exchange)
+        for symbol, name, exchange in symbol_universe.search(prefix, limit)
+    ]
+
+
 @router.get("/")
 async def root():
     """Root endpoint"""
@@ -23,13 +23,183 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "anthropic"
     LLM_MODEL: str = "claude-3-5-sonnet-20241022"
 
+    # LLM Prompt Settings: token budget for the portfolio data after the fixed instructions
+    LLM_PROMPT_TOKEN_BUDGET: int = 1500
+    LLM_PROMPT_CACHE_ENABLED: bool = True
+    # Smallest instruction prefix worth marking for caching; 0 uses the model's own minimum
+    # (1024 tokens, 2048 or more for some Haiku and newer models)
+    LLM_PROMPT_CACHE_MIN_TOKENS: int = 0
+
+    # LLM Hedging Settings: also ask LLM_HEDGE_PROVIDER when the primary is slower than
+    # LLM_HEDGE_PERCENTILE of its recent calls (empty provider disables hedging)
+    LLM_HEDGE_PROVIDER: str = ""
+    LLM_HEDGE_MODEL: str = ""
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_INITIAL_DELAY: float = 2.0
+    LLM_HEDGE_MIN_DELAY: float = 0.25
+    LLM_HEDGE_WINDOW: int = 200
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+
+    # LLM Insight Cache Settings
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: float = 3600.0
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    LLM_CACHE_ALLOCATION_PRECISION: float = 1.0
+    LLM_CACHE_DIR: str = ""
+    # Size of the on-disk insight cache past which the oldest entries are pruned
+    LLM_CACHE_DISK_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # LLM Latency Budget Settings (0 disables the budget)
+    LLM_LATENCY_BUDGET: float = 8.0
+    LLM_JOB_TTL: float = 900.0
+    LLM_JOB_MAX_ENTRIES: int = 5000
+
     # Stock Data API
+    # Comma-separated providers in fallback order: yfinance, alpha_vantage, fixture
+    MARKET_DATA_PROVIDERS: str = "yfinance"
     ALPHA_VANTAGE_API_KEY: str = ""
+    ALPHA_VANTAGE_BASE_URL: str = "https://www.alphavantage.co/query"
+    ALPHA_VANTAGE_MAX_CONNECTIONS: int = 10
+    ALPHA_VANTAGE_BULK_QUOTES: bool = False
+    MARKET_DATA_FIXTURE_DIR: str = "fixtures/market_data"
+    MARKET_DATA_FIXTURE_LATENCY: float = 0.0
+
+    # Symbol Universe Settings
+    # CSV of symbol,name,exchange (build it with `python -m app.services.symbol_universe`);
+    # when the file exists, US-style or malformed holdings missing from it are rejected
+    # before any upstream call; with SYMBOL_UNIVERSE_STRICT, so are other markets' tickers
+    SYMBOL_UNIVERSE_FILE: str = "data/symbols.csv"
+    SYMBOL_UNIVERSE_STRICT: bool = False
+    SYMBOL_SEARCH_MAX_RESULTS: int = 20
+
+    # Upstream Fetch Settings
+    FETCH_MAX_WORKERS: int = 16
+    FETCH_CONCURRENCY_PER_UPSTREAM: int = 8
+    FETCH_SYMBOL_TIMEOUT: float = 10.0
+    # Calls per second per upstream (0 disables); throttling halves the rate and
+    # pauses for a doubling backoff, and successful calls restore it gradually
+    FETCH_RATE_LIMIT: float = 50.0
+    FETCH_RATE_LIMIT_BURST: int = 100
+    FETCH_RATE_LIMIT_MAX_WAIT: float = 10.0
+    FETCH_BACKOFF_MAX: float = 60.0
+
+    # Stock Info Cache Settings (TTLs in seconds)
+    STOCK_CACHE_MAX_SYMBOLS: int = 2000
+    STOCK_CACHE_TTL_PRICE: float = 60.0
+    STOCK_CACHE_TTL_FUNDAMENTALS: float = 21600.0
+    STOCK_CACHE_TTL_PROFILE: float = 604800.0
+    # Keep stock info in one shared-memory table for all uvicorn workers on the host
+    # instead of a cache per worker; SHARED_TABLE_PATH defaults to /dev/shm
+    SHARED_TABLE_ENABLED: bool = False
+    SHARED_TABLE_PATH: str = ""
+
+    # Shared Cache Settings
+    # Stores stock info snapshots and daily bars in DATABASE_URL so replicas share
+    # upstream fetches; DATABASE_URL may also be sqlite:///path/to/file.db
+    SHARED_CACHE_ENABLED: bool = False
+    SHARED_CACHE_TIMEOUT: float = 2.0
+    # Writes run in the background, so they get longer for large backfills
+    SHARED_CACHE_WRITE_TIMEOUT: float = 30.0
+    SHARED_CACHE_POOL_SIZE: int = 5
+    SHARED_CACHE_MAX_OVERFLOW: int = 10
+
+    # Refresh-Ahead Settings
+    # Hottest symbols are refreshed this many seconds before their cached data expires
+    REFRESH_AHEAD_ENABLED: bool = True
+    REFRESH_AHEAD_TOP_N: int = 200
+    REFRESH_AHEAD_INTERVAL: float = 5.0
+    REFRESH_AHEAD_LEAD_TIME: float = 15.0
+    REFRESH_AHEAD_MAX_SYMBOLS_PER_MINUTE: int = 120
+    # Comma-separated tickers prefetched at startup and always kept warm
+    REFRESH_AHEAD_SEED_SYMBOLS: str = ""
+
+    # Price History Store Settings
+    PRICE_STORE_DIR: str = "data/prices"
+    PRICE_STORE_HISTORY_PERIOD: str = "2y"
+    PRICE_STORE_DOWNLOAD_TIMEOUT: float = 30.0
+    # Concurrent requests' missing symbols are merged into one download per window (ms)
+    PRICE_DOWNLOAD_BATCH_WINDOW_MS: float = 15.0
+    PRICE_DOWNLOAD_BATCH_MAX_SYMBOLS: int = 500
+
+    # Risk Engine Settings
+    RISK_VAR_CONFIDENCE: float = 0.95
+    RISK_FREE_RATE: float = 0.04
+    # Holdings with fewer days of history than this share of the longest are left out of
+    # the risk model (and listed in excluded_holdings) instead of shortening every window
+    RISK_MIN_HISTORY_COVERAGE: float = 0.8
+
+    # Correlation Cluster Settings
+    # Holdings whose returns average at least this correlation count as one cluster
+    CLUSTER_CORRELATION_THRESHOLD: float = 0.7
+    CORRELATION_CACHE_MAX_SYMBOLS: int = 2000
+    # Symbol sets whose cluster labels are kept until the correlation matrix is rebuilt
+    CORRELATION_CLUSTER_CACHE_SIZE: int = 1024
+
+    # Optimizer Settings
+    # Target behind the rebalancing recommendations: min_variance, max_sharpe,
+    # risk_parity, hhi_capped, or none to skip optimization
+    OPTIMIZER_OBJECTIVE: str = "min_variance"
+    # Caps in percent, raised automatically when a portfolio is too small to meet them
+    OPTIMIZER_MAX_WEIGHT: float = 25.0
+    OPTIMIZER_MAX_SECTOR_WEIGHT: float = 40.0
+    OPTIMIZER_HHI_CAP: float = 0.10
+    # Moves smaller than this many percentage points are not recommended
+    OPTIMIZER_MIN_TRADE: float = 0.5
+
+    # Monte Carlo Settings
+    MONTE_CARLO_MAX_PATHS: int = 1_000_000
+    # Checkpoints reported along the horizon (paths are drawn only at these days)
+    MONTE_CARLO_MAX_STEPS: int = 24
+    # Worker processes for large simulations (0 = one per CPU allowed by the cgroup
+    # quota, at most MONTE_CARLO_MAX_WORKERS; each worker takes about 90MB)
+    MONTE_CARLO_WORKERS: int = 0
+    MONTE_CARLO_MAX_WORKERS: int = 4
+    # Smaller simulations run in a thread instead of on the process pool
+    MONTE_CARLO_POOL_MIN_PATHS: int = 100_000
+
+    # What-If Settings
+    # Earlier analyses kept in memory for POST /analyze/{request_id}/whatif
+    WHATIF_SESSION_TTL: float = 1800.0
+    WHATIF_MAX_SESSIONS: int = 1000
+    WHATIF_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Startup Settings
+    # Load heavy libraries and clients in a background task at startup and report
+    # ready only once done; when False they load on first use
+    STARTUP_WARMUP: bool = True
+
+    # Admission Control Settings: concurrent requests per /analyze stage, then up to
+    # ADMISSION_QUEUE_SIZE waiting per stage for ADMISSION_QUEUE_TIMEOUT seconds
+    # before a 503 with Retry-After
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_DATA_LIMIT: int = 32
+    ADMISSION_COMPUTE_LIMIT: int = 4
+    ADMISSION_LLM_LIMIT: int = 16
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0
+    ADMISSION_RETRY_AFTER_MAX: int = 30
+
+    # Batch Analysis Settings
+    BATCH_MAX_PORTFOLIOS: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8
 
     @property
     def cors_origins(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def market_data_providers(self) -> List[str]:
+        return [name.strip() for name in self.MARKET_DATA_PROVIDERS.split(",") if name.strip()]
+
+    @property
+    def refresh_ahead_seed_symbols(self) -> List[str]:
+        return [
+            symbol.strip().upper()
+            for symbol in self.REFRESH_AHEAD_SEED_SYMBOLS.split(",")
+            if symbol.strip()
+        ]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
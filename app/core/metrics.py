@@ -0,0 +1,282 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) spanning cache hits through slow LLM calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down per label set"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        lines = self.header()
+        bucket_labels = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_labels, key + (le,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and scrape-time collectors, and renders the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._caches: Dict[str, Callable[[], Dict]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, stats: Callable[[], Optional[Dict]]):
+        """Export a cache's ``stats()`` counters (hits, misses, evictions, ...) at scrape time"""
+        self._caches[name] = stats
+
+    def _render_caches(self) -> List[str]:
+        events = Counter("cache_events_total", "Cache lookups and evictions by outcome", ("cache", "event"))
+        entries = Gauge("cache_entries", "Entries currently held by the cache", ("cache",))
+        for name, stats_fn in self._caches.items():
+            stats = stats_fn()
+            if not stats:
+                continue
+            for event in (
+                "hits", "misses", "evictions", "expirations", "disk_hits",
+                "upstream_calls", "shared_calls",
+            ):
+                if event in stats:
+                    events.inc(stats[event], cache=name, event=event)
+            entries.set(stats.get("size", 0), cache=name)
+        return events.render() + entries.render()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._render_caches())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+stage_duration = registry.register(Histogram(
+    "analysis_stage_duration_seconds", "Time spent in each portfolio analysis stage", ("stage",)
+))
+upstream_duration = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Market data upstream call latency",
+    ("provider", "operation")
+))
+upstream_requests = registry.register(Counter(
+    "upstream_requests_total", "Market data upstream calls by outcome",
+    ("provider", "operation", "outcome")
+))
+upstream_symbols = registry.register(Histogram(
+    "upstream_request_symbols", "Symbols requested per market data upstream call",
+    ("provider", "operation"), buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+))
+upstream_throttles = registry.register(Counter(
+    "upstream_throttled_total",
+    "Upstream calls rejected for rate limiting, by the upstream or by the local limiter",
+    ("upstream", "source")
+))
+upstream_rate_limit = registry.register(Gauge(
+    "upstream_rate_limit", "Adaptive upstream call rate after throttling (calls/second)", ("upstream",)
+))
+llm_prompt_tokens = registry.register(Histogram(
+    "llm_prompt_tokens", "LLM prompt size: estimated before sending, input and cache_read as reported",
+    ("kind",), buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+))
+llm_requests = registry.register(Counter(
+    "llm_requests_total", "Hedged LLM calls by provider and outcome (won, lost, failed)",
+    ("provider", "outcome")
+))
+llm_hedges = registry.register(Counter(
+    "llm_hedged_requests_total", "LLM calls also sent to the secondary provider after the hedge delay",
+    ("kind",)
+))
+llm_hedge_delay = registry.register(Gauge(
+    "llm_hedge_delay_seconds", "Current wait on the primary LLM provider before hedging", ("kind",)
+))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Requests holding an admission slot per analysis stage", ("stage",)
+))
+admission_queue_depth = registry.register(Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot per analysis stage", ("stage",)
+))
+admission_shed = registry.register(Counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control", ("stage", "reason")
+))
+admission_bypassed = registry.register(Counter(
+    "admission_bypassed_total", "Fully cached requests that skipped the admission queue", ("stage",)
+))
+
+# Per-request stage timings collected for the Server-Timing header
+_server_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "server_timings", default=None
+)
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request"""
+    timings: List[Tuple[str, float]] = []
+    _server_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value with per-stage durations summed, in milliseconds"""
+    durations: Dict[str, float] = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations.items())
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one analysis stage into the stage histogram and the request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=name)
+        timings = _server_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+@contextmanager
+def upstream_call(provider: str, operation: str, symbols: int = 1) -> Iterator[None]:
+    """Time one market data upstream call and count it by outcome"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        upstream_duration.observe(time.perf_counter() - start, provider=provider, operation=operation)
+        upstream_requests.inc(provider=provider, operation=operation, outcome=outcome)
+        upstream_symbols.observe(symbols, provider=provider, operation=operation)
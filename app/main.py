@@ -1,10 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
+import time
 
+from app.core import metrics
 from app.core.config import settings
 from app.api.routes import router
+from app.services.fetch_engine import fetch_engine
+from app.services.insight_jobs import insight_jobs
+from app.services.market_data import get_market_data_provider
+from app.services.monte_carlo import monte_carlo_engine
+from app.services.refresh_ahead import refresh_scheduler
+from app.services.shared_cache import shared_market_cache
+from app.services.warmup import warm_up
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +42,31 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Record request latency and report per-stage timings in a Server-Timing header"""
+    timings = metrics.start_request_timings()
+    metrics.http_requests_in_flight.inc()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.http_requests_in_flight.dec()
+    elapsed = time.perf_counter() - start
+
+    # Label by route template so path parameters don't explode cardinality
+    route = request.scope.get("route")
+    route_path = request.scope.get("root_path", "") + route.path if route else "unmatched"
+    metrics.http_request_duration.observe(
+        elapsed,
+        method=request.method,
+        route=route_path,
+        status=str(response.status_code)
+    )
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
+
+
 # Include API routes
 app.include_router(router, prefix=settings.API_PREFIX)
 
@@ -44,12 +78,20 @@ async def startup_event():
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
     logger.info(f"CORS origins: {settings.cors_origins}")
+    warm_up.start()
+    refresh_scheduler.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler"""
     logger.info("Shutting down Portfolio Analyzer Backend")
+    refresh_scheduler.stop()
+    insight_jobs.cancel_all()
+    await get_market_data_provider().aclose()
+    await shared_market_cache.aclose()
+    fetch_engine.shutdown()
+    monte_carlo_engine.shutdown()
 
 
 @app.exception_handler(Exception)
@@ -65,6 +107,14 @@ async def global_exception_handler(request, exc):
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # Root endpoint
 @app.get("/")
 async def root():
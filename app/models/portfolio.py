@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 
 
 class StockHolding(BaseModel):
@@ -14,10 +14,30 @@ class StockHolding(BaseModel):
         return v.upper().strip()
 
 
+
+class OptimizationRequest(BaseModel):
+    """Target portfolio the rebalancing recommendations move toward; unset fields use server defaults"""
+    objective: Optional[str] = Field(
+        None, description="min_variance, max_sharpe, risk_parity, hhi_capped, or none"
+    )
+    max_weight: Optional[float] = Field(None, gt=0, le=100, description="Largest weight per holding (%)")
+    max_sector_weight: Optional[float] = Field(None, gt=0, le=100, description="Largest weight per sector (%)")
+    hhi_cap: Optional[float] = Field(None, gt=0, le=1, description="Largest HHI for the hhi_capped target")
+    long_only: bool = Field(True, description="Disallow short positions")
+
+    @validator('objective')
+    def validate_objective(cls, v):
+        objectives = {"min_variance", "max_sharpe", "risk_parity", "hhi_capped", "none"}
+        if v is not None and v not in objectives:
+            raise ValueError(f"Objective must be one of {', '.join(sorted(objectives))}, got {v}")
+        return v
+
+
 class PortfolioRequest(BaseModel):
     """Request model for portfolio analysis"""
     holdings: List[StockHolding] = Field(..., min_items=1, description="List of stock holdings")
     total_value: Optional[float] = Field(None, ge=0, description="Total portfolio value (optional)")
+    optimization: Optional[OptimizationRequest] = Field(None, description="Optimizer settings (optional)")
 
     @validator('holdings')
     def validate_allocations(cls, v):
@@ -34,12 +54,71 @@ class SectorBreakdown(BaseModel):
     stocks: List[str]
 
 
+class RiskContribution(BaseModel):
+    """Contribution of a single holding to portfolio volatility"""
+    symbol: str
+    weight: float = Field(..., description="Portfolio weight (%)")
+    marginal_risk: float = Field(..., description="Change in daily volatility per unit of weight (%)")
+    component_risk: float = Field(..., description="Share of daily volatility attributed to the holding (%)")
+    risk_contribution_pct: float = Field(..., description="Component risk as a percentage of total volatility")
+
+
+class CorrelationCluster(BaseModel):
+    """Holdings whose returns move together, whatever their sector labels"""
+    symbols: List[str]
+    allocation: float = Field(..., description="Combined allocation (%)")
+    sectors: List[str] = Field(..., description="Sector labels of the holdings in the cluster")
+    average_correlation: Optional[float] = Field(None, description="Average pairwise correlation within the cluster")
+
+
 class RiskMetrics(BaseModel):
     """Risk assessment metrics"""
     risk_score: float = Field(..., ge=0, le=100, description="Overall risk score (0-100)")
     diversification_score: float = Field(..., ge=0, le=100, description="Diversification score (0-100)")
     volatility_level: str = Field(..., description="Low, Medium, or High")
     concentration_risk: str = Field(..., description="Risk level due to concentration")
+    portfolio_volatility: Optional[float] = Field(None, description="Daily portfolio volatility (%)")
+    annualized_volatility: Optional[float] = Field(None, description="Annualized portfolio volatility (%)")
+    var_historical: Optional[float] = Field(None, description="1-day historical Value at Risk (% loss)")
+    cvar_historical: Optional[float] = Field(None, description="1-day historical Conditional VaR (% loss)")
+    var_parametric: Optional[float] = Field(None, description="1-day Gaussian Value at Risk (% loss)")
+    cvar_parametric: Optional[float] = Field(None, description="1-day Gaussian Conditional VaR (% loss)")
+    max_drawdown: Optional[float] = Field(None, description="Maximum drawdown over the history window (%)")
+    sharpe_ratio: Optional[float] = Field(None, description="Annualized Sharpe ratio")
+    sortino_ratio: Optional[float] = Field(None, description="Annualized Sortino ratio")
+    risk_contributions: Optional[List[RiskContribution]] = None
+    effective_number_of_bets: Optional[float] = Field(
+        None, description="Number of uncorrelated bets the portfolio's risk is spread across"
+    )
+    cluster_hhi: Optional[float] = Field(None, description="Herfindahl index of correlation-cluster allocations")
+    correlation_clusters: Optional[List[CorrelationCluster]] = Field(
+        None, description="Holdings grouped by return correlation, largest allocation first"
+    )
+    excluded_holdings: List[str] = Field(
+        default_factory=list,
+        description="Holdings without enough price history; the risk figures cover the rest, reweighted to 100%"
+    )
+
+
+class TargetAllocation(BaseModel):
+    """Move from the current to the optimized weight for one holding"""
+    symbol: str
+    current_weight: float = Field(..., description="Current weight (%)")
+    target_weight: float = Field(..., description="Optimized weight (%)")
+    change: float = Field(..., description="Target minus current weight (percentage points)")
+    amount: Optional[float] = Field(None, description="Trade value, when total_value is given")
+
+
+class PortfolioOptimization(BaseModel):
+    """Optimized target weights and the trades that reach them"""
+    objective: str
+    targets: List[TargetAllocation] = Field(..., description="Every holding, largest move first")
+    current_volatility: Optional[float] = Field(None, description="Daily volatility of current weights (%)")
+    target_volatility: float = Field(..., description="Daily volatility of target weights (%)")
+    current_sharpe_ratio: Optional[float] = None
+    target_sharpe_ratio: Optional[float] = None
+    target_hhi: float = Field(..., description="Herfindahl index of target weights")
+    converged: bool
 
 
 class PortfolioAnalysis(BaseModel):
@@ -51,10 +130,140 @@ class PortfolioAnalysis(BaseModel):
     risk_metrics: RiskMetrics
     diversification_analysis: str
     recommendations: List[str]
+    optimization: Optional[PortfolioOptimization] = None
     ai_insights: str
+    insight_job_id: Optional[str] = Field(
+        None, description="Set when ai_insights is a fallback; fetch the AI insight from /insights/{id}"
+    )
     stock_details: Optional[List[Dict[str, Any]]] = None
 
 
+class BatchPortfolioRequest(BaseModel):
+    """Request model for analyzing many portfolios in one call"""
+    portfolios: List[PortfolioRequest] = Field(..., min_items=1, description="Portfolios to analyze")
+
+
+class BatchAnalysisItem(BaseModel):
+    """One line of the NDJSON batch analysis stream"""
+    index: int = Field(..., description="Position of the portfolio in the batch request")
+    analysis: Optional[PortfolioAnalysis] = None
+    error: Optional[str] = None
+
+
+class WhatIfRequest(BaseModel):
+    """Allocation changes to re-analyze against an earlier analysis"""
+    allocations: Dict[str, float] = Field(
+        ..., description="New allocation (%) per symbol; holdings not listed keep theirs, 0 drops one"
+    )
+    include_ai_insights: bool = Field(
+        False, description="Regenerate AI insights (slow); otherwise rule-based insights are returned"
+    )
+
+    @validator('allocations')
+    def validate_allocations(cls, v):
+        normalized = {symbol.upper().strip(): allocation for symbol, allocation in v.items()}
+        for symbol, allocation in normalized.items():
+            if not (0 <= allocation <= 100):
+                raise ValueError(f"Allocation for {symbol} must be between 0 and 100, got {allocation}")
+        return normalized
+
+
+class BacktestRequest(PortfolioRequest):
+    """Portfolio to backtest, with the date range and rebalancing schedule"""
+    start_date: Optional[date] = Field(None, description="First day (defaults to one year before end_date)")
+    end_date: Optional[date] = Field(None, description="Last day (defaults to today)")
+    rebalance: str = Field("none", description="none, monthly, quarterly, or threshold")
+    drift_threshold: float = Field(
+        5.0, gt=0, le=100, description="Rebalance when any weight drifts this many points from target (threshold only)"
+    )
+    require_full_range: bool = Field(
+        False, description="Reject the request instead of starting later when history does not reach start_date"
+    )
+
+    @validator('rebalance')
+    def validate_rebalance(cls, v):
+        schedules = {"none", "monthly", "quarterly", "threshold"}
+        if v not in schedules:
+            raise ValueError(f"Rebalance must be one of {', '.join(sorted(schedules))}, got {v}")
+        return v
+
+    @validator('end_date')
+    def validate_date_range(cls, v, values):
+        start = values.get('start_date')
+        if v is not None and start is not None and start >= v:
+            raise ValueError(f"start_date {start} must be before end_date {v}")
+        return v
+
+
+class BacktestResult(BaseModel):
+    """Historical performance of a fixed allocation"""
+    rebalance: str
+    start_date: date = Field(..., description="First day with prices for every holding")
+    end_date: date
+    requested_start_date: date
+    truncated: bool = Field(..., description="Whether history did not reach back to requested_start_date")
+    trading_days: int
+    dates: List[date]
+    equity: List[float] = Field(..., description="Portfolio value per day, starting at total_value (or 1)")
+    drawdown: List[float] = Field(..., description="Decline from the running peak per day (%)")
+    final_value: float
+    total_return: float = Field(..., description="Total return (%)")
+    cagr: float = Field(..., description="Compound annual growth rate (%)")
+    annualized_volatility: float = Field(..., description="Annualized volatility of daily returns (%)")
+    sharpe_ratio: Optional[float] = Field(None, description="Annualized Sharpe ratio")
+    max_drawdown: float = Field(..., description="Maximum drawdown (%)")
+    max_drawdown_peak: Optional[date] = None
+    max_drawdown_trough: Optional[date] = None
+    max_drawdown_recovery: Optional[date] = Field(None, description="First day back at the prior peak, if any")
+    rebalances: int
+    turnover: float = Field(..., description="Total one-way turnover from rebalancing (%)")
+    annualized_turnover: float = Field(..., description="One-way turnover per year (%)")
+
+
+class MonteCarloRequest(PortfolioRequest):
+    """Portfolio to forward-simulate, with the horizon and path count"""
+    horizon_days: int = Field(252, ge=1, le=2520, description="Trading days to simulate")
+    paths: int = Field(10000, ge=100, description="Simulated paths")
+    seed: Optional[int] = Field(None, ge=0, description="Random seed; the same seed reproduces the result")
+
+
+class WealthBand(BaseModel):
+    """Percentiles of simulated portfolio value on one day"""
+    day: int = Field(..., description="Trading days from now")
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+    mean: float
+
+
+class MonteCarloResult(BaseModel):
+    """Distribution of simulated future portfolio value"""
+    paths: int
+    horizon_days: int
+    seed: int = Field(..., description="Seed used; send it back to reproduce this result")
+    bands: List[WealthBand] = Field(..., description="Value percentiles, starting at total_value (or 1)")
+    expected_final_value: float
+    probability_of_loss: float = Field(..., description="Chance of ending below the starting value (%)")
+
+
+class InsightJobResponse(BaseModel):
+    """Status of an AI insight that is completing in the background"""
+    job_id: str
+    status: str = Field(..., description="pending, complete, or failed")
+    ai_insights: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class SymbolMatch(BaseModel):
+    """One autocomplete match from the symbol universe"""
+    symbol: str
+    name: str
+    exchange: str
+
+
 class HealthCheckResponse(BaseModel):
     """Health check response"""
     status: str
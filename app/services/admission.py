@@ -0,0 +1,165 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncContextManager, AsyncIterator, Deque, Dict, Optional
+import logging
+
+from app.core.config import settings
+from app.core.metrics import admission_bypassed, admission_in_flight, admission_queue_depth, admission_shed
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the average time a slot is held
+HOLD_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """A stage's wait queue was full or the wait timed out; retry after ``retry_after`` seconds"""
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"Too many requests waiting for the {stage} stage")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    """Concurrency limit for one analysis stage with a bounded FIFO wait queue.
+
+    Up to ``limit`` callers hold a slot at once; up to ``max_queue`` more wait
+    for one, each for at most ``timeout`` seconds. A caller that finds the queue
+    full, or times out in it, gets ``Overloaded`` with a retry estimate based on
+    the queue length and how long slots are usually held. A released slot is
+    handed straight to the longest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._hold = 1.0
+        self.admitted = 0
+        self.bypassed = 0
+        self.shed = {"queue_full": 0, "timeout": 0}
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely to have drained"""
+        estimate = (len(self._waiters) + 1) * self._hold / self.limit
+        return min(settings.ADMISSION_RETRY_AFTER_MAX, max(1, math.ceil(estimate)))
+
+    def _publish(self):
+        admission_in_flight.set(self.active, stage=self.name)
+        admission_queue_depth.set(len(self._waiters), stage=self.name)
+
+    def _shed(self, reason: str):
+        self.shed[reason] += 1
+        admission_shed.inc(stage=self.name, reason=reason)
+        logger.warning(f"Shedding request at the {self.name} stage ({reason})")
+        raise Overloaded(self.name, self.retry_after())
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter, so the active count is unchanged
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    async def _acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._publish()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # Handed a slot just as the caller went away
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._publish()
+            raise
+        if not waiter.done():
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self._publish()
+            self._shed("timeout")
+
+    @asynccontextmanager
+    async def slot(self, bypass: bool = False) -> AsyncIterator[None]:
+        """Hold one slot of the stage, or skip the limit entirely with ``bypass``"""
+        if bypass:
+            self.bypassed += 1
+            admission_bypassed.inc(stage=self.name)
+            yield
+            return
+
+        await self._acquire()
+        self.admitted += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold += HOLD_SMOOTHING * (time.perf_counter() - start - self._hold)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "bypassed": self.bypassed,
+            "shed": dict(self.shed),
+            "average_hold_seconds": round(self._hold, 3),
+        }
+
+
+class AdmissionController:
+    """Per-stage admission limits for /analyze: data fetch, compute and LLM"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        max_queue: int = settings.ADMISSION_QUEUE_SIZE,
+        timeout: float = settings.ADMISSION_QUEUE_TIMEOUT,
+        enabled: bool = settings.ADMISSION_ENABLED
+    ):
+        limits = limits or {
+            "data": settings.ADMISSION_DATA_LIMIT,
+            "compute": settings.ADMISSION_COMPUTE_LIMIT,
+            "llm": settings.ADMISSION_LLM_LIMIT,
+        }
+        self.enabled = enabled
+        self.stages = {
+            name: StageLimiter(name, limit, max_queue, timeout) for name, limit in limits.items()
+        }
+
+    def stage(self, name: str, bypass: bool = False) -> AsyncContextManager[None]:
+        if not self.enabled:
+            return nullcontext()
+        return self.stages[name].slot(bypass)
+
+    def stats(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if not self.enabled:
+            return None
+        return {name: limiter.stats() for name, limiter in self.stages.items()}
+
+
+admission = AdmissionController()
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.portfolio import OptimizationRequest, StockHolding
+from app.services import optimizer, risk_engine
+from app.services.cache import TTLCache
+
+
+@dataclass
+class AnalysisSession:
+    """Inputs of a finished analysis kept around so what-if requests skip refetching"""
+    holdings: List[StockHolding]
+    stock_details: List[Dict]
+    risk: Optional[risk_engine.IncrementalRisk]
+    optimization: Optional[OptimizationRequest] = None
+    # Positions of the holdings with enough history; the risk state covers only these
+    covered: Optional[List[int]] = None
+    # Last optimizer solve and its inputs; targets don't move with the current weights
+    target: Optional[Tuple[Tuple[Any, ...], optimizer.OptimizationResult]] = None
+
+    @property
+    def nbytes(self) -> int:
+        # Stock details are small next to the returns matrix
+        return self.risk.nbytes if self.risk is not None else 0
+
+
+class AnalysisSessionStore:
+    """Recent analyses by request id, bounded by count and by returns-matrix bytes"""
+
+    def __init__(
+        self,
+        ttl: float = settings.WHATIF_SESSION_TTL,
+        max_sessions: int = settings.WHATIF_MAX_SESSIONS,
+        max_bytes: int = settings.WHATIF_MAX_BYTES
+    ):
+        self.ttl = ttl
+        self._sessions = TTLCache(
+            max_size=max_sessions, max_weight=max_bytes, weigher=lambda session: session.nbytes
+        )
+
+    def save(self, request_id: str, session: AnalysisSession):
+        self._sessions.set(request_id, session, self.ttl)
+
+    def get(self, request_id: str) -> Optional[AnalysisSession]:
+        return self._sessions.get(request_id)
+
+    def stats(self):
+        return self._sessions.stats()
+
+
+analysis_sessions = AnalysisSessionStore()
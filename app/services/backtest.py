@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+import logging
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.portfolio import BacktestRequest, BacktestResult
+from app.services.price_store import MAX_SESSION_GAP, price_store
+from app.services.risk_engine import TRADING_DAYS
+
+logger = logging.getLogger(__name__)
+
+SCHEDULES = ("none", "monthly", "quarterly", "threshold")
+
+# Trading days scanned per step when searching for the next drift breach; the
+# window doubles until a breach is found, so a search costs O(days to breach)
+DRIFT_SCAN_DAYS = 63
+
+
+@dataclass
+class BacktestPath:
+    """Daily portfolio value and rebalancing activity for one weight vector"""
+    equity: np.ndarray
+    rebalance_days: np.ndarray
+    turnover: np.ndarray
+
+
+def _period_ends(dates: np.ndarray, schedule: str) -> np.ndarray:
+    """Indices of the last trading day of each month or quarter, excluding the first and final days"""
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    periods = months if schedule == "monthly" else months // 3
+    ends = np.flatnonzero(periods[1:] != periods[:-1])
+    return ends[ends > 0]
+
+
+def _drift_breaches(closes: np.ndarray, weights: np.ndarray, threshold: float) -> np.ndarray:
+    """Days on which some weight has drifted more than ``threshold`` from target since the last rebalance.
+
+    Each breach resets the anchor, so the scan loops per rebalance event; within an
+    event every day is checked at once.
+    """
+    days = len(closes)
+    breaches = []
+    anchor = 0
+    while anchor < days - 1:
+        found = None
+        window = DRIFT_SCAN_DAYS
+        start = anchor + 1
+        while start < days - 1 and found is None:
+            stop = min(start + window, days - 1)
+            grown = closes[start:stop] / closes[anchor] * weights
+            drifted = grown / grown.sum(axis=1, keepdims=True)
+            breached = np.flatnonzero(np.abs(drifted - weights).max(axis=1) > threshold)
+            if len(breached):
+                found = start + breached[0]
+            start, window = stop, window * 2
+        if found is None:
+            break
+        breaches.append(found)
+        anchor = found
+    return np.array(breaches, dtype=np.int64)
+
+
+def simulate(
+    dates: np.ndarray,
+    closes: np.ndarray,
+    weights: np.ndarray,
+    schedule: str = "none",
+    threshold: float = 0.05
+) -> BacktestPath:
+    """Buy ``weights`` at the first close and hold, rebalancing back to them on ``schedule``.
+
+    Between rebalances the value is a fixed linear combination of price relatives
+    to the last rebalance day, so the whole path is one gather and one matrix-vector
+    product; rebalance days only chain the segment growth factors with a cumprod.
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown rebalancing schedule: {schedule}")
+
+    if schedule == "none":
+        rebalance_days = np.empty(0, dtype=np.int64)
+    elif schedule == "threshold":
+        rebalance_days = _drift_breaches(closes, weights, threshold)
+    else:
+        rebalance_days = _period_ends(dates, schedule)
+
+    # Each day's anchor is the latest rebalance strictly before it (day 0 to start)
+    anchors = np.concatenate(([0], rebalance_days))
+    anchor_of = anchors[np.searchsorted(anchors, np.arange(len(closes)), side="left") - 1]
+    anchor_of[0] = 0
+    relatives = closes / closes[anchor_of]
+    growth = relatives @ weights
+
+    # Value carried into each segment is the product of earlier segments' growth
+    carried = np.cumprod(np.concatenate(([1.0], growth[rebalance_days])))
+    equity = carried[np.searchsorted(anchors, anchor_of)] * growth
+
+    # One-way turnover: half the absolute gap between drifted and target weights
+    drifted = relatives[rebalance_days] * weights / growth[rebalance_days, None]
+    turnover = 0.5 * np.abs(drifted - weights).sum(axis=1)
+    return BacktestPath(equity=equity, rebalance_days=rebalance_days, turnover=turnover)
+
+
+def summarize(
+    dates: np.ndarray,
+    path: BacktestPath,
+    initial_value: float = 1.0,
+    risk_free_rate: float = settings.RISK_FREE_RATE
+) -> dict:
+    """Equity curve, drawdowns and performance statistics of a simulated path"""
+    equity = path.equity
+    years = max((dates[-1] - dates[0]).astype(int) / 365.25, 1 / 365.25)
+    daily = equity[1:] / equity[:-1] - 1
+
+    peaks = np.maximum.accumulate(equity)
+    drawdown = 1 - equity / peaks
+    trough = int(np.argmax(drawdown))
+    peak = int(np.argmax(equity[:trough + 1])) if trough else 0
+    recovered = np.flatnonzero(equity[trough:] >= equity[peak])
+    recovery = trough + int(recovered[0]) if trough and len(recovered) else None
+
+    volatility = float(daily.std(ddof=1)) if len(daily) > 1 else 0.0
+    excess = float(daily.mean()) - risk_free_rate / TRADING_DAYS if len(daily) else 0.0
+
+    def day(index: Optional[int]) -> Optional[date]:
+        return dates[index].astype(date) if index is not None else None
+
+    return {
+        "start_date": day(0),
+        "end_date": day(len(dates) - 1),
+        "trading_days": len(dates),
+        "dates": dates.astype(date).tolist(),
+        "equity": (equity * initial_value).round(4).tolist(),
+        "drawdown": (drawdown * 100).round(4).tolist(),
+        "final_value": round(float(equity[-1]) * initial_value, 4),
+        "total_return": round((float(equity[-1]) - 1) * 100, 4),
+        "cagr": round((float(equity[-1]) ** (1 / years) - 1) * 100, 4),
+        "annualized_volatility": round(volatility * TRADING_DAYS ** 0.5 * 100, 4),
+        "sharpe_ratio": (
+            round(excess / volatility * TRADING_DAYS ** 0.5, 4) if volatility > 0 else None
+        ),
+        "max_drawdown": round(float(drawdown[trough]) * 100, 4),
+        "max_drawdown_peak": day(peak) if trough else None,
+        "max_drawdown_trough": day(trough) if trough else None,
+        "max_drawdown_recovery": day(recovery),
+        "rebalances": len(path.rebalance_days),
+        "turnover": round(float(path.turnover.sum()) * 100, 4),
+        "annualized_turnover": round(float(path.turnover.sum()) / years * 100, 4),
+    }
+
+
+async def run_backtest(request: BacktestRequest) -> BacktestResult:
+    """Backtest the request's allocation over stored daily closes.
+
+    History reaches back PRICE_STORE_HISTORY_PERIOD from when a symbol was first
+    stored, and only dates every holding traded on are used, so the result's
+    ``start_date`` can be later than requested; such results are flagged
+    ``truncated``, or rejected with ValueError if the request requires the full range.
+    """
+    symbols = list(dict.fromkeys(holding.symbol for holding in request.holdings))
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    weights = np.zeros(len(symbols))
+    for holding in request.holdings:
+        weights[column[holding.symbol]] += holding.allocation
+    weights /= weights.sum()
+
+    end = request.end_date or date.today()
+    start = request.start_date or end - timedelta(days=365)
+    with metrics.stage("price_history"):
+        await price_store.ensure_history(symbols)
+        # The window is exclusive of its first day, so reach back one extra day
+        dates, closes = price_store.closes_window(symbols, (end - start).days + 1, end)
+    if len(dates) < 2:
+        raise ValueError(f"Not enough price history between {start} and {end}")
+
+    first_session = np.busday_offset(np.datetime64(start, "D"), 0, roll="forward")
+    truncated = int(np.busday_count(first_session, dates[0])) > MAX_SESSION_GAP
+    if truncated:
+        if request.require_full_range:
+            raise ValueError(
+                f"Price history for every holding starts on {dates[0]}, after the requested {start}"
+            )
+        logger.info(f"Backtest requested from {start} starts on {dates[0]}, the first day with every holding")
+
+    with metrics.stage("backtest"):
+        path = simulate(dates, closes, weights, request.rebalance, request.drift_threshold / 100)
+        summary = summarize(dates, path, request.total_value or 1.0)
+    logger.debug(
+        f"Backtested {len(symbols)} symbols over {len(dates)} days "
+        f"with {summary['rebalances']} rebalances"
+    )
+    return BacktestResult(
+        rebalance=request.rebalance, requested_start_date=start, truncated=truncated, **summary
+    )
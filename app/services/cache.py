@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Besides the entry count, the cache can be bounded by total weight (e.g. bytes)
+    as measured by ``weigher``.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self._clock = clock
+        self._weigher = weigher
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Store a value for ``ttl`` seconds, evicting least recently used entries if full"""
+        self._remove(key)
+        self._entries[key] = (self._clock() + ttl, value)
+        if self._weigher is not None:
+            self._weights[key] = self._weigher(value)
+            self.weight += self._weights[key]
+
+        while len(self._entries) > self.max_size or (
+            self.max_weight is not None and self.weight > self.max_weight and len(self._entries) > 1
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self.weight -= self._weights.pop(key, 0)
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until the entry expires, without touching LRU order or counters"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0] - self._clock()
+
+    def invalidate(self, key: Hashable):
+        self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._weights.clear()
+        self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self._weigher is not None:
+            stats["weight"] = self.weight
+            stats["max_weight"] = self.max_weight
+        return stats
+
+
+class SingleFlight:
+    """Collapses concurrent loads of the same key into one in-flight call"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``load`` for ``key`` unless a call for it is already in flight, then share its result"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(load())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done() or future.cancelled():
+                self._inflight.pop(key, None)
+            else:
+                # The caller was cancelled; keep the result available to the others
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.calls,
+            "shared_calls": self.shared,
+        }
+
+
+class AccessTracker:
+    """Exponentially decayed access counts per key, for finding the hottest keys.
+
+    A key's score halves every ``half_life`` seconds without access. When more than
+    ``max_keys`` are tracked, the coldest are dropped.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 600.0,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._clock = clock
+        self._scores: Dict[Hashable, Tuple[float, float]] = {}
+
+    def _decayed(self, key: Hashable, now: float) -> float:
+        entry = self._scores.get(key)
+        if entry is None:
+            return 0.0
+        score, updated_at = entry
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, keys: Iterable[Hashable]):
+        now = self._clock()
+        for key in keys:
+            self._scores[key] = (self._decayed(key, now) + 1.0, now)
+
+        if len(self._scores) > self.max_keys:
+            keep = self.hottest(self.max_keys // 2)
+            self._scores = {key: self._scores[key] for key in keep}
+
+    def score(self, key: Hashable) -> float:
+        return self._decayed(key, self._clock())
+
+    def hottest(self, n: int) -> List[Hashable]:
+        """The ``n`` keys with the highest decayed score, hottest first"""
+        now = self._clock()
+        return heapq.nlargest(n, self._scores, key=lambda key: self._decayed(key, now))
+
+    def __len__(self) -> int:
+        return len(self._scores)
@@ -0,0 +1,225 @@
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+from app.services.price_store import PriceStore, period_to_days, price_store
+
+
+class CorrelationCache:
+    """Correlation matrix over every symbol seen today, grown as new symbols arrive.
+
+    Each symbol's daily returns are standardized once onto a shared business-day
+    grid; correlations of a new symbol against the cached universe are one
+    matrix product, and any request's matrix is a slice of the universe matrix.
+    Pairs use the days both symbols traded. The cache resets when the day changes
+    (new closes) or the universe outgrows ``max_symbols``.
+
+    Cluster labels are cached per symbol set alongside the matrix they came from.
+    """
+
+    def __init__(
+        self,
+        store: PriceStore = price_store,
+        lookback_days: int = period_to_days("1y"),
+        max_symbols: int = settings.CORRELATION_CACHE_MAX_SYMBOLS,
+        today: Callable[[], date] = date.today,
+        max_clusterings: int = settings.CORRELATION_CLUSTER_CACHE_SIZE
+    ):
+        self.store = store
+        self.lookback_days = lookback_days
+        self.max_symbols = max_symbols
+        self.max_clusterings = max_clusterings
+        self._today = today
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _reset(self, day: date):
+        end = np.datetime64(day, "D")
+        days = np.arange(end - np.timedelta64(self.lookback_days - 1, "D"), end + 1)
+        self._day = day
+        self._grid = days[np.is_busday(days)]
+        self._columns: Dict[str, int] = {}
+        self._scores = np.empty((len(self._grid), 0))
+        self._present = np.empty((len(self._grid), 0), dtype=bool)
+        self._volatility = np.empty(0)
+        self._matrix = np.empty((0, 0))
+        self._labels = TTLCache(max_size=self.max_clusterings)
+
+    def _standardize(self, symbol: str) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """Standardized daily returns on the grid (0 where missing), presence mask and volatility"""
+        bars = self.store.bars(symbol)
+        dates, closes = bars["date"], bars["close"]
+        returns = closes[1:] / closes[:-1] - 1
+        slots = np.searchsorted(self._grid, dates[1:])
+        on_grid = (slots < len(self._grid)) & (self._grid[np.minimum(slots, len(self._grid) - 1)] == dates[1:])
+        if on_grid.sum() < 3:
+            return None
+
+        values = returns[on_grid]
+        volatility = float(values.std(ddof=1))
+        scores = np.zeros(len(self._grid))
+        present = np.zeros(len(self._grid), dtype=bool)
+        scores[slots[on_grid]] = (values - values.mean()) / volatility if volatility > 0 else 0.0
+        present[slots[on_grid]] = True
+        return scores, present, volatility
+
+    def _add(self, symbols: List[str]):
+        standardized = {symbol: self._standardize(symbol) for symbol in symbols}
+        added = [symbol for symbol, result in standardized.items() if result is not None]
+        if not added:
+            return
+        if len(self._columns) + len(added) > self.max_symbols:
+            self._reset(self._day)
+
+        scores = np.column_stack([standardized[symbol][0] for symbol in added])
+        present = np.column_stack([standardized[symbol][1] for symbol in added])
+        all_scores = np.hstack((self._scores, scores))
+        all_present = np.hstack((self._present, present))
+
+        # New columns against the whole universe: Σ z_i z_j / (days both traded - 1)
+        overlap = all_present.T.astype(float) @ present.astype(float)
+        block = np.clip(all_scores.T @ scores / np.maximum(overlap - 1, 1), -1.0, 1.0)
+        old = len(self._columns)
+        block[old + np.arange(len(added)), np.arange(len(added))] = 1.0
+
+        matrix = np.empty((old + len(added),) * 2)
+        matrix[:old, :old] = self._matrix
+        matrix[:, old:] = block
+        matrix[old:, :old] = block[:old].T
+
+        for symbol in added:
+            self._columns[symbol] = len(self._columns)
+        self._scores, self._present, self._matrix = all_scores, all_present, matrix
+        self._volatility = np.concatenate(
+            (self._volatility, [standardized[symbol][2] for symbol in added])
+        )
+
+    def get(self, symbols: List[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Correlation matrix and daily volatilities for ``symbols`` (repeats allowed).
+
+        Returns None if any symbol has too little stored history.
+        """
+        with self._lock:
+            today = self._today()
+            if self._day != today:
+                self._reset(today)
+            missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._columns]
+            if missing:
+                self.misses += 1
+                self._add(missing)
+            else:
+                self.hits += 1
+            if any(symbol not in self._columns for symbol in symbols):
+                return None
+            columns = np.array([self._columns[symbol] for symbol in symbols])
+            return self._matrix[np.ix_(columns, columns)], self._volatility[columns]
+
+    def clusters(
+        self, symbols: List[str], threshold: float = settings.CLUSTER_CORRELATION_THRESHOLD
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Correlation matrix, daily volatilities and cluster labels for ``symbols``.
+
+        Labels come from clustering the distinct symbols in sorted order, so every
+        portfolio over the same symbol set shares one cached clustering; repeated
+        symbols share a label. Returns None if any symbol has too little history.
+        """
+        cached = self.get(symbols)
+        if cached is None:
+            return None
+        corr, volatility = cached
+        unique, positions = np.unique(np.asarray(symbols), return_inverse=True)
+        key = (threshold, tuple(unique))
+        with self._lock:
+            labels = self._labels.get(key)
+        if labels is None:
+            first = np.unique(positions, return_index=True)[1]
+            labels = cluster_labels(corr[np.ix_(first, first)], threshold)
+            with self._lock:
+                # Kept until the matrix is rebuilt, not timed out
+                self._labels.set(key, labels, ttl=float("inf"))
+        return corr, volatility, _first_appearance(labels[positions])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._columns) if self._day is not None else 0,
+            "max_size": self.max_symbols,
+            "clusterings": len(self._labels) if self._day is not None else 0,
+        }
+
+
+correlation_cache = CorrelationCache()
+
+
+def cluster_labels(corr: np.ndarray, threshold: float = settings.CLUSTER_CORRELATION_THRESHOLD) -> np.ndarray:
+    """Average-linkage hierarchical clustering on correlation, cut at ``threshold``.
+
+    Clusters merge while the average pairwise correlation between them is at
+    least ``threshold``. Each row's best partner is kept up to date across merges,
+    so finding the next pair is a scan of n values rather than the whole matrix.
+    Labels are 0..k-1 in order of first appearance.
+    """
+    n = len(corr)
+    labels = np.arange(n)
+    if n > 1:
+        similarity = corr.astype(float).copy()
+        np.fill_diagonal(similarity, -np.inf)
+        sizes = np.ones(n)
+        partner = np.argmax(similarity, axis=1)
+        best = similarity[np.arange(n), partner]
+
+        while True:
+            i = int(np.argmax(best))
+            if best[i] < threshold:
+                break
+            j = int(partner[i])
+            # Lance-Williams update for average linkage
+            merged = (sizes[i] * similarity[i] + sizes[j] * similarity[j]) / (sizes[i] + sizes[j])
+            similarity[i, :] = merged
+            similarity[:, i] = merged
+            similarity[i, i] = -np.inf
+            similarity[j, :] = -np.inf
+            similarity[:, j] = -np.inf
+            sizes[i] += sizes[j]
+            labels[labels == j] = i
+            best[j] = -np.inf
+
+            # Rows that paired with i or j may have lost their best; the rest can only gain i
+            stale = np.flatnonzero((partner == i) | (partner == j))
+            stale = stale[(stale != j) & np.isfinite(best[stale])]
+            stale = np.union1d(stale, [i])
+            partner[stale] = np.argmax(similarity[stale], axis=1)
+            best[stale] = similarity[stale, partner[stale]]
+            gained = similarity[:, i] > best
+            partner[gained] = i
+            best[gained] = similarity[gained, i]
+
+    return _first_appearance(labels)
+
+
+def _first_appearance(labels: np.ndarray) -> np.ndarray:
+    """Relabel to 0..k-1 in order of each label's first position"""
+    _, first, relabeled = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[relabeled]
+
+
+def effective_number_of_bets(corr: np.ndarray, volatility: np.ndarray, weights: np.ndarray) -> float:
+    """Effective number of independent bets: the squared diversification ratio.
+
+    (Σ w_i σ_i)² / σ_p² is 1/HHI for uncorrelated equal-risk holdings,
+    n / (1 + (n - 1)ρ) for n equal holdings with pairwise correlation ρ, and 1
+    when everything moves together.
+    """
+    exposure = volatility * weights
+    variance = float(exposure @ corr @ exposure)
+    if variance <= 0:
+        return 1.0
+    return float(exposure.sum() ** 2 / variance)
@@ -0,0 +1,263 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import logging
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Floor for the adaptive rate, as a fraction of the configured rate
+MIN_RATE_FRACTION = 1 / 64
+
+# Rate regained per successful call after throttling, as a fraction of the configured rate
+RECOVERY_STEP = 0.05
+
+
+class UpstreamThrottled(Exception):
+    """An upstream rejected a call for exceeding its rate limit, or the local limiter gave up waiting"""
+
+
+class RateLimiter:
+    """Token bucket whose rate adapts to upstream throttling.
+
+    Each call takes a token; tokens refill at ``rate`` per second up to ``burst``.
+    A throttled call halves the rate and pauses refilling for a backoff that
+    doubles with consecutive throttles, up to ``max_backoff`` seconds. Each
+    successful call then restores a step of the configured rate. Throttles
+    reported during a pause count once, so a burst of concurrent rejections
+    does not collapse the rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_wait: float,
+        max_backoff: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self.tokens = float(burst)
+        self._refilled_at = clock()
+        self._backoff = 0.0
+        self.throttles = 0
+        self.rejections = 0
+
+    def _refill(self, now: float):
+        # During a backoff pause _refilled_at lies in the future and nothing refills
+        if now > self._refilled_at:
+            self.tokens = min(float(self.burst), self.tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before using it.
+
+        Raises UpstreamThrottled instead when the wait would exceed ``max_wait``.
+        """
+        now = self._clock()
+        self._refill(now)
+        wait = max(0.0, self._refilled_at + max(0.0, 1 - self.tokens) / self.rate - now)
+        if wait > self.max_wait:
+            self.rejections += 1
+            raise UpstreamThrottled(f"Rate limit wait of {wait:.1f}s exceeds {self.max_wait:.1f}s")
+        self.tokens -= 1
+        return wait
+
+    def throttled(self):
+        """Back off after the upstream rejected a call for rate limiting"""
+        now = self._clock()
+        self._refill(now)
+        if now < self._refilled_at:
+            return
+        self.throttles += 1
+        self._backoff = min(self.max_backoff, self._backoff * 2 or 1.0)
+        self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self._refilled_at = now + self._backoff
+
+    def succeeded(self):
+        """Recover rate after a call the upstream accepted"""
+        self._backoff = 0.0
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "tokens": round(self.tokens, 3),
+            "throttles": self.throttles,
+            "rejections": self.rejections,
+        }
+
+
+class FetchEngine:
+    """Runs blocking upstream calls off the event loop with bounded concurrency"""
+
+    def __init__(
+        self,
+        max_workers: int = settings.FETCH_MAX_WORKERS,
+        per_upstream_limit: int = settings.FETCH_CONCURRENCY_PER_UPSTREAM,
+        timeout: float = settings.FETCH_SYMBOL_TIMEOUT,
+        rate_limit: float = settings.FETCH_RATE_LIMIT
+    ):
+        self.max_workers = max_workers
+        self.per_upstream_limit = per_upstream_limit
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="upstream-fetch"
+            )
+        return self._executor
+
+    def _semaphore(self, upstream: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(upstream)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_upstream_limit)
+            self._semaphores[upstream] = semaphore
+        return semaphore
+
+    def _limiter(self, upstream: str) -> Optional[RateLimiter]:
+        if self.rate_limit <= 0:
+            return None
+        limiter = self._limiters.get(upstream)
+        if limiter is None:
+            limiter = RateLimiter(
+                self.rate_limit,
+                settings.FETCH_RATE_LIMIT_BURST,
+                settings.FETCH_RATE_LIMIT_MAX_WAIT,
+                settings.FETCH_BACKOFF_MAX
+            )
+            self._limiters[upstream] = limiter
+        return limiter
+
+    async def _limited(
+        self, upstream: str, start_call: Callable[[], Awaitable[Any]], timeout: Optional[float]
+    ) -> Any:
+        """Await a call under the upstream's rate limiter, concurrency cap and timeout"""
+        limiter = self._limiter(upstream)
+        if limiter is not None:
+            try:
+                wait = limiter.reserve()
+            except UpstreamThrottled:
+                metrics.upstream_throttles.inc(upstream=upstream, source="local")
+                raise
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        async with self._semaphore(upstream):
+            try:
+                result = await asyncio.wait_for(start_call(), timeout or self.timeout)
+            except UpstreamThrottled:
+                if limiter is not None:
+                    limiter.throttled()
+                    metrics.upstream_rate_limit.set(limiter.rate, upstream=upstream)
+                metrics.upstream_throttles.inc(upstream=upstream, source="upstream")
+                raise
+
+        if limiter is not None and limiter.rate < limiter.max_rate:
+            limiter.succeeded()
+            metrics.upstream_rate_limit.set(limiter.rate, upstream=upstream)
+        return result
+
+    async def run(
+        self,
+        upstream: str,
+        func: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run a blocking call in the executor, capped per upstream and bounded by a timeout.
+
+        The timeout starts once a rate limit token and a concurrency slot are acquired,
+        so time spent queueing behind other calls to the same upstream does not count
+        against it. A timed-out call keeps its worker thread until the underlying I/O
+        returns. A call raising UpstreamThrottled slows the upstream's rate limiter.
+        """
+        loop = asyncio.get_running_loop()
+        return await self._limited(
+            upstream,
+            lambda: loop.run_in_executor(self.executor, functools.partial(func, *args)),
+            timeout
+        )
+
+    async def call(
+        self,
+        upstream: str,
+        make_call: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Await a native async upstream call under the same rate limit, cap and timeout as ``run``"""
+        return await self._limited(upstream, make_call, timeout)
+
+    async def map_ordered(
+        self,
+        upstream: str,
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+        placeholder: Callable[[Any, Exception], Any],
+        timeout: Optional[float] = None
+    ) -> List[Any]:
+        """Apply a blocking call to every item concurrently, preserving input order.
+
+        Failed or timed-out items are replaced by ``placeholder(item, error)``.
+        """
+        return await gather_ordered(
+            lambda item: self.run(upstream, func, item, timeout=timeout),
+            items,
+            placeholder,
+            label=upstream
+        )
+
+    def shutdown(self):
+        """Release worker threads without waiting for in-flight calls"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphores.clear()
+
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Adaptive rate limiter state per upstream"""
+        return {upstream: limiter.stats() for upstream, limiter in self._limiters.items()}
+
+
+async def gather_ordered(
+    fetch: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    placeholder: Callable[[Any, Exception], Any],
+    label: str = "upstream"
+) -> List[Any]:
+    """Await ``fetch(item)`` for every item concurrently, preserving input order.
+
+    Failed or timed-out items are replaced by ``placeholder(item, error)``.
+    """
+
+    async def fetch_one(item: Any) -> Any:
+        try:
+            return await fetch(item)
+        except asyncio.TimeoutError as e:
+            logger.warning(f"{label} fetch for {item} timed out")
+            return placeholder(item, e)
+        except Exception as e:
+            logger.error(f"{label} fetch for {item} failed: {str(e)}")
+            return placeholder(item, e)
+
+    return list(await asyncio.gather(*(fetch_one(item) for item in items)))
+
+
+fetch_engine = FetchEngine()
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import logging
+
+import aiofiles
+
+from app.core.config import settings
+from app.models.portfolio import StockHolding
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Share of the disk budget a sweep prunes down to, so writes don't sweep every time
+DISK_SWEEP_TARGET = 0.8
+
+
+def insight_fingerprint(
+    holdings: List[StockHolding],
+    provider: str,
+    model: str,
+    template_version: str,
+    precision: float = settings.LLM_CACHE_ALLOCATION_PRECISION
+) -> str:
+    """Canonical fingerprint of the inputs that shape an AI insight.
+
+    Holdings are merged by symbol, sorted, and their allocations bucketed to
+    ``precision`` percentage points so that near-identical portfolios share a key.
+    """
+    allocations: Dict[str, float] = defaultdict(float)
+    for holding in holdings:
+        allocations[holding.symbol] += holding.allocation
+
+    bucketed = [
+        [symbol, round(round(allocation / precision) * precision, 6)]
+        for symbol, allocation in sorted(allocations.items())
+    ]
+    canonical = json.dumps(
+        {
+            "holdings": bucketed,
+            "provider": provider,
+            "model": model,
+            "template": template_version,
+        },
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """Two-tier cache of generated insights: in-memory LRU plus an optional on-disk store.
+
+    The disk store is swept on write: once its files pass ``max_disk_bytes``, or a
+    TTL after the last sweep, expired files are removed and then the oldest until
+    it is back under ``DISK_SWEEP_TARGET`` of the budget.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.LLM_CACHE_TTL,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.LLM_CACHE_MAX_BYTES,
+        directory: str = settings.LLM_CACHE_DIR,
+        max_disk_bytes: int = settings.LLM_CACHE_DISK_MAX_BYTES
+    ):
+        self.ttl = ttl
+        self.directory = directory or None
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = TTLCache(
+            max_size=max_entries,
+            max_weight=max_bytes,
+            weigher=lambda text: len(text.encode("utf-8"))
+        )
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        # Bytes on disk as of the last sweep plus what this process wrote since
+        self._disk_bytes: Optional[int] = None
+        self._swept_at = 0.0
+        self._sweep: Optional["asyncio.Task[None]"] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached insight, falling back to the disk store on a memory miss"""
+        text = self.memory.get(key)
+        if text is not None or self.directory is None:
+            return text
+
+        path = self._path(key)
+        try:
+            async with aiofiles.open(path, "r") as f:
+                entry = json.loads(await f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable insight cache entry {key}: {str(e)}")
+            return None
+
+        # Disk entries carry wall-clock expiry so they survive restarts
+        remaining = entry["expires_at"] - time.time()
+        if remaining <= 0:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        self.memory.set(key, entry["text"], remaining)
+        self.disk_hits += 1
+        return entry["text"]
+
+    async def set(self, key: str, text: str):
+        self.memory.set(key, text, self.ttl)
+        if self.directory is None:
+            return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            payload = json.dumps({"expires_at": time.time() + self.ttl, "text": text})
+            async with aiofiles.open(tmp_path, "w") as f:
+                await f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist insight cache entry {key}: {str(e)}")
+            return
+
+        if self._disk_bytes is not None:
+            self._disk_bytes += len(payload)
+        due = (
+            self._disk_bytes is None
+            or self._disk_bytes > self.max_disk_bytes
+            or time.time() - self._swept_at > self.ttl
+        )
+        if due and (self._sweep is None or self._sweep.done()):
+            self._sweep = asyncio.ensure_future(asyncio.to_thread(self._sweep_disk))
+
+    def _sweep_disk(self):
+        """Remove expired entries, then the oldest until the store is under its target size"""
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.warning(f"Could not sweep insight cache directory {self.directory}: {str(e)}")
+            return
+
+        # Every entry is written with the same TTL, so its age tells whether it expired
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * DISK_SWEEP_TARGET if total > self.max_disk_bytes else float("inf")
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime + self.ttl > now and total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        self.disk_evictions += removed
+        self._disk_bytes = total
+        self._swept_at = now
+        if removed:
+            logger.info(f"Swept {removed} insight cache files; {total} bytes remain")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.memory.stats(),
+            "disk_enabled": self.directory is not None,
+            "disk_hits": self.disk_hits,
+            "disk_evictions": self.disk_evictions,
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import logging
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class InsightJobStore:
+    """Tracks AI insights that are still being generated after a response was sent"""
+
+    def __init__(
+        self,
+        ttl: float = settings.LLM_JOB_TTL,
+        max_jobs: int = settings.LLM_JOB_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self._jobs = TTLCache(max_size=max_jobs)
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+
+    def submit(
+        self,
+        task: "asyncio.Future[str]",
+        fallback: Callable[[], str]
+    ) -> str:
+        """Adopt an in-flight insight task and return the job id it can be fetched by"""
+        job_id = str(uuid.uuid4())
+        self._jobs.set(job_id, {
+            "job_id": job_id,
+            "status": "pending",
+            "ai_insights": None,
+            "created_at": datetime.utcnow(),
+            "completed_at": None,
+        }, self.ttl)
+
+        background = asyncio.ensure_future(self._complete(job_id, task, fallback))
+        self._tasks.add(background)
+        background.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _complete(
+        self, job_id: str, task: Awaitable[str], fallback: Callable[[], str]
+    ):
+        try:
+            insights, status = await task, "complete"
+        except Exception as e:
+            logger.error(f"Background insight job {job_id} failed: {str(e)}")
+            insights, status = fallback(), "failed"
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            logger.warning(f"Insight job {job_id} expired before completing")
+            return
+        job.update(status=status, ai_insights=insights, completed_at=datetime.utcnow())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+insight_jobs = InsightJobStore()
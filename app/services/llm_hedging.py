@@ -0,0 +1,171 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Union
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import llm_hedge_delay, llm_hedges, llm_requests
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Latencies in seconds of the most recent ``size`` completed calls"""
+
+    def __init__(self, size: int = settings.LLM_HEDGE_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        return float(np.percentile(self._samples, q))
+
+
+class HedgedClient:
+    """Chat model wrapper that races a secondary provider against a slow primary.
+
+    Every call goes to the primary first. If it has not answered within the hedge
+    delay (``percentile`` of the primary's recent latencies), the same call is
+    sent to the secondary as well; the first answer wins and the other call is
+    cancelled. A primary that fails before the delay hands over to the secondary
+    at once. Streams are hedged on the time to their first chunk.
+
+    A prompt may be a callable taking the provider name, so each provider gets
+    messages in its own format; the ``*_with_provider`` calls also report which
+    provider answered.
+
+    Only completed calls are recorded, so a primary whose slow calls keep losing
+    races pulls the delay down rather than up.
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        secondary: Any,
+        primary_name: str,
+        secondary_name: str,
+        percentile: float = settings.LLM_HEDGE_PERCENTILE,
+        initial_delay: float = settings.LLM_HEDGE_INITIAL_DELAY,
+        min_delay: float = settings.LLM_HEDGE_MIN_DELAY,
+        min_samples: int = settings.LLM_HEDGE_MIN_SAMPLES,
+        window: int = settings.LLM_HEDGE_WINDOW
+    ):
+        self.providers: List[Tuple[str, Any]] = [(primary_name, primary), (secondary_name, secondary)]
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latency: Dict[str, Dict[str, LatencyWindow]] = {
+            name: {"invoke": LatencyWindow(window), "first_chunk": LatencyWindow(window)}
+            for name, _ in self.providers
+        }
+        self.calls = 0
+        self.hedged = 0
+        self.wins = {name: 0 for name, _ in self.providers}
+
+    def hedge_delay(self, kind: str = "invoke") -> float:
+        """Seconds to wait on the primary before also asking the secondary"""
+        window = self.latency[self.providers[0][0]][kind]
+        if len(window) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, window.percentile(self.percentile))
+
+    async def _race(self, kind: str, call: Callable[[str, Any], Awaitable[Any]]) -> Tuple[str, Any]:
+        """Name and result of the first provider to answer ``call``, hedging after the delay"""
+        self.calls += 1
+        delay = self.hedge_delay(kind)
+        llm_hedge_delay.set(delay, kind=kind)
+        tasks: Dict["asyncio.Task[Any]", Tuple[str, float]] = {}
+
+        def launch(name: str, client: Any):
+            tasks[asyncio.ensure_future(call(name, client))] = (name, time.perf_counter())
+
+        launch(*self.providers[0])
+        pending = set(tasks)
+        timeout: Optional[float] = delay
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name, started = tasks[task]
+                    if task.exception() is None:
+                        self.latency[name][kind].record(time.perf_counter() - started)
+                        self.wins[name] += 1
+                        llm_requests.inc(provider=name, outcome="won")
+                        return name, task.result()
+                    errors.append(task.exception())
+                    llm_requests.inc(provider=name, outcome="failed")
+                    logger.warning(f"LLM provider {name} failed: {str(task.exception())}")
+
+                if len(tasks) == 1:
+                    # The delay passed, or the primary failed first: ask the secondary now
+                    if not done:
+                        self.hedged += 1
+                        llm_hedges.inc(kind=kind)
+                    launch(*self.providers[1])
+                    pending = {task for task in tasks if not task.done()}
+                    timeout = None
+            raise errors[0]
+        finally:
+            for task, (name, _) in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    llm_requests.inc(provider=name, outcome="lost")
+
+    @staticmethod
+    def _messages(prompt: Union[Any, Callable[[str], Any]], name: str) -> Any:
+        return prompt(name) if callable(prompt) else prompt
+
+    async def ainvoke(self, prompt: Any) -> Any:
+        _, result = await self.ainvoke_with_provider(prompt)
+        return result
+
+    async def ainvoke_with_provider(self, prompt: Any) -> Tuple[str, Any]:
+        """Name of the provider that answered, and its response"""
+        return await self._race(
+            "invoke", lambda name, client: client.ainvoke(self._messages(prompt, name))
+        )
+
+    async def astream(self, prompt: Any) -> AsyncIterator[Any]:
+        _, stream = await self.astream_with_provider(prompt)
+        async for chunk in stream:
+            yield chunk
+
+    async def astream_with_provider(self, prompt: Any) -> Tuple[str, AsyncIterator[Any]]:
+        """Name of the provider whose stream started first, and that stream"""
+        async def first_chunk(name: str, client: Any) -> Tuple[AsyncIterator[Any], Any]:
+            stream = client.astream(self._messages(prompt, name)).__aiter__()
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+
+        async def chunks(stream: AsyncIterator[Any], chunk: Any) -> AsyncIterator[Any]:
+            if chunk is None:
+                return
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+
+        name, (stream, chunk) = await self._race("first_chunk", first_chunk)
+        return name, chunks(stream, chunk)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "wins": dict(self.wins),
+            "hedge_delay": {kind: round(self.hedge_delay(kind), 3) for kind in ("invoke", "first_chunk")},
+        }
@@ -1,10 +1,115 @@
-from typing import List, Dict
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Tuple
+import asyncio
 import logging
+import math
+from collections import defaultdict
 from app.core.config import settings
+from app.core.metrics import llm_prompt_tokens
 from app.models.portfolio import SectorBreakdown, RiskMetrics, StockHolding
+from app.services.admission import admission
+from app.services.insight_cache import InsightCache, insight_fingerprint
+from app.services.insight_jobs import insight_jobs
+from app.services.llm_hedging import HedgedClient
 
 logger = logging.getLogger(__name__)
 
+# Model used for a hedge provider when LLM_HEDGE_MODEL is empty
+DEFAULT_MODELS = {"anthropic": "claude-3-5-sonnet-20241022", "openai": "gpt-4o"}
+
+# Bump whenever _build_analysis_prompt changes so cached insights are not reused
+PROMPT_TEMPLATE_VERSION = "4"
+
+# Smallest prefix Anthropic will cache, by model name prefix; other models need 1024 tokens
+MIN_CACHEABLE_TOKENS = {
+    "claude-3-haiku": 2048,
+    "claude-3-5-haiku": 2048,
+    "claude-haiku-4-5": 4096,
+    "claude-opus-4-5": 4096,
+}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+
+# Static instructions sent first and unchanged on every call, so providers can cache them.
+# At under 1000 tokens they are below every model's minimum, so prompt caching does not
+# apply at this size; cache_control is only sent once they grow past it (see cacheable_prefix).
+ANALYSIS_INSTRUCTIONS = """You are an expert financial advisor analyzing an investment portfolio. Provide a comprehensive,
+professional analysis with actionable insights. Be specific and reference actual holdings.
+
+How the portfolio data is organized:
+- Portfolio Overview gives the number of holdings, the largest position and the number of sectors.
+- Holdings lists the most significant holdings individually, ranked by the larger of their allocation
+  and their share of portfolio risk. Each line gives the allocation, sector, beta, P/E ratio and, when
+  price history is available, the holding's share of total portfolio volatility ("Risk Share").
+- Remaining Holdings by Sector appears only for large portfolios. It summarizes the holdings that are
+  not listed individually: how many there are per sector, their combined allocation, their
+  allocation-weighted beta and their combined risk share. Treat these as groups; do not invent
+  details about individual holdings inside them.
+- Sector Breakdown gives each sector's total allocation and the holdings in it; "N more" counts the
+  holdings of that sector that are summarized rather than listed.
+- Risk Metrics gives an overall risk score and a diversification score (both 0-100, where a higher
+  diversification score is better), the volatility level and the concentration risk.
+
+How to interpret the numbers:
+- Beta measures sensitivity to the broad market: above 1.2 amplifies market moves, below 0.8 dampens
+  them. "N/A" means the value is unavailable, not zero; never treat a missing value as a signal.
+- P/E ratios far above the sector norm indicate growth expectations priced in; very low ratios can
+  indicate value or a business in decline. Comment on valuation only where it is clearly notable.
+- A holding whose risk share is much larger than its allocation is a risk concentration even when its
+  weight looks modest. A holding whose risk share is much smaller than its allocation is a diversifier.
+  Call out the largest gaps between allocation and risk share; they are often the most useful insight.
+- Concentration matters at three levels: single positions above roughly 10%, sectors above roughly
+  30%, and groups of holdings that tend to move together (for example several semiconductor or
+  several regional bank positions) even when they sit in different sectors.
+- A high risk score with a low diversification score usually calls for reducing the largest or most
+  volatile positions; a low risk score with a high diversification score may leave room for growth.
+
+What to write:
+1. A brief overview of the portfolio's composition and apparent strategy
+2. Key strengths and potential concerns, each tied to specific holdings or sectors
+3. Market positioning and exposure analysis: sector tilts, market sensitivity and style (growth,
+   value, income, defensive)
+4. Specific insights about the holdings and their relationships, including where risk is concentrated
+5. Forward-looking considerations based on current market conditions, framed as things to monitor
+   rather than predictions
+
+Style rules:
+- Keep the analysis concise (3-4 paragraphs), professional, and actionable. Focus on practical
+  insights rather than generic advice.
+- Reference holdings by ticker, and quote allocations and risk shares from the data as given.
+- Do not recommend specific trades or target prices, and do not claim certainty about future returns.
+- Do not repeat the input data back as a list; interpret it.
+- Write plain paragraphs without headings, bullet points or Markdown formatting."""
+
+# Instruction tokens at a generous 4.5 characters per token, the upper end for English
+# prose, so a prefix is only marked cacheable when it surely clears the minimum
+INSTRUCTION_TOKENS = len(ANALYSIS_INSTRUCTIONS) / 4.5
+
+# Rough tokenizer-free estimate; tickers and numbers make these prompts denser than prose
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of ``text`` without a provider tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def min_cacheable_tokens(model: str) -> int:
+    """Smallest prompt prefix the model caches (LLM_PROMPT_CACHE_MIN_TOKENS overrides)"""
+    if settings.LLM_PROMPT_CACHE_MIN_TOKENS:
+        return settings.LLM_PROMPT_CACHE_MIN_TOKENS
+    return next(
+        (tokens for prefix, tokens in MIN_CACHEABLE_TOKENS.items() if model.startswith(prefix)),
+        DEFAULT_MIN_CACHEABLE_TOKENS
+    )
+
+
+def cacheable_prefix(model: str) -> bool:
+    """Whether the instructions are long enough for the model to cache"""
+    return INSTRUCTION_TOKENS >= min_cacheable_tokens(model)
+
+
+def _number(value: Any) -> str:
+    return f"{value:.2f}" if isinstance(value, (int, float)) and value else "N/A"
+
 
 class LLMService:
     """Service for generating AI insights using LLMs"""
@@ -12,29 +117,48 @@ class LLMService:
     def __init__(self):
         self.provider = settings.LLM_PROVIDER
         self.model = settings.LLM_MODEL
+        self.insight_cache = InsightCache() if settings.LLM_CACHE_ENABLED else None
         self._initialize_client()
 
     def _initialize_client(self):
-        """Initialize the appropriate LLM client"""
+        """Initialize the appropriate LLM client, hedged with a second provider if configured"""
+        # Provider and model behind each client name, primary first
+        self.primary = f"{self.provider}:{self.model}"
+        self.routes: Dict[str, Tuple[str, str]] = {self.primary: (self.provider, self.model)}
+        self.client = self._create_client(self.provider, self.model)
+        hedge_provider = settings.LLM_HEDGE_PROVIDER
+        if self.client is None or not hedge_provider:
+            return
+
+        hedge_model = settings.LLM_HEDGE_MODEL or DEFAULT_MODELS.get(hedge_provider, "")
+        secondary = self._create_client(hedge_provider, hedge_model)
+        if secondary is not None:
+            secondary_name = f"{hedge_provider}:{hedge_model}"
+            self.routes[secondary_name] = (hedge_provider, hedge_model)
+            self.client = HedgedClient(self.client, secondary, self.primary, secondary_name)
+
+    @staticmethod
+    def _create_client(provider: str, model: str):
+        """LangChain chat model for ``provider``, or None if it cannot be created"""
         try:
-            if self.provider == "anthropic":
+            if provider == "anthropic":
                 from langchain_anthropic import ChatAnthropic
-                self.client = ChatAnthropic(
-                    model=self.model,
+                return ChatAnthropic(
+                    model=model,
                     anthropic_api_key=settings.ANTHROPIC_API_KEY
                 )
-            elif self.provider == "openai":
+            elif provider == "openai":
                 from langchain_openai import ChatOpenAI
-                self.client = ChatOpenAI(
-                    model=self.model,
+                return ChatOpenAI(
+                    model=model,
                     openai_api_key=settings.OPENAI_API_KEY
                 )
             else:
-                logger.warning(f"Unknown LLM provider: {self.provider}")
-                self.client = None
+                logger.warning(f"Unknown LLM provider: {provider}")
+                return None
         except Exception as e:
             logger.error(f"Error initializing LLM client: {str(e)}")
-            self.client = None
+            return None
 
     async def generate_portfolio_insights(
         self,
@@ -52,23 +176,60 @@ class LLMService:
             )
 
         try:
-            # Build context for the LLM
-            prompt = self._build_analysis_prompt(
+            return await self._invoke_insights(
                 portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
             )
+        except Exception as e:
+            logger.error(f"Error generating LLM insights: {str(e)}")
+            return self._generate_fallback_insights(
+                portfolio_summary, sector_breakdown, risk_metrics
+            )
 
-            # Get response from LLM
-            response = await self.client.ainvoke(prompt)
+    async def generate_portfolio_insights_within(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding],
+        latency_budget: float
+    ) -> Tuple[str, Optional[str]]:
+        """Generate AI insights, answering with fallback text if the LLM misses its budget.
 
-            return response.content
+        Returns ``(insights, job_id)``. When the budget is missed the LLM call keeps
+        running in the background and ``job_id`` identifies where its result will land.
+        """
+        if not self.client or latency_budget <= 0:
+            insights = await self.generate_portfolio_insights(
+                portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+            )
+            return insights, None
 
-        except Exception as e:
-            logger.error(f"Error generating LLM insights: {str(e)}")
+        def fallback() -> str:
             return self._generate_fallback_insights(
                 portfolio_summary, sector_breakdown, risk_metrics
             )
 
-    def _build_analysis_prompt(
+        task = asyncio.ensure_future(self._invoke_insights(
+            portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+        ))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=latency_budget)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+        if not done:
+            logger.warning(f"LLM missed the {latency_budget}s latency budget, completing in background")
+            return fallback(), insight_jobs.submit(task, fallback)
+
+        try:
+            return task.result(), None
+        except Exception as e:
+            logger.error(f"Error generating LLM insights: {str(e)}")
+            return fallback(), None
+
+    async def _invoke_insights(
         self,
         portfolio_summary: Dict,
         sector_breakdown: List[SectorBreakdown],
@@ -76,58 +237,283 @@ class LLMService:
         stock_details: List[Dict],
         holdings: List[StockHolding]
     ) -> str:
-        """Build the prompt for LLM analysis"""
+        """Get insights from the cache or the LLM; errors propagate to the caller"""
 
-        holdings_str = "\n".join([
-            f"- {h.symbol}: {h.allocation}%"
-            for h in holdings
-        ])
+        cached = await self._cached_insights(holdings)
+        if cached is not None:
+            return cached
 
-        sector_str = "\n".join([
-            f"- {sb.sector}: {sb.allocation}% ({', '.join(sb.stocks)})"
-            for sb in sector_breakdown
-        ])
+        # Build context for the LLM
+        prompt = self._prompt_for(
+            portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+        )
 
-        stock_info_str = "\n".join([
-            f"- {s['symbol']} ({s['name']}): {s['sector']}, Beta: {s.get('beta', 'N/A')}, "
-            f"P/E: {s.get('pe_ratio', 'N/A')}"
-            for s in stock_details
-        ])
+        # Get response from LLM; only cache misses take an LLM admission slot
+        async with admission.stage("llm"):
+            if isinstance(self.client, HedgedClient):
+                name, response = await self.client.ainvoke_with_provider(prompt)
+            else:
+                name, response = self.primary, await self.client.ainvoke(prompt(self.primary))
+        self._record_usage(response)
 
-        prompt = f"""You are an expert financial advisor analyzing an investment portfolio. Provide a comprehensive,
-professional analysis with actionable insights. Be specific and reference actual holdings.
+        if self.insight_cache is not None:
+            await self.insight_cache.set(self._cache_key(holdings, name), response.content)
+        return response.content
 
-Portfolio Overview:
-- Total Holdings: {portfolio_summary['total_stocks']}
-- Largest Position: {portfolio_summary['largest_holding']} ({portfolio_summary['largest_holding_pct']}%)
-- Sectors Represented: {portfolio_summary['total_sectors']}
+    async def stream_portfolio_insights(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding]
+    ) -> AsyncIterator[str]:
+        """Stream AI-powered portfolio insights chunk by chunk"""
+
+        if not self.client:
+            yield self._generate_fallback_insights(
+                portfolio_summary, sector_breakdown, risk_metrics
+            )
+            return
+
+        cached = await self._cached_insights(holdings)
+        if cached is not None:
+            yield cached
+            return
+
+        streamed = False
+        try:
+            prompt = self._prompt_for(
+                portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+            )
+
+            chunks = []
+            async with admission.stage("llm"):
+                if isinstance(self.client, HedgedClient):
+                    name, stream = await self.client.astream_with_provider(prompt)
+                else:
+                    name, stream = self.primary, self.client.astream(prompt(self.primary))
+                async for chunk in stream:
+                    self._record_usage(chunk)
+                    text = self._chunk_text(chunk)
+                    if text:
+                        streamed = True
+                        chunks.append(text)
+                        yield text
+
+            if self.insight_cache is not None:
+                await self.insight_cache.set(self._cache_key(holdings, name), "".join(chunks))
+
+        except Exception as e:
+            logger.error(f"Error streaming LLM insights: {str(e)}")
+            # Only fall back if the client has not seen any model output yet
+            if not streamed:
+                yield self._generate_fallback_insights(
+                    portfolio_summary, sector_breakdown, risk_metrics
+                )
+
+    def _cache_key(self, holdings: List[StockHolding], name: str) -> str:
+        """Insight cache key for a portfolio answered by the client called ``name``"""
+        provider, model = self.routes.get(name, (self.provider, self.model))
+        return insight_fingerprint(holdings, provider, model, PROMPT_TEMPLATE_VERSION)
+
+    async def _cached_insights(self, holdings: List[StockHolding]) -> Optional[str]:
+        """Cached insight from any configured provider, preferring the primary"""
+        if self.insight_cache is None:
+            return None
+        for name in self.routes:
+            cached = await self.insight_cache.get(self._cache_key(holdings, name))
+            if cached is not None:
+                return cached
+        return None
+
+    def cache_stats(self) -> Optional[Dict]:
+        return self.insight_cache.stats() if self.insight_cache is not None else None
+
+    def hedge_stats(self) -> Optional[Dict]:
+        return self.client.stats() if isinstance(self.client, HedgedClient) else None
+
+    @staticmethod
+    def _record_usage(message):
+        """Record the provider-reported prompt size, including the part served from its cache"""
+        usage = getattr(message, "usage_metadata", None)
+        if not usage or not usage.get("input_tokens"):
+            return
+        llm_prompt_tokens.observe(usage["input_tokens"], kind="input")
+        cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+        if cache_read is not None:
+            llm_prompt_tokens.observe(cache_read, kind="cache_read")
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Extract the text of a streamed message chunk (string or content-block list)"""
+        content = chunk.content
+        if isinstance(content, str):
+            return content
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+
+    def _prompt_for(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding]
+    ) -> Callable[[str], List[Tuple[str, Any]]]:
+        """Chat messages per client name, each in its provider's format; the data is built once"""
+        portfolio_data = self._analysis_data(
+            portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+        )
+        return lambda name: self._analysis_messages(
+            portfolio_data, *self.routes.get(name, (self.provider, self.model))
+        )
+
+    def _build_analysis_prompt(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding],
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> List[Tuple[str, Any]]:
+        """Build the chat messages for LLM analysis: cacheable instructions, then portfolio data"""
+        portfolio_data = self._analysis_data(
+            portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings
+        )
+        return self._analysis_messages(portfolio_data, provider or self.provider, model or self.model)
 
-Holdings:
-{holdings_str}
+    def _analysis_data(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding]
+    ) -> str:
+        """Portfolio data message within the prompt token budget"""
+        portfolio_data = self._build_portfolio_data(
+            portfolio_summary, sector_breakdown, risk_metrics, stock_details, holdings,
+            settings.LLM_PROMPT_TOKEN_BUDGET
+        )
+        llm_prompt_tokens.observe(
+            estimate_tokens(ANALYSIS_INSTRUCTIONS) + estimate_tokens(portfolio_data), kind="estimated"
+        )
+        return portfolio_data
 
-Sector Breakdown:
-{sector_str}
+    @staticmethod
+    def _analysis_messages(portfolio_data: str, provider: str, model: str) -> List[Tuple[str, Any]]:
+        """Instructions then portfolio data, with the instructions marked for caching on Anthropic"""
+        instructions: Any = ANALYSIS_INSTRUCTIONS
+        if provider == "anthropic" and settings.LLM_PROMPT_CACHE_ENABLED and cacheable_prefix(model):
+            # Anthropic caches only marked prefixes; OpenAI caches repeated prefixes on its own
+            instructions = [
+                {"type": "text", "text": ANALYSIS_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}
+            ]
+        return [("system", instructions), ("human", portfolio_data)]
 
-Stock Details:
-{stock_info_str}
+    def _build_portfolio_data(
+        self,
+        portfolio_summary: Dict,
+        sector_breakdown: List[SectorBreakdown],
+        risk_metrics: RiskMetrics,
+        stock_details: List[Dict],
+        holdings: List[StockHolding],
+        token_budget: int
+    ) -> str:
+        """Portfolio data for the prompt, compacted to fit ``token_budget`` tokens.
+
+        Holdings are ranked by the larger of their allocation and risk contribution.
+        When every holding does not fit, the largest number of top-ranked holdings
+        that does is listed in full and the rest are summarized per sector.
+        """
+        details = {s["symbol"]: s for s in stock_details}
+        risk = {c.symbol: c.risk_contribution_pct for c in risk_metrics.risk_contributions or []}
+        ranked = sorted(
+            holdings, key=lambda h: max(h.allocation, risk.get(h.symbol, 0.0)), reverse=True
+        )
+        lines = [self._holding_line(h, details.get(h.symbol, {}), risk.get(h.symbol)) for h in ranked]
+
+        def render(kept: int) -> str:
+            listed = {h.symbol for h in ranked[:kept]}
+            sector_lines = []
+            for sb in sector_breakdown:
+                stocks = [symbol for symbol in sb.stocks if symbol in listed]
+                if len(stocks) < len(sb.stocks):
+                    stocks.append(f"{len(sb.stocks) - len(stocks)} more")
+                sector_lines.append(f"- {sb.sector}: {sb.allocation}% ({', '.join(stocks)})")
 
-Risk Metrics:
+            sections = [
+                f"""Portfolio Overview:
+- Total Holdings: {portfolio_summary['total_stocks']}
+- Largest Position: {portfolio_summary['largest_holding']} ({portfolio_summary['largest_holding_pct']}%)
+- Sectors Represented: {portfolio_summary['total_sectors']}""",
+                "Holdings:\n" + "\n".join(lines[:kept]),
+            ]
+            if kept < len(ranked):
+                sections.append(
+                    "Remaining Holdings by Sector:\n" + "\n".join(self._tail_lines(ranked[kept:], details, risk))
+                )
+            sections.append("Sector Breakdown:\n" + "\n".join(sector_lines))
+            sections.append(f"""Risk Metrics:
 - Overall Risk Score: {risk_metrics.risk_score}/100
 - Diversification Score: {risk_metrics.diversification_score}/100
 - Volatility Level: {risk_metrics.volatility_level}
-- Concentration Risk: {risk_metrics.concentration_risk}
+- Concentration Risk: {risk_metrics.concentration_risk}""")
+            return "\n\n".join(sections)
+
+        full = render(len(ranked))
+        if estimate_tokens(full) <= token_budget:
+            return full
+
+        # Largest number of holdings listed in full that still fits the budget
+        low, high = 0, len(ranked) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(render(middle)) <= token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        logger.debug(f"Compacted prompt to {low} of {len(ranked)} holdings for a {token_budget} token budget")
+        return render(low)
 
-Please provide:
-1. A brief overview of the portfolio's composition and strategy
-2. Key strengths and potential concerns
-3. Market positioning and exposure analysis
-4. Specific insights about the holdings and their relationships
-5. Forward-looking considerations based on current market conditions
+    @staticmethod
+    def _holding_line(holding: StockHolding, details: Dict, risk_pct: Optional[float]) -> str:
+        line = (
+            f"- {holding.symbol} ({details.get('name', holding.symbol)}): {holding.allocation}%, "
+            f"{details.get('sector', 'Unknown')}, Beta: {_number(details.get('beta'))}, "
+            f"P/E: {_number(details.get('pe_ratio'))}"
+        )
+        if risk_pct is not None:
+            line += f", Risk Share: {risk_pct:.2f}%"
+        return line
 
-Keep the analysis concise (3-4 paragraphs), professional, and actionable. Focus on practical insights
-rather than generic advice."""
+    @staticmethod
+    def _tail_lines(tail: List[StockHolding], details: Dict[str, Dict], risk: Dict[str, float]) -> List[str]:
+        """One summary line per sector for holdings not listed individually"""
+        groups: Dict[str, List[StockHolding]] = defaultdict(list)
+        for holding in tail:
+            groups[details.get(holding.symbol, {}).get("sector", "Unknown")].append(holding)
 
-        return prompt
+        lines = []
+        for sector, group in sorted(groups.items(), key=lambda item: -sum(h.allocation for h in item[1])):
+            allocation = sum(h.allocation for h in group)
+            betas = [
+                (h.allocation, details[h.symbol]["beta"]) for h in group
+                if isinstance(details.get(h.symbol, {}).get("beta"), (int, float))
+            ]
+            weight = sum(a for a, _ in betas)
+            line = f"- {sector}: {len(group)} holdings, {allocation:.2f}% combined"
+            if weight > 0:
+                line += f", Weighted Beta: {sum(a * b for a, b in betas) / weight:.2f}"
+            if risk:
+                line += f", Risk Share: {sum(risk.get(h.symbol, 0.0) for h in group):.2f}%"
+            lines.append(line)
+        return lines
 
     def _generate_fallback_insights(
         self,
@@ -0,0 +1,72 @@
+from typing import List, Optional
+import logging
+
+from app.core.config import settings
+from app.services.market_data.base import (
+    DailyCloses, MarketDataProvider, ProviderChain, STOCK_INFO_FIELDS
+)
+from app.services.market_data.alpha_vantage import AlphaVantageProvider
+from app.services.market_data.fixture import FixtureProvider
+from app.services.market_data.instrumented import InstrumentedProvider
+from app.services.market_data.yfinance_provider import YFinanceProvider
+
+logger = logging.getLogger(__name__)
+
+
+def build_market_data_provider(names: List[str]) -> MarketDataProvider:
+    """Build the provider (or fallback chain) for the configured provider names, in order.
+
+    Each provider is wrapped so its calls show up in the upstream metrics under its own name.
+    """
+    factories = {
+        "yfinance": YFinanceProvider,
+        "alpha_vantage": AlphaVantageProvider,
+        "fixture": FixtureProvider,
+    }
+
+    providers = []
+    for name in names:
+        if name not in factories:
+            raise ValueError(f"Unknown market data provider: {name}")
+        if name == "alpha_vantage" and not settings.ALPHA_VANTAGE_API_KEY:
+            logger.warning("Skipping alpha_vantage provider: ALPHA_VANTAGE_API_KEY is not set")
+            continue
+        providers.append(InstrumentedProvider(factories[name]()))
+
+    if len(providers) == 1:
+        return providers[0]
+    return ProviderChain(providers)
+
+
+_provider: Optional[MarketDataProvider] = None
+
+
+def get_market_data_provider() -> MarketDataProvider:
+    """The process-wide market data provider, built from settings on first use"""
+    global _provider
+    if _provider is None:
+        _provider = build_market_data_provider(settings.market_data_providers)
+    return _provider
+
+
+def set_market_data_provider(provider: MarketDataProvider):
+    """Replace the process-wide provider (e.g. with a fixture provider for benchmarks)"""
+    global _provider
+    if not isinstance(provider, (InstrumentedProvider, ProviderChain)):
+        provider = InstrumentedProvider(provider)
+    _provider = provider
+
+
+__all__ = [
+    "AlphaVantageProvider",
+    "DailyCloses",
+    "FixtureProvider",
+    "InstrumentedProvider",
+    "MarketDataProvider",
+    "ProviderChain",
+    "STOCK_INFO_FIELDS",
+    "YFinanceProvider",
+    "build_market_data_provider",
+    "get_market_data_provider",
+    "set_market_data_provider",
+]
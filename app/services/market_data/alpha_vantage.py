@@ -0,0 +1,185 @@
+import asyncio
+from datetime import date
+from typing import Any, Dict, List, Optional
+import logging
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from app.services.fetch_engine import UpstreamThrottled, fetch_engine
+from app.services.market_data.base import DailyCloses, MarketDataProvider
+
+logger = logging.getLogger(__name__)
+
+# Alpha Vantage sector names mapped onto the labels yfinance uses
+SECTOR_NAMES = {
+    "TECHNOLOGY": "Technology",
+    "FINANCE": "Financial Services",
+    "LIFE SCIENCES": "Healthcare",
+    "MANUFACTURING": "Industrials",
+    "ENERGY & TRANSPORTATION": "Energy",
+    "TRADE & SERVICES": "Consumer Cyclical",
+    "REAL ESTATE & CONSTRUCTION": "Real Estate",
+}
+
+# Phrases in Note/Information messages that mean the call frequency limit was hit
+THROTTLE_PHRASES = ("rate limit", "call frequency", "requests per")
+
+# Trading days returned by TIME_SERIES_DAILY with outputsize=compact
+COMPACT_HISTORY_DAYS = 100
+
+
+def _number(value: Any, default: float = 0) -> float:
+    """Parse an Alpha Vantage numeric string, which may be "None" or "-" """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class AlphaVantageProvider(MarketDataProvider):
+    """Market data from the Alpha Vantage REST API over one pooled HTTP client"""
+
+    name = "alpha_vantage"
+
+    def __init__(
+        self,
+        api_key: str = settings.ALPHA_VANTAGE_API_KEY,
+        base_url: str = settings.ALPHA_VANTAGE_BASE_URL,
+        max_connections: int = settings.ALPHA_VANTAGE_MAX_CONNECTIONS,
+        bulk_quotes: bool = settings.ALPHA_VANTAGE_BULK_QUOTES
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.bulk_quotes = bulk_quotes
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.FETCH_SYMBOL_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def _query(self, function: str, timeout: Optional[float] = None, **params: str) -> Dict:
+        """Call one API function, raising on throttling or error payloads"""
+
+        async def request() -> Dict:
+            response = await self.client.get(
+                self.base_url,
+                params={"function": function, "apikey": self.api_key, **params}
+            )
+            if response.status_code == 429:
+                raise UpstreamThrottled(f"Alpha Vantage {function}: HTTP 429")
+            response.raise_for_status()
+            payload = response.json()
+            # Exceeded call frequency comes back as a 200 with a Note or Information message
+            message = payload.get("Note") or payload.get("Information") or ""
+            if any(phrase in message.lower() for phrase in THROTTLE_PHRASES):
+                raise UpstreamThrottled(f"Alpha Vantage {function}: {message}")
+            return payload
+
+        payload = await fetch_engine.call(self.name, request, timeout=timeout)
+        for key in ("Error Message", "Note", "Information"):
+            if key in payload:
+                raise RuntimeError(f"Alpha Vantage {function}: {payload[key]}")
+        return payload
+
+    async def get_stock_info(self, symbol: str) -> Dict:
+        overview, price = await asyncio.gather(
+            self._query("OVERVIEW", symbol=symbol),
+            self.get_latest_price(symbol)
+        )
+        if not overview:
+            raise LookupError(f"Alpha Vantage has no overview for {symbol}")
+
+        sector = overview.get("Sector") or "Unknown"
+        return {
+            "symbol": symbol,
+            "name": overview.get("Name") or symbol,
+            "sector": SECTOR_NAMES.get(sector.upper(), sector.title()),
+            "industry": (overview.get("Industry") or "Unknown").title(),
+            "market_cap": _number(overview.get("MarketCapitalization")),
+            "current_price": price,
+            "52_week_high": _number(overview.get("52WeekHigh")),
+            "52_week_low": _number(overview.get("52WeekLow")),
+            "pe_ratio": _number(overview.get("PERatio")),
+            "beta": _number(overview.get("Beta"), 1.0),
+            "dividend_yield": _number(overview.get("DividendYield")),
+        }
+
+    async def get_latest_price(self, symbol: str) -> float:
+        payload = await self._query("GLOBAL_QUOTE", symbol=symbol)
+        quote = payload.get("Global Quote") or {}
+        if "05. price" not in quote:
+            raise LookupError(f"Alpha Vantage has no quote for {symbol}")
+        return _number(quote["05. price"])
+
+    async def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest prices via REALTIME_BULK_QUOTES (100 symbols per call) when enabled"""
+        if not self.bulk_quotes:
+            return await super().get_latest_prices(symbols)
+
+        prices: Dict[str, float] = {}
+        batches = [symbols[i:i + 100] for i in range(0, len(symbols), 100)]
+        try:
+            payloads = await asyncio.gather(
+                *(self._query("REALTIME_BULK_QUOTES", symbol=",".join(batch)) for batch in batches)
+            )
+        except Exception as e:
+            logger.warning(f"Alpha Vantage bulk quotes failed, using per-symbol quotes: {str(e)}")
+            return await super().get_latest_prices(symbols)
+        for payload in payloads:
+            for quote in payload.get("data", []):
+                if quote.get("symbol") in symbols and quote.get("close") is not None:
+                    prices[quote["symbol"]] = _number(quote["close"])
+        return prices
+
+    async def _daily_closes(self, symbol: str, start: date, end: date) -> Optional[DailyCloses]:
+        trading_days = np.busday_count(start, end)
+        payload = await self._query(
+            "TIME_SERIES_DAILY",
+            timeout=settings.PRICE_STORE_DOWNLOAD_TIMEOUT,
+            symbol=symbol,
+            outputsize="compact" if trading_days <= COMPACT_HISTORY_DAYS else "full"
+        )
+        series = payload.get("Time Series (Daily)") or {}
+        rows = sorted(
+            (day, _number(bar.get("4. close"), np.nan))
+            for day, bar in series.items()
+            if start.isoformat() <= day < end.isoformat()
+        )
+        if not rows:
+            return None
+        dates = np.array([day for day, _ in rows], dtype="datetime64[D]")
+        closes = np.array([close for _, close in rows], dtype=float)
+        return dates, closes
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        # Alpha Vantage has no multi-symbol history endpoint; the pooled client
+        # and per-upstream cap keep the per-symbol calls cheap
+        results = await asyncio.gather(
+            *(self._daily_closes(symbol, start, end) for symbol in symbols),
+            return_exceptions=True
+        )
+        closes: Dict[str, DailyCloses] = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Alpha Vantage history for {symbol} failed: {str(result)}")
+            elif result is not None:
+                closes[symbol] = result
+        return closes
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,115 @@
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Dict, List, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fields every provider returns from get_stock_info, besides "symbol"
+STOCK_INFO_FIELDS = (
+    "name", "sector", "industry", "market_cap", "current_price", "52_week_high",
+    "52_week_low", "pe_ratio", "beta", "dividend_yield",
+)
+
+# (dates as datetime64[D], closes as float64) for one symbol, oldest first
+DailyCloses = Tuple[np.ndarray, np.ndarray]
+
+
+class MarketDataProvider(ABC):
+    """Source of stock fundamentals, latest prices and daily price history"""
+
+    name: str = "provider"
+
+    @abstractmethod
+    async def get_stock_info(self, symbol: str) -> Dict:
+        """Stock information with the fields listed in ``STOCK_INFO_FIELDS``"""
+
+    @abstractmethod
+    async def get_latest_price(self, symbol: str) -> float:
+        """Most recent traded price"""
+
+    async def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest prices for many symbols; symbols that fail are left out"""
+        prices = await asyncio.gather(
+            *(self.get_latest_price(symbol) for symbol in symbols), return_exceptions=True
+        )
+        return {
+            symbol: price
+            for symbol, price in zip(symbols, prices)
+            if not isinstance(price, BaseException)
+        }
+
+    @abstractmethod
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        """Completed daily closes in ``[start, end)``; symbols without data are left out"""
+
+    def warm_up(self):
+        """Load heavy libraries ahead of the first request; blocking, so run it off the loop"""
+
+    async def aclose(self):
+        """Release pooled connections"""
+
+
+class ProviderChain(MarketDataProvider):
+    """Tries providers in order, falling back to the next one on failure or missing data"""
+
+    def __init__(self, providers: List[MarketDataProvider]):
+        if not providers:
+            raise ValueError("At least one market data provider is required")
+        self.providers = providers
+        self.name = providers[0].name
+
+    async def _first(self, method: str, *args):
+        error: Exception = LookupError("No market data provider configured")
+        for provider in self.providers:
+            try:
+                return await getattr(provider, method)(*args)
+            except Exception as e:
+                logger.warning(f"{provider.name} {method}{args} failed: {str(e)}")
+                error = e
+        raise error
+
+    async def get_stock_info(self, symbol: str) -> Dict:
+        return await self._first("get_stock_info", symbol)
+
+    async def get_latest_price(self, symbol: str) -> float:
+        return await self._first("get_latest_price", symbol)
+
+    async def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        prices: Dict[str, float] = {}
+        for provider in self.providers:
+            missing = [symbol for symbol in symbols if symbol not in prices]
+            if not missing:
+                break
+            try:
+                prices.update(await provider.get_latest_prices(missing))
+            except Exception as e:
+                logger.warning(f"{provider.name} bulk price fetch failed: {str(e)}")
+        return prices
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        closes: Dict[str, DailyCloses] = {}
+        for provider in self.providers:
+            missing = [symbol for symbol in symbols if symbol not in closes]
+            if not missing:
+                break
+            try:
+                closes.update(await provider.get_daily_closes(missing, start, end))
+            except Exception as e:
+                logger.warning(f"{provider.name} history fetch failed: {str(e)}")
+        return closes
+
+    def warm_up(self):
+        for provider in self.providers:
+            provider.warm_up()
+
+    async def aclose(self):
+        for provider in self.providers:
+            await provider.aclose()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+from datetime import date
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.market_data.base import DailyCloses, MarketDataProvider, STOCK_INFO_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class FixtureProvider(MarketDataProvider):
+    """Deterministic market data read from local files, for offline runs and benchmarks.
+
+    Directory layout:
+    - ``info.json``: ``{"AAPL": {"name": ..., "sector": ..., ...}, ...}``
+    - ``prices/<SYMBOL>.csv``: ``date,close`` rows, oldest first
+
+    An optional fixed ``latency`` (seconds) is added to every call to mimic a
+    remote upstream.
+    """
+
+    name = "fixture"
+
+    def __init__(
+        self,
+        directory: str = settings.MARKET_DATA_FIXTURE_DIR,
+        latency: float = settings.MARKET_DATA_FIXTURE_LATENCY
+    ):
+        self.directory = directory
+        self.latency = latency
+        self._info: Optional[Dict[str, Dict]] = None
+        self._closes: Dict[str, Optional[DailyCloses]] = {}
+
+    @staticmethod
+    def write(directory: str, stock_info: Dict[str, Dict], closes: Dict[str, DailyCloses]):
+        """Write a fixture directory from stock info records and daily closes"""
+        os.makedirs(os.path.join(directory, "prices"), exist_ok=True)
+        with open(os.path.join(directory, "info.json"), "w") as f:
+            json.dump(stock_info, f, indent=2)
+        for symbol, (dates, values) in closes.items():
+            with open(os.path.join(directory, "prices", f"{symbol}.csv"), "w") as f:
+                f.write("date,close\n")
+                f.writelines(f"{day},{value:.6f}\n" for day, value in zip(dates, values))
+
+    async def _delay(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    def _load_info(self) -> Dict[str, Dict]:
+        if self._info is None:
+            with open(os.path.join(self.directory, "info.json")) as f:
+                self._info = json.load(f)
+        return self._info
+
+    def _load_closes(self, symbol: str) -> Optional[DailyCloses]:
+        if symbol not in self._closes:
+            path = os.path.join(self.directory, "prices", f"{symbol}.csv")
+            if not os.path.exists(path):
+                self._closes[symbol] = None
+            else:
+                with open(path) as f:
+                    rows = [line.strip().split(",") for line in f.readlines()[1:] if line.strip()]
+                self._closes[symbol] = (
+                    np.array([row[0] for row in rows], dtype="datetime64[D]"),
+                    np.array([float(row[1]) for row in rows])
+                )
+        return self._closes[symbol]
+
+    async def get_stock_info(self, symbol: str) -> Dict:
+        await self._delay()
+        info = self._load_info().get(symbol)
+        if info is None:
+            raise LookupError(f"No fixture stock info for {symbol}")
+        defaults = {"name": symbol, "sector": "Unknown", "industry": "Unknown", "beta": 1.0}
+        return {
+            "symbol": symbol,
+            **{field: info.get(field, defaults.get(field, 0)) for field in STOCK_INFO_FIELDS}
+        }
+
+    async def get_latest_price(self, symbol: str) -> float:
+        return (await self.get_stock_info(symbol))["current_price"]
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        await self._delay()
+        lo, hi = np.datetime64(start, "D"), np.datetime64(end, "D")
+        closes: Dict[str, DailyCloses] = {}
+        for symbol in symbols:
+            series = self._load_closes(symbol)
+            if series is None:
+                continue
+            dates, values = series
+            mask = (dates >= lo) & (dates < hi)
+            if mask.any():
+                closes[symbol] = (dates[mask], values[mask])
+        return closes
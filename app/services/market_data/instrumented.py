@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Dict, List
+
+from app.core import metrics
+from app.services.market_data.base import DailyCloses, MarketDataProvider
+
+
+class InstrumentedProvider(MarketDataProvider):
+    """Records latency, outcome and symbol count of every call to the wrapped provider"""
+
+    def __init__(self, provider: MarketDataProvider):
+        self.provider = provider
+        self.name = provider.name
+
+    async def get_stock_info(self, symbol: str) -> Dict:
+        with metrics.upstream_call(self.name, "stock_info"):
+            return await self.provider.get_stock_info(symbol)
+
+    async def get_latest_price(self, symbol: str) -> float:
+        with metrics.upstream_call(self.name, "latest_price"):
+            return await self.provider.get_latest_price(symbol)
+
+    async def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        with metrics.upstream_call(self.name, "latest_prices", len(symbols)):
+            return await self.provider.get_latest_prices(symbols)
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        with metrics.upstream_call(self.name, "daily_closes", len(symbols)):
+            return await self.provider.get_daily_closes(symbols, start, end)
+
+    def warm_up(self):
+        self.provider.warm_up()
+
+    async def aclose(self):
+        await self.provider.aclose()
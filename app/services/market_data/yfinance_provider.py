@@ -0,0 +1,122 @@
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterator, List
+import logging
+
+from app.core.config import settings
+from app.services.fetch_engine import UpstreamThrottled, fetch_engine
+from app.services.market_data.base import DailyCloses, MarketDataProvider
+
+logger = logging.getLogger(__name__)
+
+
+def _yfinance():
+    """Import yfinance (and pandas with it) on first use; it dominates cold start time"""
+    import yfinance
+
+    return yfinance
+
+
+@contextmanager
+def _rate_limit_errors() -> Iterator[None]:
+    """Re-raise yfinance's rate limit error as UpstreamThrottled so the fetch engine backs off"""
+    try:
+        yield
+    except _yfinance().exceptions.YFRateLimitError as e:
+        raise UpstreamThrottled(f"yfinance: {str(e)}") from e
+
+
+class _DownloadErrors(logging.Handler):
+    """Collects the errors ``yf.download`` logs on the calling thread instead of raising them"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        if record.thread == self.thread:
+            self.messages.append(record.getMessage())
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Market data scraped through yfinance; blocking calls run in the fetch engine"""
+
+    name = "yfinance"
+
+    @staticmethod
+    def _fetch_stock_info(symbol: str) -> Dict:
+        """Blocking fetch of stock information from yfinance"""
+        with _rate_limit_errors():
+            info = _yfinance().Ticker(symbol).info
+
+        return {
+            "symbol": symbol,
+            "name": info.get("longName", symbol),
+            "sector": info.get("sector", "Unknown"),
+            "industry": info.get("industry", "Unknown"),
+            "market_cap": info.get("marketCap", 0),
+            "current_price": info.get("currentPrice", info.get("regularMarketPrice", 0)),
+            "52_week_high": info.get("fiftyTwoWeekHigh", 0),
+            "52_week_low": info.get("fiftyTwoWeekLow", 0),
+            "pe_ratio": info.get("trailingPE", 0),
+            "beta": info.get("beta", 1.0),
+            "dividend_yield": info.get("dividendYield", 0),
+        }
+
+    @staticmethod
+    def _fetch_latest_price(symbol: str) -> float:
+        """Blocking fetch of only the latest price, much lighter than ``Ticker.info``"""
+        with _rate_limit_errors():
+            return float(_yfinance().Ticker(symbol).fast_info.last_price)
+
+    @staticmethod
+    def _download(symbols: List[str], start: date, end: date) -> Dict[str, DailyCloses]:
+        """Blocking batched download of daily closes in ``[start, end)``.
+
+        ``yf.download`` logs per-symbol failures and returns empty columns, so a
+        rate-limited download would otherwise look like a day without new bars.
+        """
+        errors = _DownloadErrors()
+        yf_logger = logging.getLogger("yfinance")
+        yf_logger.addHandler(errors)
+        try:
+            data = _yfinance().download(
+                symbols, start=start.isoformat(), end=end.isoformat(), progress=False
+            )
+        finally:
+            yf_logger.removeHandler(errors)
+        if any("YFRateLimitError" in message or "Too Many Requests" in message for message in errors.messages):
+            raise UpstreamThrottled(f"yfinance rate limited the download of {len(symbols)} symbols")
+
+        if data is None or data.empty:
+            return {}
+
+        closes = data["Close"]
+        if closes.ndim == 1:
+            closes = closes.to_frame(symbols[0])
+
+        dates = closes.index.values.astype("datetime64[D]")
+        return {
+            symbol: (dates, closes[symbol].to_numpy(dtype=float))
+            for symbol in symbols
+            if symbol in closes.columns
+        }
+
+    def warm_up(self):
+        _yfinance()
+
+    async def get_stock_info(self, symbol: str) -> Dict:
+        return await fetch_engine.run(self.name, self._fetch_stock_info, symbol)
+
+    async def get_latest_price(self, symbol: str) -> float:
+        return await fetch_engine.run(self.name, self._fetch_latest_price, symbol)
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        return await fetch_engine.run(
+            self.name, self._download, symbols, start, end,
+            timeout=settings.PRICE_STORE_DOWNLOAD_TIMEOUT
+        )
@@ -0,0 +1,289 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.portfolio import MonteCarloRequest, MonteCarloResult
+from app.services.stock_data_service import StockDataService
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Normal draws per chunk (8MB of float64), so a worker's memory stays flat however many paths
+CHUNK_ELEMENTS = 1 << 20
+
+# Log-wealth histogram bins per checkpoint; percentiles interpolate within a bin
+HISTOGRAM_BINS = 4096
+
+# Histogram range in daily standard deviations (scaled by √days) beyond the drifts
+HISTOGRAM_WIDTH = 8.0
+
+
+@dataclass
+class SimulationModel:
+    """Daily log-return model of a buy-and-hold portfolio"""
+    weights: np.ndarray
+    drift: np.ndarray
+    cholesky: np.ndarray
+    checkpoints: np.ndarray
+
+    @property
+    def step_days(self) -> np.ndarray:
+        return np.diff(np.concatenate(([0], self.checkpoints)))
+
+    def histogram_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Lowest log-wealth and bin width per checkpoint.
+
+        Log-wealth of a buy-and-hold portfolio lies between its assets' cumulative
+        log returns, so the range spans the extreme drifts widened by the largest
+        volatility.
+        """
+        sigma = np.sqrt((self.cholesky ** 2).sum(axis=1)).max()
+        spread = HISTOGRAM_WIDTH * sigma * np.sqrt(self.checkpoints)
+        low = self.checkpoints * self.drift.min() - spread
+        high = self.checkpoints * self.drift.max() + spread
+        return low, (high - low) / HISTOGRAM_BINS
+
+
+@dataclass
+class ChunkTotals:
+    """What a run of chunks contributes to the result; adding totals is exact for counts"""
+    counts: np.ndarray
+    wealth_sums: List[np.ndarray]
+    losses: int
+
+    def merge(self, other: "ChunkTotals") -> "ChunkTotals":
+        return ChunkTotals(
+            self.counts + other.counts, self.wealth_sums + other.wealth_sums, self.losses + other.losses
+        )
+
+
+def cholesky_factor(cov: np.ndarray) -> np.ndarray:
+    """Lower Cholesky factor, adding diagonal jitter when the sample covariance is singular"""
+    scale = float(np.trace(cov)) / len(cov) or 1e-12
+    jitter = 0.0
+    for _ in range(12):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 10
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+
+def chunk_sizes(paths: int, model: SimulationModel) -> List[int]:
+    """Split ``paths`` into chunks of bounded size; the split depends only on the inputs"""
+    per_chunk = max(1, CHUNK_ELEMENTS // (len(model.checkpoints) * len(model.weights)))
+    full, rest = divmod(paths, per_chunk)
+    return [per_chunk] * full + ([rest] if rest else [])
+
+
+def simulate_chunks(
+    model: SimulationModel, sizes: Sequence[int], seeds: Sequence[np.random.SeedSequence]
+) -> ChunkTotals:
+    """Draw each chunk's paths from its own seed and histogram their log-wealth.
+
+    Gaussian daily log returns aggregate exactly, so paths are drawn only at the
+    checkpoints: the increment over d days is d·μ + √d·Lz.
+    """
+    low, width = model.histogram_edges()
+    steps = len(model.checkpoints)
+    scale = np.sqrt(model.step_days)[:, None]
+    offsets = np.arange(steps)[:, None] * HISTOGRAM_BINS
+
+    counts = np.zeros(steps * HISTOGRAM_BINS, dtype=np.int64)
+    wealth_sums, losses = [], 0
+    for size, seed in zip(sizes, seeds):
+        rng = np.random.default_rng(seed)
+        shocks = rng.standard_normal((size, steps, len(model.weights))) @ model.cholesky.T
+        log_growth = np.cumsum(shocks * scale + model.drift * model.step_days[:, None], axis=1)
+        wealth = np.exp(log_growth) @ model.weights
+
+        bins = np.clip(((np.log(wealth) - low) / width).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+        counts += np.bincount((bins.T + offsets).ravel(), minlength=len(counts))
+        wealth_sums.append(wealth.sum(axis=0))
+        losses += int((wealth[:, -1] < 1).sum())
+    return ChunkTotals(counts.reshape(steps, HISTOGRAM_BINS), wealth_sums, losses)
+
+
+def histogram_percentiles(
+    counts: np.ndarray, low: np.ndarray, width: np.ndarray, percentiles: Sequence[float]
+) -> np.ndarray:
+    """Wealth percentiles (checkpoints x percentiles), interpolating log-wealth within bins"""
+    cdf = np.cumsum(counts, axis=1) / counts.sum(axis=1, keepdims=True)
+    result = np.empty((len(counts), len(percentiles)))
+    for column, percentile in enumerate(percentiles):
+        target = percentile / 100
+        index = np.minimum((cdf < target).sum(axis=1), HISTOGRAM_BINS - 1)
+        rows = np.arange(len(counts))
+        below = np.where(index > 0, cdf[rows, np.maximum(index - 1, 0)], 0.0)
+        share = counts[rows, index] / counts.sum(axis=1)
+        fraction = np.clip((target - below) / np.where(share > 0, share, 1.0), 0.0, 1.0)
+        result[:, column] = np.exp(low + (index + fraction) * width)
+    return result
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: the cgroup CPU quota (containers) or the affinity mask"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+class MonteCarloEngine:
+    """Runs simulations off the event loop, on a process pool for large path counts.
+
+    Every chunk has its own child of the request seed, so results are identical
+    however chunks are spread across workers.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.MONTE_CARLO_WORKERS,
+        pool_min_paths: int = settings.MONTE_CARLO_POOL_MIN_PATHS
+    ):
+        # Each worker costs ~90MB (imports plus chunk arrays), so the default is capped
+        self.workers = workers or min(available_cpus(), settings.MONTE_CARLO_MAX_WORKERS)
+        self.pool_min_paths = pool_min_paths
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers don't inherit the server's threads and event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, model: SimulationModel, paths: int, seed: int) -> ChunkTotals:
+        sizes = chunk_sizes(paths, model)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        loop = asyncio.get_running_loop()
+
+        if paths < self.pool_min_paths or self.workers == 1:
+            return await loop.run_in_executor(None, simulate_chunks, model, sizes, seeds)
+
+        # Contiguous runs of chunks per worker keep the per-chunk sums in order
+        groups = np.array_split(np.arange(len(sizes)), min(self.workers, len(sizes)))
+        results = await asyncio.gather(*(
+            loop.run_in_executor(
+                self.executor, simulate_chunks, model,
+                [sizes[i] for i in group], [seeds[i] for i in group]
+            )
+            for group in groups
+        ))
+        totals = results[0]
+        for result in results[1:]:
+            totals = totals.merge(result)
+        return totals
+
+    def shutdown(self):
+        """Stop worker processes without waiting for running simulations"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+monte_carlo_engine = MonteCarloEngine()
+
+
+def build_model(returns: np.ndarray, weights: np.ndarray, horizon_days: int) -> SimulationModel:
+    """Fit Gaussian daily log returns to a (days x assets) simple-returns window"""
+    log_returns = np.log1p(returns)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+    steps = min(horizon_days, settings.MONTE_CARLO_MAX_STEPS)
+    checkpoints = np.unique(np.round(np.linspace(0, horizon_days, steps + 1)).astype(np.int64))[1:]
+    return SimulationModel(
+        weights=weights,
+        drift=log_returns.mean(axis=0),
+        cholesky=cholesky_factor(cov),
+        checkpoints=checkpoints,
+    )
+
+
+async def run_simulation(request: MonteCarloRequest) -> MonteCarloResult:
+    """Simulate the request's allocation from its holdings' last year of daily returns"""
+    symbols = list(dict.fromkeys(holding.symbol for holding in request.holdings))
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    weights = np.zeros(len(symbols))
+    for holding in request.holdings:
+        weights[column[holding.symbol]] += holding.allocation
+    weights /= weights.sum()
+
+    with metrics.stage("price_history"):
+        returns = await StockDataService.get_returns_window(symbols)
+    if len(returns) < 2:
+        raise ValueError(f"Not enough price history for {', '.join(symbols)}")
+
+    summary = await simulate(
+        returns, weights, request.horizon_days, request.paths, request.seed, request.total_value or 1.0
+    )
+    return MonteCarloResult(**summary)
+
+
+async def simulate(
+    returns: np.ndarray,
+    weights: np.ndarray,
+    horizon_days: int,
+    paths: int,
+    seed: Optional[int] = None,
+    initial_value: float = 1.0
+) -> dict:
+    """Forward-simulate buy-and-hold wealth and summarize it per checkpoint"""
+    seed = seed if seed is not None else secrets.randbelow(2 ** 32)
+    model = build_model(returns, weights, horizon_days)
+    with metrics.stage("monte_carlo"):
+        totals = await monte_carlo_engine.run(model, paths, seed)
+
+    low, width = model.histogram_edges()
+    bands = histogram_percentiles(totals.counts, low, width, PERCENTILES) * initial_value
+    means = np.sum(totals.wealth_sums, axis=0) / paths * initial_value
+    return {
+        "paths": paths,
+        "horizon_days": horizon_days,
+        "seed": seed,
+        "bands": [
+            {
+                "day": int(day),
+                **{f"p{p}": round(float(value), 4) for p, value in zip(PERCENTILES, row)},
+                "mean": round(float(mean), 4),
+            }
+            for day, row, mean in zip(model.checkpoints, bands, means)
+        ],
+        "expected_final_value": round(float(means[-1]), 4),
+        "probability_of_loss": round(totals.losses / paths * 100, 4),
+    }
@@ -0,0 +1,326 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.risk_engine import TRADING_DAYS
+
+OBJECTIVES = ("min_variance", "max_sharpe", "risk_parity", "hhi_capped")
+
+# Bisection steps for the feasible sector cap and the HHI-capped target
+BISECTION_STEPS = 50
+
+
+@dataclass
+class OptimizationResult:
+    """Target weights for one objective and the statistics they imply"""
+    objective: str
+    weights: np.ndarray
+    volatility: float
+    expected_return: float
+    sharpe_ratio: Optional[float]
+    hhi: float
+    iterations: int
+    converged: bool
+
+
+class FeasibleSet:
+    """Budget (weights sum to 1), per-asset bounds and per-sector caps.
+
+    Euclidean projection onto the set is exact: every asset's weight is
+    clip(v - θ, lower, upper) with θ = max(τ, θ_s) for its sector s. θ_s is where
+    the sector's sum would hit its cap, found for all sectors at once, and τ is the
+    budget threshold.
+    """
+
+    def __init__(
+        self,
+        sectors: Sequence[str],
+        max_weight: float = 1.0,
+        max_sector_weight: float = 1.0,
+        long_only: bool = True
+    ):
+        n = len(sectors)
+        # Raise caps a small portfolio can't satisfy to the smallest feasible values
+        self.upper = max(max_weight, 1.0 / n)
+        self.lower = 0.0 if long_only else -self.upper
+
+        names, sector_index = np.unique(np.asarray(sectors, dtype=object), return_inverse=True)
+        self.order = np.argsort(sector_index, kind="stable")
+        self.sector_of = sector_index[self.order]
+        counts = np.bincount(sector_index, minlength=len(names))
+        self.starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        capacity = counts * self.upper
+        cap = max_sector_weight
+        if np.minimum(cap, capacity).sum() < 1:
+            low, high = cap, 1.0
+            for _ in range(BISECTION_STEPS):
+                mid = (low + high) / 2
+                low, high = (mid, high) if np.minimum(mid, capacity).sum() < 1 else (low, mid)
+            cap = high
+        self.sector_caps = np.full(len(names), cap)
+        # Sectors whose assets can never exceed the cap need no threshold
+        self.binding = capacity > cap + 1e-12
+
+    def _sector_sums(self, weights: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(weights, self.starts)
+
+    @staticmethod
+    def _threshold(
+        sums_at: Callable[[np.ndarray], np.ndarray], points: np.ndarray, target: np.ndarray
+    ) -> np.ndarray:
+        """Per-group θ with sums_at(θ) == target for sums non-increasing and piecewise
+        linear in θ with kinks only at ``points``: binary search over the sorted kinks,
+        then interpolate exactly within the linear piece."""
+        points = np.sort(points)
+        low = np.zeros(len(target), dtype=int)
+        high = np.full(len(target), len(points) - 1)
+        while np.any(high - low > 1):
+            mid = (low + high) // 2
+            over = sums_at(points[mid]) > target
+            low = np.where(over, mid, low)
+            high = np.where(over, high, mid)
+        at_low, at_high = sums_at(points[low]), sums_at(points[high])
+        span = np.where(at_low > at_high, at_low - at_high, 1.0)
+        fraction = np.clip((at_low - target) / span, 0.0, 1.0)
+        return points[low] + fraction * (points[high] - points[low])
+
+    def project(self, v: np.ndarray) -> np.ndarray:
+        """Closest point of the set to ``v``"""
+        v = v[self.order]
+        lower, upper = self.lower, self.upper
+        kinks = np.concatenate((v - upper, v - lower))
+
+        # Per-sector thresholds where the sector sum equals its cap (-inf if it can't bind)
+        theta_of = np.full(len(v), -np.inf)
+        if self.binding.any():
+            sector_theta = self._threshold(
+                lambda theta: self._sector_sums(np.clip(v - theta[self.sector_of], lower, upper)),
+                kinks, self.sector_caps
+            )
+            theta_of = np.where(self.binding, sector_theta, -np.inf)[self.sector_of]
+
+        # Budget threshold; the weights' sum also kinks where τ crosses a sector threshold
+        budget_kinks = np.concatenate((kinks, theta_of[np.isfinite(theta_of)]))
+        tau = self._threshold(
+            lambda t: np.clip(v - np.maximum(t, theta_of), lower, upper).sum(keepdims=True),
+            budget_kinks, np.ones(1)
+        )
+        projected = np.clip(v - np.maximum(tau, theta_of), lower, upper)
+
+        result = np.empty_like(projected)
+        result[self.order] = projected
+        return result
+
+
+def _accelerated_projected_gradient(
+    objective: Callable[[np.ndarray], Tuple[float, np.ndarray]],
+    project: Callable[[np.ndarray], np.ndarray],
+    start: np.ndarray,
+    step: float,
+    max_iterations: int,
+    tolerance: float
+) -> Tuple[np.ndarray, int, bool]:
+    """FISTA with backtracking and adaptive restart; returns (x, iterations, converged)"""
+    x = project(start)
+    fx, _ = objective(x)
+    y, momentum = x, 1.0
+
+    for iteration in range(1, max_iterations + 1):
+        fy, gradient = objective(y)
+        while True:
+            candidate = project(y - step * gradient)
+            move = candidate - y
+            f_candidate, _ = objective(candidate)
+            if f_candidate <= fy + gradient @ move + (move @ move) / (2 * step) + 1e-15:
+                break
+            step /= 2
+
+        if f_candidate > fx and momentum > 1:
+            # Momentum overshot: restart from the last iterate
+            y, momentum = x, 1.0
+            continue
+
+        next_momentum = (1 + (1 + 4 * momentum ** 2) ** 0.5) / 2
+        y = candidate + (momentum - 1) / next_momentum * (candidate - x)
+        converged = np.abs(candidate - x).max() < tolerance
+        x, fx, momentum = candidate, f_candidate, next_momentum
+        if converged:
+            return x, iteration, True
+
+    return x, max_iterations, False
+
+
+def _risk_parity_weights(cov: np.ndarray, max_iterations: int = 50) -> Tuple[np.ndarray, int, bool]:
+    """Unconstrained equal risk contribution weights by Newton's method.
+
+    Minimizes ½yᵀΣy - Σ ln(y_i)/n over y > 0 (Spinu's convex formulation); the
+    normalized minimizer has every asset contributing the same risk.
+    """
+    n = len(cov)
+    budget = np.full(n, 1.0 / n)
+    y = 1 / np.sqrt(np.clip(np.diag(cov), 1e-18, None))
+    y /= np.sqrt(y @ cov @ y)
+
+    def value(point: np.ndarray) -> float:
+        return 0.5 * point @ cov @ point - budget @ np.log(point)
+
+    for iteration in range(1, max_iterations + 1):
+        gradient = cov @ y - budget / y
+        hessian = cov + np.diag(budget / y ** 2)
+        step = np.linalg.solve(hessian, -gradient)
+        decrement = -gradient @ step
+        if decrement / 2 < 1e-12:
+            return y / y.sum(), iteration, True
+
+        # Damped step that keeps y strictly positive and decreases the objective
+        shrink = 1.0
+        while np.any(y + shrink * step <= 0) or value(y + shrink * step) > value(y) - 0.25 * shrink * decrement:
+            shrink /= 2
+            if shrink < 1e-12:
+                return y / y.sum(), iteration, False
+        y = y + shrink * step
+
+    return y / y.sum(), max_iterations, False
+
+
+def optimize(
+    returns: np.ndarray,
+    sectors: Sequence[str],
+    objective: str = settings.OPTIMIZER_OBJECTIVE,
+    current_weights: Optional[np.ndarray] = None,
+    max_weight: float = 1.0,
+    max_sector_weight: float = 1.0,
+    hhi_cap: float = 1.0,
+    long_only: bool = True,
+    risk_free_rate: float = settings.RISK_FREE_RATE,
+    max_iterations: int = 500,
+    tolerance: float = 1e-7
+) -> OptimizationResult:
+    """Solve for target weights over a (days x assets) returns matrix.
+
+    Caps are fractions; ones a small portfolio can't satisfy are raised to the
+    smallest feasible values.
+
+    - ``min_variance``: lowest volatility
+    - ``max_sharpe``: highest historical Sharpe ratio
+    - ``risk_parity``: equal risk contributions (constrained risk budgeting when caps bind)
+    - ``hhi_capped``: closest weights to ``current_weights`` whose HHI is at most ``hhi_cap``
+
+    All targets respect the budget, ``max_weight`` per asset, ``max_sector_weight``
+    per sector and, with ``long_only``, no short positions.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown optimization objective: {objective}")
+
+    days, n = returns.shape
+    mean = returns.mean(axis=0)
+    centered = (returns - mean) / np.sqrt(days - 1)
+    feasible = FeasibleSet(sectors, max_weight, max_sector_weight, long_only)
+    start = np.full(n, 1.0 / n) if current_weights is None else np.asarray(current_weights, dtype=float)
+
+    def cov_times(weights: np.ndarray) -> np.ndarray:
+        # Σw as Rcᵀ(Rc w), never forming Σ
+        return centered.T @ (centered @ weights)
+
+    # Largest eigenvalue of Σ by power iteration sets the initial gradient step
+    probe = np.ones(n) / np.sqrt(n)
+    for _ in range(20):
+        probe = cov_times(probe)
+        probe /= np.linalg.norm(probe) or 1.0
+    largest = max(float(probe @ cov_times(probe)), 1e-12)
+
+    iterations, converged = 0, True
+    if objective == "min_variance":
+        def variance(weights):
+            cov_w = cov_times(weights)
+            return weights @ cov_w, 2 * cov_w
+
+        weights, iterations, converged = _accelerated_projected_gradient(
+            variance, feasible.project, start, 1 / (2 * largest), max_iterations, tolerance
+        )
+
+    elif objective == "max_sharpe":
+        daily_rf = risk_free_rate / TRADING_DAYS
+
+        def negative_sharpe(weights):
+            cov_w = cov_times(weights)
+            sigma = max(float(np.sqrt(max(weights @ cov_w, 0.0))), 1e-12)
+            excess = mean @ weights - daily_rf
+            gradient = -(mean / sigma - excess * cov_w / sigma ** 3)
+            return -excess / sigma, gradient
+
+        weights, iterations, converged = _accelerated_projected_gradient(
+            negative_sharpe, feasible.project, start, 1.0, max_iterations, tolerance
+        )
+
+    elif objective == "risk_parity":
+        cov = centered.T @ centered
+        weights, iterations, converged = _risk_parity_weights(cov)
+        if np.abs(feasible.project(weights) - weights).max() > 1e-9:
+            # Caps bind: minimize ½wᵀΣw - λΣln(w_i)/n over the feasible set, with λ = σ²
+            # of the unconstrained solution so the two coincide when nothing binds
+            strength = float(weights @ cov @ weights)
+            floor = 1e-6
+
+            def budgeted(point):
+                safe = np.clip(point, floor, None)
+                cov_w = cov @ point
+                value = 0.5 * point @ cov_w - strength * np.log(safe).sum() / n
+                return value, cov_w - strength / (n * safe)
+
+            weights, more, converged = _accelerated_projected_gradient(
+                budgeted, lambda v: np.clip(feasible.project(v), floor, None), weights,
+                1 / largest, max_iterations, tolerance
+            )
+            iterations += more
+
+    else:
+        # w(γ) = Proj(w₀ / (1 + γ)) has HHI non-increasing in γ; bisect for HHI = cap
+        cap = max(hhi_cap, 1.0 / n)
+        target = feasible.project(start)
+        if target @ target > cap:
+            low, high = 0.0, 1.0
+            while (lambda w: w @ w)(feasible.project(start / (1 + high))) > cap and high < 1e9:
+                high *= 4
+            for iterations in range(1, BISECTION_STEPS + 1):
+                mid = (low + high) / 2
+                candidate = feasible.project(start / (1 + mid))
+                low, high = (mid, high) if candidate @ candidate > cap else (low, mid)
+            target = feasible.project(start / (1 + high))
+        weights = target
+
+    sigma = float(np.sqrt(max(weights @ cov_times(weights), 0.0)))
+    daily_excess = float(mean @ weights) - risk_free_rate / TRADING_DAYS
+    return OptimizationResult(
+        objective=objective,
+        weights=weights,
+        volatility=sigma * 100,
+        expected_return=float(mean @ weights) * TRADING_DAYS * 100,
+        sharpe_ratio=daily_excess / sigma * TRADING_DAYS ** 0.5 if sigma > 0 else None,
+        hhi=float(weights @ weights),
+        iterations=iterations,
+        converged=converged,
+    )
+
+
+def trades(
+    symbols: List[str],
+    current_weights: np.ndarray,
+    target_weights: np.ndarray,
+    total_value: Optional[float] = None
+) -> List[dict]:
+    """Per-holding moves from current to target weights, largest first"""
+    moves = [
+        {
+            "symbol": symbol,
+            "current_weight": round(float(current) * 100, 2),
+            "target_weight": round(float(target) * 100, 2),
+            "change": round(float(target - current) * 100, 2),
+            "amount": round(float(target - current) * total_value, 2) if total_value else None,
+        }
+        for symbol, current, target in zip(symbols, current_weights, target_weights)
+    ]
+    return sorted(moves, key=lambda move: abs(move["change"]), reverse=True)
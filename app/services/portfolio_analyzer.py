@@ -1,19 +1,37 @@
-from typing import List, Dict
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple, Union
+import asyncio
 import logging
+import threading
 from collections import defaultdict
 import numpy as np
 from datetime import datetime
 import uuid
 
+from app.core import metrics
+from app.core.config import settings
 from app.models.portfolio import (
-    PortfolioRequest, PortfolioAnalysis, SectorBreakdown,
-    RiskMetrics, StockHolding
+    PortfolioRequest, PortfolioAnalysis, SectorBreakdown, RiskMetrics, RiskContribution, CorrelationCluster,
+    StockHolding, WhatIfRequest, OptimizationRequest, PortfolioOptimization, TargetAllocation
 )
+from app.services import optimizer, risk_engine
+from app.services.admission import admission
+from app.services.analysis_sessions import AnalysisSession, analysis_sessions
+from app.services.correlation import correlation_cache, effective_number_of_bets
 from app.services.stock_data_service import StockDataService
 from app.services.llm_service import LLMService
 
 logger = logging.getLogger(__name__)
 
+# Share of the longest history a symbol needs to join a batch's shared covariance window
+BATCH_SHARED_HISTORY = 0.9
+
+
+def covered_weights(weights: np.ndarray, covered: List[int]) -> np.ndarray:
+    """Weights of the covered positions, rescaled to sum to one (all zero if they hold nothing)"""
+    weights = weights[covered]
+    total = weights.sum()
+    return weights / total if total > 0 else weights
+
 
 class PortfolioAnalyzer:
     """Main service for portfolio analysis"""
@@ -23,21 +41,370 @@ class PortfolioAnalyzer:
         self.llm_service = LLMService()
 
     async def analyze_portfolio(self, portfolio: PortfolioRequest) -> PortfolioAnalysis:
-        """Perform complete portfolio analysis"""
+        """Perform complete portfolio analysis, admitted stage by stage (see ``_admitted_analysis``)"""
+        stock_details, session, parts = await self._admitted_analysis(portfolio)
+
+        analysis = await self._finish_analysis(
+            portfolio, stock_details, parts, latency_budget=settings.LLM_LATENCY_BUDGET
+        )
+        analysis_sessions.save(analysis.request_id, session)
+        return analysis
 
-        # Extract symbols and allocations
+    async def _admitted_analysis(
+        self, portfolio: PortfolioRequest
+    ) -> Tuple[List[Dict], AnalysisSession, Dict[str, Any]]:
+        """Stock details, what-if session and the deterministic parts of an analysis.
+
+        The data fetch and compute stages each wait for an admission slot and raise
+        ``Overloaded`` when their queue is full. A portfolio whose market data is all
+        cached skips the data queue only: compute is always admitted, since cached
+        data makes it no cheaper. Compute runs off the event loop.
+        """
         symbols = [holding.symbol for holding in portfolio.holdings]
-        allocations = [holding.allocation for holding in portfolio.holdings]
+        weights = np.array([holding.allocation / 100 for holding in portfolio.holdings])
 
-        # Fetch stock data
-        stock_details = await self.stock_service.get_batch_stock_info(symbols)
+        async with admission.stage("data", bypass=self.stock_service.is_cached(symbols)):
+            stock_details, returns, covered = await self._fetch_data(symbols)
+        async with admission.stage("compute"):
+            risk, parts = await asyncio.to_thread(
+                self._compute_analysis, portfolio, stock_details, returns, weights, covered
+            )
+        session = AnalysisSession(
+            portfolio.holdings, stock_details, risk, portfolio.optimization, covered=covered
+        )
+        return stock_details, session, parts
+
+    async def what_if(self, request_id: str, changes: WhatIfRequest) -> Optional[PortfolioAnalysis]:
+        """Re-analyze an earlier analysis with changed allocations, without refetching.
+
+        Stock details and the returns matrix come from the earlier analysis, and
+        risk is re-priced with low-rank updates for the holdings that moved. Returns
+        None if the earlier analysis is unknown or expired.
+        """
+        session = analysis_sessions.get(request_id)
+        if session is None:
+            return None
+
+        unknown = set(changes.allocations) - {holding.symbol for holding in session.holdings}
+        if unknown:
+            raise ValueError(
+                f"Symbols not in the original portfolio: {', '.join(sorted(unknown))}"
+            )
+
+        with metrics.stage("whatif"):
+            # A symbol listed twice in the original keeps its new allocation on the first entry
+            pending = dict(changes.allocations)
+            holdings = [
+                holding.model_copy(update={"allocation": pending.pop(holding.symbol)})
+                if holding.symbol in pending else holding
+                for holding in session.holdings
+            ]
+            weights = np.array([holding.allocation / 100 for holding in holdings])
+            covered = session.covered if session.covered is not None else list(range(len(holdings)))
+            risk_weights = covered_weights(weights, covered)
+            report = session.risk.update(risk_weights) if session.risk is not None and risk_weights.any() else None
+
+            # Dropped holdings stay in the session (with zero weight) so they can come back
+            kept = [i for i, holding in enumerate(holdings) if holding.allocation > 0]
+            portfolio = PortfolioRequest(
+                holdings=[holdings[i] for i in kept], optimization=session.optimization
+            )
+            stock_details = [session.stock_details[i] for i in kept]
+            # Risk columns still held, and where those holdings sit in the new portfolio
+            columns = [column for column, i in enumerate(covered) if holdings[i].allocation > 0]
+            position = {i: p for p, i in enumerate(kept)}
+            kept_covered = [position[covered[column]] for column in columns]
+            returns = None
+            if report is not None:
+                report = risk_engine.select_assets(report, columns)
+                returns = session.risk.centered[:, columns] + session.risk.mean[columns]
+            parts = self._analyze_holdings(portfolio, stock_details, report, returns, session, kept_covered)
+
+        session.holdings = holdings
+        analysis_sessions.save(request_id, session)
+
+        if changes.include_ai_insights:
+            with metrics.stage("llm"):
+                ai_insights, insight_job_id = await self.llm_service.generate_portfolio_insights_within(
+                    portfolio_summary=parts["portfolio_summary"],
+                    sector_breakdown=parts["sector_breakdown"],
+                    risk_metrics=parts["risk_metrics"],
+                    stock_details=stock_details,
+                    holdings=portfolio.holdings,
+                    latency_budget=settings.LLM_LATENCY_BUDGET
+                )
+        else:
+            ai_insights, insight_job_id = self.llm_service._generate_fallback_insights(
+                parts["portfolio_summary"], parts["sector_breakdown"], parts["risk_metrics"]
+            ), None
+
+        return PortfolioAnalysis(
+            request_id=request_id,
+            timestamp=datetime.utcnow(),
+            ai_insights=ai_insights,
+            insight_job_id=insight_job_id,
+            **parts
+        )
+
+    async def stream_analysis(self, portfolio: PortfolioRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """Perform portfolio analysis, yielding ``(event, payload)`` pairs as each part is ready.
+
+        Deterministic results are yielded as soon as market data is in, followed by
+        the AI insights chunk by chunk and a final ``done`` event. Admission is as for
+        ``analyze_portfolio``, so ``Overloaded`` is raised before the first event.
+        """
+        stock_details, session, parts = await self._admitted_analysis(portfolio)
+        request_id = str(uuid.uuid4())
+        analysis_sessions.save(request_id, session)
+
+        yield "summary", {
+            "request_id": request_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "portfolio_summary": parts["portfolio_summary"],
+            "stock_details": stock_details,
+        }
+        yield "sector_breakdown", [sb.model_dump() for sb in parts["sector_breakdown"]]
+        yield "risk_metrics", parts["risk_metrics"].model_dump()
+        yield "recommendations", {
+            "diversification_analysis": parts["diversification_analysis"],
+            "recommendations": parts["recommendations"],
+            "optimization": (
+                parts["optimization"].model_dump() if parts["optimization"] is not None else None
+            ),
+        }
+
+        async for chunk in self.llm_service.stream_portfolio_insights(
+            portfolio_summary=parts["portfolio_summary"],
+            sector_breakdown=parts["sector_breakdown"],
+            risk_metrics=parts["risk_metrics"],
+            stock_details=stock_details,
+            holdings=portfolio.holdings
+        ):
+            yield "ai_insights", chunk
+
+        yield "done", {"request_id": request_id}
+
+    async def _fetch_data(
+        self, symbols: List[str]
+    ) -> Tuple[List[Dict], Optional[np.ndarray], Optional[List[int]]]:
+        """Stock details, the historical returns matrix (None if unavailable) and the positions it covers"""
+        with metrics.stage("stock_info"):
+            stock_details = await self.stock_service.get_batch_stock_info(symbols)
+        returns, covered = await self._returns_window(symbols)
+        return stock_details, returns, covered
+
+    @staticmethod
+    def _risk_inputs(
+        returns: Optional[np.ndarray], weights: np.ndarray
+    ) -> Tuple[Optional[risk_engine.RiskReport], Optional[risk_engine.IncrementalRisk]]:
+        """Risk report and reusable risk state from the returns matrix"""
+        if returns is None:
+            return None, None
+        try:
+            with metrics.stage("risk_model"):
+                risk = risk_engine.IncrementalRisk(returns, weights)
+                return risk.report(), risk
+        except Exception as e:
+            logger.error(f"Error calculating portfolio risk: {str(e)}")
+            return None, None
+
+    def _compute_analysis(
+        self,
+        portfolio: PortfolioRequest,
+        stock_details: List[Dict],
+        returns: Optional[np.ndarray],
+        weights: np.ndarray,
+        covered: Optional[List[int]] = None
+    ) -> Tuple[Optional[risk_engine.IncrementalRisk], Dict[str, Any]]:
+        """Risk state and every deterministic part of the analysis; CPU only, safe to run in a thread.
+
+        ``returns`` holds the ``covered`` positions only, which are risk-modelled
+        with their weights rescaled to sum to one.
+        """
+        if covered is not None:
+            weights = covered_weights(weights, covered)
+        report, risk = self._risk_inputs(returns, weights)
+        returns = risk.centered + risk.mean if risk is not None else None
+        with metrics.stage("holdings_analysis"):
+            parts = self._analyze_holdings(portfolio, stock_details, report, returns, covered=covered)
+        return risk, parts
+
+    async def analyze_batch(
+        self, portfolios: List[PortfolioRequest]
+    ) -> AsyncIterator[Tuple[int, Union[PortfolioAnalysis, Exception]]]:
+        """Analyze many portfolios, sharing data fetches and the covariance matrix.
+
+        Stock info and price history are fetched once for the union of all symbols.
+        Portfolios whose symbols all have close to the longest history share one
+        covariance matrix over their union; a portfolio holding a symbol with no or
+        short history gets its own, so the shared window is not cut down for the
+        rest. Yields ``(index, analysis)`` pairs in completion order; a portfolio
+        that fails yields its exception instead of aborting the batch.
+
+        The whole batch takes one data slot (skipped when all of it is cached) and
+        one compute slot, so ``Overloaded`` is raised before the first result.
+        """
+        universe = list(dict.fromkeys(
+            holding.symbol for portfolio in portfolios for holding in portfolio.holdings
+        ))
+
+        async with admission.stage("data", bypass=self.stock_service.is_cached(universe)):
+            with metrics.stage("stock_info"):
+                details = await self.stock_service.get_batch_stock_info(universe)
+            try:
+                with metrics.stage("price_history"):
+                    lengths = await self.stock_service.get_history_lengths(universe)
+                full = dict(zip(universe, lengths >= BATCH_SHARED_HISTORY * lengths.max()))
+            except Exception as e:
+                logger.error(f"Error loading price history: {str(e)}")
+                full = dict.fromkeys(universe, True)
+        details_by_symbol = dict(zip(universe, details))
+        stock_details = [
+            [details_by_symbol[holding.symbol] for holding in portfolio.holdings] for portfolio in portfolios
+        ]
+
+        shared = [
+            index for index, portfolio in enumerate(portfolios)
+            if all(full[holding.symbol] for holding in portfolio.holdings)
+        ]
+        if len(shared) < len(portfolios):
+            logger.info(f"{len(portfolios) - len(shared)} portfolios in batch hold short-history symbols")
+
+        async with admission.stage("compute"):
+            risk_inputs = dict(zip(shared, await self._batch_risk_inputs([portfolios[i] for i in shared])))
+            for index in range(len(portfolios)):
+                if index not in risk_inputs:
+                    risk_inputs[index], = await self._batch_risk_inputs([portfolios[index]])
+            parts = await asyncio.to_thread(self._batch_parts, portfolios, stock_details, risk_inputs)
+
+        limit = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+        async def complete(index: int) -> Tuple[int, Union[PortfolioAnalysis, Exception]]:
+            if isinstance(parts[index], Exception):
+                return index, parts[index]
+            async with limit:
+                try:
+                    return index, await self._finish_analysis(
+                        portfolios[index], stock_details[index], parts[index]
+                    )
+                except Exception as e:
+                    logger.error(f"Error analyzing portfolio {index} in batch: {str(e)}")
+                    return index, e
+
+        tasks = [asyncio.ensure_future(complete(index)) for index in range(len(portfolios))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _batch_parts(
+        self,
+        portfolios: List[PortfolioRequest],
+        stock_details: List[List[Dict]],
+        risk_inputs: Dict[int, Tuple[Optional[risk_engine.RiskReport], Optional[np.ndarray], Optional[List[int]]]]
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Deterministic parts of every portfolio's analysis, or the exception it raised"""
+        parts: List[Union[Dict[str, Any], Exception]] = []
+        with metrics.stage("holdings_analysis"):
+            for index, portfolio in enumerate(portfolios):
+                report, returns, covered = risk_inputs[index]
+                try:
+                    parts.append(self._analyze_holdings(
+                        portfolio, stock_details[index], report, returns, covered=covered
+                    ))
+                except Exception as e:
+                    logger.error(f"Error analyzing portfolio {index} in batch: {str(e)}")
+                    parts.append(e)
+        return parts
+
+    async def _batch_risk_inputs(
+        self, portfolios: List[PortfolioRequest]
+    ) -> List[Tuple[Optional[risk_engine.RiskReport], Optional[np.ndarray], Optional[List[int]]]]:
+        """Risk report, returns window and covered positions per portfolio, from one covariance over their union"""
+        if not portfolios:
+            return []
+        universe = list(dict.fromkeys(
+            holding.symbol for portfolio in portfolios for holding in portfolio.holdings
+        ))
+        weights = np.zeros((len(portfolios), len(universe)))
+        for row, portfolio in enumerate(portfolios):
+            for holding in portfolio.holdings:
+                weights[row, universe.index(holding.symbol)] += holding.allocation / 100
+        reports, returns, covered = await self._build_risk_reports(universe, weights)
+        if covered is None:
+            return [(None, None, None)] * len(portfolios)
+        column = {universe[i]: c for c, i in enumerate(covered)}
+
+        inputs = []
+        for portfolio, report in zip(portfolios, reports):
+            positions = [p for p, holding in enumerate(portfolio.holdings) if holding.symbol in column]
+            columns = [column[portfolio.holdings[p].symbol] for p in positions]
+            inputs.append((
+                risk_engine.select_assets(report, columns) if report is not None else None,
+                returns[:, columns] if returns is not None and report is not None else None,
+                positions,
+            ))
+        return inputs
+
+    async def _finish_analysis(
+        self,
+        portfolio: PortfolioRequest,
+        stock_details: List[Dict],
+        parts: Dict[str, Any],
+        latency_budget: float = 0
+    ) -> PortfolioAnalysis:
+        """Add AI insights to the deterministic parts of an analysis"""
+
+        # Generate AI insights using LLM
+        with metrics.stage("llm"):
+            ai_insights, insight_job_id = await self.llm_service.generate_portfolio_insights_within(
+                portfolio_summary=parts["portfolio_summary"],
+                sector_breakdown=parts["sector_breakdown"],
+                risk_metrics=parts["risk_metrics"],
+                stock_details=stock_details,
+                holdings=portfolio.holdings,
+                latency_budget=latency_budget
+            )
+
+        return PortfolioAnalysis(
+            request_id=str(uuid.uuid4()),
+            timestamp=datetime.utcnow(),
+            ai_insights=ai_insights,
+            insight_job_id=insight_job_id,
+            stock_details=stock_details,
+            **parts
+        )
+
+    def _analyze_holdings(
+        self,
+        portfolio: PortfolioRequest,
+        stock_details: List[Dict],
+        report: Optional[risk_engine.RiskReport],
+        returns: Optional[np.ndarray] = None,
+        session: Optional[AnalysisSession] = None,
+        covered: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """Compute every deterministic part of the analysis (everything except AI insights).
+
+        ``returns`` (days x covered holdings) enables the optimizer; a what-if
+        ``session`` lets it reuse the previous solve. ``covered`` lists the positions
+        of the holdings the report and returns cover (all of them if None); the
+        rest are reported as excluded from the risk figures.
+        """
+        if covered is None:
+            covered = list(range(len(portfolio.holdings)))
+
+        symbols = [holding.symbol for holding in portfolio.holdings]
+        allocations = [holding.allocation for holding in portfolio.holdings]
 
         # Calculate sector breakdown
         sector_breakdown = self._calculate_sector_breakdown(stock_details, portfolio.holdings)
 
         # Calculate risk metrics
-        risk_metrics = await self._calculate_risk_metrics(
-            stock_details, allocations, symbols
+        risk_metrics = self._calculate_risk_metrics(
+            stock_details, allocations, symbols, report, covered
         )
 
         # Generate diversification analysis
@@ -45,9 +412,12 @@ class PortfolioAnalyzer:
             sector_breakdown, stock_details, len(portfolio.holdings)
         )
 
+        # Optimized target weights
+        optimization = self._optimize(portfolio, stock_details, report, returns, session, covered)
+
         # Generate recommendations
         recommendations = self._generate_recommendations(
-            sector_breakdown, risk_metrics, stock_details, portfolio.holdings
+            sector_breakdown, risk_metrics, stock_details, portfolio.holdings, optimization
         )
 
         # Portfolio summary
@@ -58,25 +428,85 @@ class PortfolioAnalyzer:
             "largest_holding_pct": max(holding.allocation for holding in portfolio.holdings),
         }
 
-        # Generate AI insights using LLM
-        ai_insights = await self.llm_service.generate_portfolio_insights(
-            portfolio_summary=portfolio_summary,
-            sector_breakdown=sector_breakdown,
-            risk_metrics=risk_metrics,
-            stock_details=stock_details,
-            holdings=portfolio.holdings
-        )
+        return {
+            "portfolio_summary": portfolio_summary,
+            "sector_breakdown": sector_breakdown,
+            "risk_metrics": risk_metrics,
+            "diversification_analysis": diversification_analysis,
+            "recommendations": recommendations,
+            "optimization": optimization,
+        }
 
-        return PortfolioAnalysis(
-            request_id=str(uuid.uuid4()),
-            timestamp=datetime.utcnow(),
-            portfolio_summary=portfolio_summary,
-            sector_breakdown=sector_breakdown,
-            risk_metrics=risk_metrics,
-            diversification_analysis=diversification_analysis,
-            recommendations=recommendations,
-            ai_insights=ai_insights,
-            stock_details=stock_details
+    def _optimize(
+        self,
+        portfolio: PortfolioRequest,
+        stock_details: List[Dict],
+        report: Optional[risk_engine.RiskReport],
+        returns: Optional[np.ndarray],
+        session: Optional[AnalysisSession] = None,
+        covered: Optional[List[int]] = None
+    ) -> Optional[PortfolioOptimization]:
+        """Solve for the target weights and the trades reaching them, or None if disabled or unavailable.
+
+        Only the ``covered`` holdings are reallocated, within their current combined
+        share of the portfolio; excluded holdings keep their weights.
+        """
+        options = portfolio.optimization or OptimizationRequest()
+        objective = options.objective or settings.OPTIMIZER_OBJECTIVE
+        if covered is None:
+            covered = list(range(len(portfolio.holdings)))
+        if objective == "none" or returns is None or len(covered) < 2:
+            return None
+
+        symbols = [portfolio.holdings[i].symbol for i in covered]
+        current = np.array([holding.allocation / 100 for holding in portfolio.holdings])[covered]
+        share = current.sum()
+        weights = current / share
+        constraints = {
+            "max_weight": (options.max_weight or settings.OPTIMIZER_MAX_WEIGHT) / 100,
+            "max_sector_weight": (options.max_sector_weight or settings.OPTIMIZER_MAX_SECTOR_WEIGHT) / 100,
+            "hhi_cap": options.hhi_cap or settings.OPTIMIZER_HHI_CAP,
+            "long_only": options.long_only,
+        }
+        # Only the HHI-capped target depends on the current weights
+        key = (objective, tuple(symbols), tuple(sorted(constraints.items())))
+        try:
+            with metrics.stage("optimizer"):
+                if (
+                    session is not None and session.target is not None
+                    and session.target[0] == key and objective != "hhi_capped"
+                ):
+                    result = session.target[1]
+                else:
+                    result = optimizer.optimize(
+                        returns,
+                        [stock_details[i].get("sector", "Unknown") for i in covered],
+                        objective,
+                        weights,
+                        **constraints
+                    )
+                    if session is not None:
+                        session.target = (key, result)
+        except Exception as e:
+            logger.error(f"Error optimizing portfolio: {str(e)}")
+            return None
+
+        return PortfolioOptimization(
+            objective=objective,
+            targets=[
+                TargetAllocation(**move)
+                for move in optimizer.trades(symbols, current, result.weights * share, portfolio.total_value)
+            ],
+            current_volatility=round(report.volatility, 4) if report else None,
+            target_volatility=round(result.volatility, 4),
+            current_sharpe_ratio=(
+                round(report.sharpe_ratio, 4) if report and report.sharpe_ratio is not None else None
+            ),
+            target_sharpe_ratio=(
+                round(result.sharpe_ratio, 4) if result.sharpe_ratio is not None else None
+            ),
+            target_hhi=round(result.hhi, 4),
+            converged=result.converged,
         )
 
     def _calculate_sector_breakdown(
@@ -104,10 +534,17 @@ class PortfolioAnalyzer:
             )
         ]
 
-    async def _calculate_risk_metrics(
-        self, stock_details: List[Dict], allocations: List[float], symbols: List[str]
+    def _calculate_risk_metrics(
+        self,
+        stock_details: List[Dict],
+        allocations: List[float],
+        symbols: List[str],
+        report: Optional[risk_engine.RiskReport],
+        covered: Optional[List[int]] = None
     ) -> RiskMetrics:
-        """Calculate portfolio risk metrics"""
+        """Calculate portfolio risk metrics; risk-model figures cover the ``covered`` positions only"""
+        if covered is None:
+            covered = list(range(len(symbols)))
 
         # Diversification score (based on number of stocks and allocation spread)
         num_stocks = len(stock_details)
@@ -123,17 +560,22 @@ class PortfolioAnalyzer:
             beta * (alloc / 100) for beta, alloc in zip(betas, allocations)
         )
 
-        # Calculate volatility
-        weights = [alloc / 100 for alloc in allocations]
-        portfolio_volatility = self.stock_service.calculate_portfolio_volatility(
-            symbols, weights
-        )
+        # Volatility comes from the risk engine report, over the holdings with enough history
+        weights = covered_weights(np.array([alloc / 100 for alloc in allocations]), covered)
+        covered_symbols = [symbols[i] for i in covered]
+        portfolio_volatility = report.volatility if report else 15.0  # Default moderate volatility
+
+        # Concentration across correlation clusters catches holdings that move together
+        correlation_fields = self._correlation_fields(
+            [stock_details[i] for i in covered], covered_symbols, weights
+        ) if covered else {}
+        concentration = max(hhi, correlation_fields.get("cluster_hhi", 0.0))
 
         # Overall risk score (0-100, higher = more risky)
         risk_score = min(100, (
             (weighted_beta * 20) +  # Beta contribution
             (portfolio_volatility * 2) +  # Volatility contribution
-            (hhi * 30) +  # Concentration risk
+            (concentration * 30) +  # Concentration risk
             (max(0, 100 - diversification_score) * 0.3)  # Lack of diversification
         ))
 
@@ -157,9 +599,116 @@ class PortfolioAnalyzer:
             risk_score=round(risk_score, 2),
             diversification_score=round(diversification_score, 2),
             volatility_level=volatility_level,
-            concentration_risk=concentration_risk
+            concentration_risk=concentration_risk,
+            excluded_holdings=[symbol for i, symbol in enumerate(symbols) if i not in covered],
+            **self._risk_report_fields(report, covered_symbols, weights),
+            **correlation_fields
         )
 
+    @staticmethod
+    def _correlation_fields(stock_details: List[Dict], symbols: List[str], weights: np.ndarray) -> Dict:
+        """Correlation clusters, cluster HHI and effective number of bets, from the cached correlation matrix"""
+        try:
+            cached = correlation_cache.clusters(symbols)
+        except Exception as e:
+            logger.error(f"Error loading correlation matrix: {str(e)}")
+            return {}
+        if cached is None:
+            return {}
+
+        corr, volatility, labels = cached
+        clusters = []
+        for label in range(labels.max() + 1):
+            members = np.flatnonzero(labels == label)
+            block = corr[np.ix_(members, members)]
+            clusters.append(CorrelationCluster(
+                symbols=[symbols[i] for i in members],
+                allocation=round(float(weights[members].sum()) * 100, 2),
+                sectors=sorted({stock_details[i].get("sector", "Unknown") for i in members}),
+                average_correlation=(
+                    round(float((block.sum() - len(members)) / (len(members) ** 2 - len(members))), 4)
+                    if len(members) > 1 else None
+                ),
+            ))
+        clusters.sort(key=lambda cluster: cluster.allocation, reverse=True)
+
+        return {
+            "effective_number_of_bets": round(effective_number_of_bets(corr, volatility, weights), 4),
+            "cluster_hhi": round(sum((cluster.allocation / 100) ** 2 for cluster in clusters), 4),
+            "correlation_clusters": clusters,
+        }
+
+    async def _build_risk_reports(
+        self, symbols: List[str], weights: np.ndarray
+    ) -> Tuple[List[Optional[risk_engine.RiskReport]], Optional[np.ndarray], Optional[List[int]]]:
+        """Run the risk engine for one or more weight vectors over a shared returns window.
+
+        Returns one report per weight vector, or None entries if history is unavailable,
+        along with the returns window itself and the symbol positions it covers. Each
+        vector is rescaled to sum to one over the covered symbols; a vector with no
+        weight on them gets no report.
+        """
+        weights = np.atleast_2d(weights)
+        returns, covered = await self._returns_window(symbols)
+        if returns is None:
+            return [None] * len(weights), None, covered
+        weights = np.array([covered_weights(row, covered) for row in weights])
+        try:
+            with metrics.stage("risk_model"):
+                cov = risk_engine.covariance(returns) if len(weights) > 1 else None
+                reports = risk_engine.analyze_many(returns, weights, cov=cov)
+        except Exception as e:
+            logger.error(f"Error calculating portfolio risk: {str(e)}")
+            return [None] * len(weights), None, covered
+        return [report if row.any() else None for report, row in zip(reports, weights)], returns, covered
+
+    async def _returns_window(self, symbols: List[str]) -> Tuple[Optional[np.ndarray], Optional[List[int]]]:
+        """Historical returns for the symbols with enough history, and their positions.
+
+        The returns matrix is None if history is unavailable; positions are None if
+        it could not be loaded at all.
+        """
+        try:
+            with metrics.stage("price_history"):
+                returns, covered = await self.stock_service.get_covered_returns_window(symbols)
+        except Exception as e:
+            logger.error(f"Error loading price history: {str(e)}")
+            return None, None
+        if len(covered) < len(symbols):
+            excluded = [symbol for i, symbol in enumerate(symbols) if i not in covered]
+            logger.warning(f"Not enough price history for {', '.join(excluded)}; excluded from risk")
+        if len(returns) < 2:
+            logger.warning(f"Not enough price history for {', '.join(symbols)}")
+            return None, covered
+        return returns, covered
+
+    @staticmethod
+    def _risk_report_fields(
+        report: Optional[risk_engine.RiskReport], symbols: List[str], weights: np.ndarray
+    ) -> Dict:
+        """Map a risk report onto the optional RiskMetrics fields"""
+        if report is None:
+            return {}
+
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(float(value), 4) if value is not None else None
+
+        return {
+            "portfolio_volatility": rounded(report.volatility),
+            "annualized_volatility": rounded(report.annualized_volatility),
+            "var_historical": rounded(report.var_historical),
+            "cvar_historical": rounded(report.cvar_historical),
+            "var_parametric": rounded(report.var_parametric),
+            "cvar_parametric": rounded(report.cvar_parametric),
+            "max_drawdown": rounded(report.max_drawdown),
+            "sharpe_ratio": rounded(report.sharpe_ratio),
+            "sortino_ratio": rounded(report.sortino_ratio),
+            "risk_contributions": [
+                RiskContribution(**contribution)
+                for contribution in risk_engine.risk_contributions(report, symbols, weights)
+            ],
+        }
+
     def _generate_diversification_analysis(
         self, sector_breakdown: List[SectorBreakdown], stock_details: List[Dict], num_stocks: int
     ) -> str:
@@ -192,12 +741,33 @@ class PortfolioAnalyzer:
         sector_breakdown: List[SectorBreakdown],
         risk_metrics: RiskMetrics,
         stock_details: List[Dict],
-        holdings: List[StockHolding]
+        holdings: List[StockHolding],
+        optimization: Optional[PortfolioOptimization] = None
     ) -> List[str]:
         """Generate actionable recommendations"""
 
         recommendations = []
 
+        # Concrete trades toward the optimized target
+        if optimization is not None:
+            moves = [
+                target for target in optimization.targets
+                if abs(target.change) >= settings.OPTIMIZER_MIN_TRADE
+            ][:3]
+            if moves:
+                steps = ", ".join(
+                    f"{'increase' if move.change > 0 else 'reduce'} {move.symbol} "
+                    f"from {move.current_weight}% to {move.target_weight}%"
+                    for move in moves
+                )
+                recommendation = f"Rebalance toward the {optimization.objective.replace('_', '-')} target: {steps}"
+                if optimization.current_volatility is not None:
+                    recommendation += (
+                        f" (daily volatility {optimization.current_volatility:.2f}% "
+                        f"to {optimization.target_volatility:.2f}%)"
+                    )
+                recommendations.append(recommendation + ".")
+
         # Concentration recommendations
         max_holding = max(holdings, key=lambda x: x.allocation)
         if max_holding.allocation > 25:
@@ -213,6 +783,27 @@ class PortfolioAnalyzer:
                 f"Consider diversifying into other sectors like Healthcare, Consumer Goods, or Utilities."
             )
 
+        # Concentration hidden behind different sector labels
+        if risk_metrics.correlation_clusters:
+            top_cluster = risk_metrics.correlation_clusters[0]
+            if len(top_cluster.symbols) > 1 and top_cluster.allocation > 40:
+                sectors = (
+                    f" across {len(top_cluster.sectors)} sectors" if len(top_cluster.sectors) > 1 else ""
+                )
+                recommendations.append(
+                    f"{', '.join(top_cluster.symbols)} move together{sectors} "
+                    f"(average correlation {top_cluster.average_correlation:.2f}) and make up "
+                    f"{top_cluster.allocation}% of the portfolio. Treat them as one position when diversifying."
+                )
+        if (
+            risk_metrics.effective_number_of_bets is not None
+            and len(holdings) >= 4 and risk_metrics.effective_number_of_bets < len(holdings) / 2
+        ):
+            recommendations.append(
+                f"Your {len(holdings)} holdings amount to only {risk_metrics.effective_number_of_bets:.1f} "
+                f"independent bets. Add assets with low correlation to your current holdings."
+            )
+
         # Risk-based recommendations
         if risk_metrics.risk_score > 70:
             recommendations.append(
@@ -249,3 +840,18 @@ class PortfolioAnalyzer:
             )
 
         return recommendations[:5]  # Limit to top 5 recommendations
+
+
+_analyzer: Optional[PortfolioAnalyzer] = None
+_analyzer_lock = threading.Lock()
+
+
+def get_portfolio_analyzer() -> PortfolioAnalyzer:
+    """The process-wide analyzer, built on first use (building it loads the LLM client)"""
+    global _analyzer
+    if _analyzer is None:
+        # Warm-up builds it in a worker thread, so guard against a racing first request
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = PortfolioAnalyzer()
+    return _analyzer
@@ -0,0 +1,389 @@
+import asyncio
+import fcntl
+import os
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.fetch_engine import UpstreamThrottled
+from app.services.market_data import DailyCloses, get_market_data_provider
+from app.services.shared_cache import shared_market_cache
+
+logger = logging.getLogger(__name__)
+
+# One record per daily bar, appended to a flat binary file per symbol
+BAR_DTYPE = np.dtype([("date", "datetime64[D]"), ("close", "<f8")])
+
+# Longest run of weekdays without a session that still counts as contiguous history
+# (exchange holidays and unscheduled closures)
+MAX_SESSION_GAP = 5
+
+PERIOD_DAYS = {
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+}
+
+
+def period_to_days(period: str) -> int:
+    """Convert a yfinance-style period string to a calendar-day lookback"""
+    try:
+        return PERIOD_DAYS[period]
+    except KeyError:
+        raise ValueError(f"Unsupported history period: {period}")
+
+
+class _DownloadBatch:
+    """Symbols merged into one upstream download over ``[start, end)``"""
+
+    def __init__(self, start: date, end: date):
+        self.start = start
+        self.end = end
+        self.symbols: Dict[str, None] = {}
+        self.result: "asyncio.Future[Dict[str, DailyCloses]]" = asyncio.get_running_loop().create_future()
+        # Nobody may be left to read a failure once every waiter is cancelled
+        self.result.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+    def covers(self, symbol: str, start: date, end: date) -> bool:
+        return symbol in self.symbols and self.start <= start and end <= self.end
+
+
+class DownloadCoalescer:
+    """Merges concurrent daily-close downloads into one batched upstream call.
+
+    The first request opens a batch that collects symbols for ``window`` seconds
+    (or until ``max_symbols``); the batch then downloads the union of its symbols
+    from the earliest start to the latest end, and each caller gets its own
+    symbols sliced to its own range. Symbols already in an open or in-flight
+    batch covering the range join it rather than being downloaded twice.
+    """
+
+    def __init__(
+        self,
+        download: Optional[Callable[[List[str], date, date], Awaitable[Dict[str, DailyCloses]]]] = None,
+        window: float = settings.PRICE_DOWNLOAD_BATCH_WINDOW_MS / 1000,
+        max_symbols: int = settings.PRICE_DOWNLOAD_BATCH_MAX_SYMBOLS
+    ):
+        self._download = download or (
+            lambda symbols, start, end: get_market_data_provider().get_daily_closes(symbols, start, end)
+        )
+        self.window = window
+        self.max_symbols = max_symbols
+        self._open: Optional[_DownloadBatch] = None
+        self._in_flight: Set[_DownloadBatch] = set()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+        self.requested = 0
+        self.joined = 0
+
+    def _batch_for(self, symbol: str, start: date, end: date) -> _DownloadBatch:
+        for batch in self._in_flight:
+            if batch.covers(symbol, start, end):
+                self.joined += 1
+                return batch
+
+        batch = self._open
+        if batch is not None and symbol in batch.symbols:
+            self.joined += 1
+        else:
+            if batch is None:
+                batch = self._open = _DownloadBatch(start, end)
+                asyncio.get_running_loop().call_later(self.window, self._dispatch, batch)
+            self.requested += 1
+            batch.symbols[symbol] = None
+        batch.start, batch.end = min(batch.start, start), max(batch.end, end)
+
+        if len(batch.symbols) >= self.max_symbols:
+            self._dispatch(batch)
+        return batch
+
+    def _dispatch(self, batch: _DownloadBatch):
+        if self._open is not batch:
+            return
+        self._open = None
+        self._in_flight.add(batch)
+        self.batches += 1
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _DownloadBatch):
+        try:
+            batch.result.set_result(await self._download(list(batch.symbols), batch.start, batch.end))
+        except Exception as e:
+            batch.result.set_exception(e)
+        finally:
+            self._in_flight.discard(batch)
+
+    async def get_daily_closes(
+        self, symbols: List[str], start: date, end: date
+    ) -> Dict[str, DailyCloses]:
+        """Completed daily closes in ``[start, end)``, downloaded together with concurrent requests"""
+        wanted: Dict[_DownloadBatch, List[str]] = {}
+        for symbol in dict.fromkeys(symbols):
+            wanted.setdefault(self._batch_for(symbol, start, end), []).append(symbol)
+
+        results = await asyncio.gather(*(asyncio.shield(batch.result) for batch in wanted))
+        bounds = np.array([start, end], dtype="datetime64[D]")
+        closes: Dict[str, DailyCloses] = {}
+        for result, batch_symbols in zip(results, wanted.values()):
+            for symbol in batch_symbols:
+                if symbol not in result:
+                    continue
+                dates, values = result[symbol]
+                lo, hi = np.searchsorted(dates, bounds)
+                if hi > lo:
+                    closes[symbol] = (dates[lo:hi], values[lo:hi])
+        return closes
+
+    def stats(self) -> Dict[str, int]:
+        """Symbols that started a download (misses) or joined another request's (hits)"""
+        return {
+            "hits": self.joined,
+            "misses": self.requested,
+            "upstream_calls": self.batches,
+            "size": sum(len(batch.symbols) for batch in self._in_flight),
+        }
+
+
+class PriceStore:
+    """Append-only, memory-mapped store of daily closing prices per symbol"""
+
+    def __init__(
+        self, directory: str = settings.PRICE_STORE_DIR, downloads: Optional[DownloadCoalescer] = None
+    ):
+        self.directory = directory
+        self.downloads = downloads or DownloadCoalescer()
+        self._maps: Dict[str, np.memmap] = {}
+        self._checked_on: Dict[str, date] = {}
+        self._write_lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        safe = symbol.replace("/", "_").replace("\\", "_")
+        return os.path.join(self.directory, f"{safe}.bars")
+
+    def bars(self, symbol: str) -> np.ndarray:
+        """All stored bars for a symbol as a read-only memory map (empty if none).
+
+        The cached map is reopened when the file has grown, so bars appended by
+        another worker process are seen; a partly written last record is ignored.
+        """
+        path = self._path(symbol)
+        try:
+            count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        except OSError:
+            count = 0
+        if count == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+
+        bars = self._maps.get(symbol)
+        if bars is not None and len(bars) == count:
+            return bars
+
+        bars = np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(count,))
+        self._maps[symbol] = bars
+        return bars
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        bars = self.bars(symbol)
+        if len(bars) == 0:
+            return None
+        return bars["date"][-1].astype(date)
+
+    def append(self, symbol: str, dates: np.ndarray, closes: np.ndarray) -> int:
+        """Append bars newer than the last stored date; returns the number written.
+
+        Appends are serialized across worker processes with an exclusive ``flock``
+        on the file, and the last date is read from the file itself under that
+        lock rather than from this process's (possibly stale) map.
+        """
+        new = np.empty(len(dates), dtype=BAR_DTYPE)
+        new["date"] = np.asarray(dates, dtype="datetime64[D]")
+        new["close"] = closes
+        new = new[~np.isnan(new["close"])]
+        if len(new) == 0:
+            return 0
+
+        with self._write_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(self._path(symbol), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                size = os.fstat(fd).st_size
+                complete = size - size % BAR_DTYPE.itemsize
+                if complete != size:
+                    # A writer died mid-record: drop the partial record
+                    os.ftruncate(fd, complete)
+                if complete:
+                    last = np.frombuffer(
+                        os.pread(fd, BAR_DTYPE.itemsize, complete - BAR_DTYPE.itemsize), dtype=BAR_DTYPE
+                    )["date"][0]
+                    new = new[new["date"] > last]
+                if len(new) == 0:
+                    return 0
+                os.write(fd, new.tobytes())
+            finally:
+                os.close(fd)
+            return len(new)
+
+    def _stale_symbols(self, symbols: List[str], today: date) -> Dict[date, List[str]]:
+        """Group symbols that need a refresh by the first date they are missing"""
+        default_start = today - timedelta(days=period_to_days(settings.PRICE_STORE_HISTORY_PERIOD))
+        groups: Dict[date, List[str]] = defaultdict(list)
+        for symbol in symbols:
+            if self._checked_on.get(symbol) == today:
+                continue
+            last = self.last_date(symbol)
+            start = last + timedelta(days=1) if last is not None else default_start
+            if start >= today:
+                continue
+            groups[start].append(symbol)
+        return groups
+
+    def is_current(self, symbols: List[str]) -> bool:
+        """True if ``ensure_history`` has nothing to download for ``symbols`` today"""
+        return not self._stale_symbols(symbols, date.today())
+
+    async def ensure_history(self, symbols: List[str]):
+        """Bring stored history up to date, downloading only the missing bars.
+
+        Only completed sessions are stored, so today's partial bar is never persisted.
+        Bars another replica already stored in the shared cache are read from there
+        first. Missing symbols of concurrent calls are merged into batched downloads
+        by the coalescer, and each symbol is checked against upstream at most once a
+        day. Symbols whose download failed or was throttled are retried next call.
+        """
+        today = date.today()
+        groups = self._stale_symbols(symbols, today)
+        if groups and shared_market_cache.enabled:
+            await self._load_shared_bars(groups, today)
+            groups = self._stale_symbols(symbols, today)
+        if not groups:
+            return
+
+        results = await asyncio.gather(
+            *(self.downloads.get_daily_closes(group, start, today) for start, group in groups.items()),
+            return_exceptions=True
+        )
+        downloaded: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        checked: List[str] = []
+        for (start, group), result in zip(groups.items(), results):
+            if isinstance(result, UpstreamThrottled):
+                logger.warning(f"Price history since {start} for {len(group)} symbols throttled: {str(result)}")
+                continue
+            if isinstance(result, BaseException):
+                logger.error(f"Error refreshing price history since {start}: {str(result)}")
+                continue
+            written = sum(
+                self.append(symbol, dates, closes) for symbol, (dates, closes) in result.items()
+            )
+            logger.debug(f"Stored {written} new bars for {len(group)} symbols since {start}")
+            downloaded.update(result)
+            checked.extend(group)
+            for symbol in group:
+                self._checked_on[symbol] = today
+
+        shared_market_cache.write_bars(downloaded, checked, today)
+
+    async def _load_shared_bars(self, groups: Dict[date, List[str]], today: date):
+        """Append bars for stale symbols from the shared cache in one query.
+
+        A symbol's shared bars are used only if they cover its whole missing range:
+        starting by the first session on or after its own group start, with no gap
+        longer than a market closure. Otherwise the symbol stays stale and is
+        downloaded, since the append-only store could never backfill the hole.
+        """
+        starts = {symbol: start for start, group in groups.items() for symbol in group}
+        closes, checked_on = await shared_market_cache.read_bars(list(starts), min(groups))
+        for symbol, start in starts.items():
+            if checked_on.get(symbol) != today:
+                continue
+            if symbol in closes:
+                dates, values = closes[symbol]
+                dates = np.asarray(dates, dtype="datetime64[D]")
+                if not self._covers(dates[dates >= np.datetime64(start, "D")], start):
+                    logger.debug(f"Shared bars for {symbol} do not cover {start} onward; downloading")
+                    continue
+                self.append(symbol, dates, values)
+            elif self.last_date(symbol) is None:
+                # Checked but no bars to share: nothing a fresh store could start from
+                continue
+            self._checked_on[symbol] = today
+
+    @staticmethod
+    def _covers(dates: np.ndarray, start: date) -> bool:
+        """Whether sorted bar dates start at the first session from ``start`` without long gaps"""
+        if len(dates) == 0:
+            return False
+        first_session = np.busday_offset(np.datetime64(start, "D"), 0, roll="forward")
+        if dates[0] > first_session:
+            return False
+        return len(dates) < 2 or int(np.busday_count(dates[:-1], dates[1:]).max()) <= MAX_SESSION_GAP
+
+    def closes_window(
+        self, symbols: List[str], lookback_days: int, end: Optional[date] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Closing prices over a lookback window, aligned on dates common to all symbols.
+
+        Returns ``(dates, closes)`` where ``closes`` has shape ``(len(dates), len(symbols))``.
+        Per-symbol windows are sliced from the memory maps without copying; only the
+        aligned output matrix is materialised.
+        """
+        end_day = np.datetime64(end or date.today(), "D")
+        start_day = end_day - np.timedelta64(lookback_days, "D")
+
+        windows = []
+        for symbol in symbols:
+            bars = self.bars(symbol)
+            dates = bars["date"]
+            lo, hi = np.searchsorted(dates, [start_day, end_day], side="right")
+            windows.append(bars[lo:hi])
+
+        if not windows or any(len(w) == 0 for w in windows):
+            return np.empty(0, dtype="datetime64[D]"), np.empty((0, len(symbols)))
+
+        common = windows[0]["date"]
+        if not all(np.array_equal(w["date"], common) for w in windows[1:]):
+            for w in windows[1:]:
+                common = np.intersect1d(common, w["date"], assume_unique=True)
+
+        closes = np.empty((len(common), len(symbols)))
+        for column, w in enumerate(windows):
+            if len(w) == len(common):
+                closes[:, column] = w["close"]
+            else:
+                closes[:, column] = w["close"][np.searchsorted(w["date"], common)]
+        return np.asarray(common), closes
+
+    def window_lengths(
+        self, symbols: List[str], lookback_days: int, end: Optional[date] = None
+    ) -> np.ndarray:
+        """Number of stored bars per symbol inside a lookback window"""
+        end_day = np.datetime64(end or date.today(), "D")
+        start_day = end_day - np.timedelta64(lookback_days, "D")
+        lengths = np.empty(len(symbols), dtype=int)
+        for i, symbol in enumerate(symbols):
+            lo, hi = np.searchsorted(self.bars(symbol)["date"], [start_day, end_day], side="right")
+            lengths[i] = hi - lo
+        return lengths
+
+    def returns_window(
+        self, symbols: List[str], lookback_days: int, end: Optional[date] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Aligned simple daily returns over a lookback window"""
+        dates, closes = self.closes_window(symbols, lookback_days, end)
+        if len(dates) < 2:
+            return dates[:0], np.empty((0, len(symbols)))
+        return dates[1:], closes[1:] / closes[:-1] - 1
+
+
+price_store = PriceStore()
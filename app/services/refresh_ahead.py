@@ -0,0 +1,173 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.price_store import price_store
+from app.services.shared_cache import shared_market_cache
+from app.services.stock_data_service import (
+    StockDataService, stock_info_cache, symbol_access
+)
+
+logger = logging.getLogger(__name__)
+
+refreshed_symbols = metrics.registry.register(metrics.Counter(
+    "refresh_ahead_symbols_total", "Symbols handled by the refresh-ahead scheduler",
+    ("kind", "outcome")
+))
+
+
+class RefreshAheadScheduler:
+    """Refreshes the hottest symbols' cached stock info shortly before it expires.
+
+    Hotness comes from the decayed per-symbol access counts recorded by
+    StockDataService. Every ``interval`` seconds the top ``top_n`` symbols (plus the
+    seed list) are checked; those with fundamentals or profile due within
+    ``lead_time`` get a full info fetch, and those with only the price due are
+    refreshed in one bulk latest-price call. Upstream symbol fetches are capped at
+    ``max_symbols_per_minute``; whatever doesn't fit waits for the next tick.
+    """
+
+    def __init__(
+        self,
+        top_n: int = settings.REFRESH_AHEAD_TOP_N,
+        interval: float = settings.REFRESH_AHEAD_INTERVAL,
+        lead_time: float = settings.REFRESH_AHEAD_LEAD_TIME,
+        max_symbols_per_minute: int = settings.REFRESH_AHEAD_MAX_SYMBOLS_PER_MINUTE,
+        seed_symbols: Optional[List[str]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_time = lead_time
+        self.max_symbols_per_minute = max_symbols_per_minute
+        self.seed_symbols = (
+            seed_symbols if seed_symbols is not None else settings.refresh_ahead_seed_symbols
+        )
+        self._clock = clock
+        self._tokens = float(max_symbols_per_minute)
+        self._refilled_at = clock()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.runs = 0
+        self.last_run: Dict[str, int] = {}
+
+    def _take(self, wanted: int) -> int:
+        """Grant up to ``wanted`` upstream symbol fetches from the per-minute budget"""
+        now = self._clock()
+        self._tokens = min(
+            float(self.max_symbols_per_minute),
+            self._tokens + (now - self._refilled_at) * self.max_symbols_per_minute / 60
+        )
+        self._refilled_at = now
+        granted = min(wanted, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+    def _due(self, symbol: str, field_class: str) -> bool:
+        remaining = stock_info_cache.expires_in((symbol, field_class))
+        return remaining is None or remaining <= self.lead_time
+
+    def hot_symbols(self) -> List[str]:
+        """Seed symbols followed by the hottest accessed symbols"""
+        return list(dict.fromkeys(self.seed_symbols + symbol_access.hottest(self.top_n)))
+
+    async def refresh_once(self) -> Dict[str, int]:
+        """Run one refresh pass and return how many symbols were refreshed or deferred"""
+        hot = self.hot_symbols()
+        # Another replica may already have refreshed some of them
+        await StockDataService.load_shared_snapshots(hot, self.lead_time)
+        due_info = [
+            symbol for symbol in hot
+            if self._due(symbol, "profile") or self._due(symbol, "fundamentals")
+        ]
+        # A full info fetch refreshes the price too
+        info_symbols = set(due_info)
+        due_price = [
+            symbol for symbol in hot
+            if symbol not in info_symbols and self._due(symbol, "price")
+        ]
+
+        info_batch = due_info[:self._take(len(due_info))]
+        price_batch = due_price[:self._take(len(due_price))]
+
+        results = await asyncio.gather(
+            *(StockDataService.refresh_stock_info(symbol) for symbol in info_batch),
+            return_exceptions=True
+        )
+        info_failed = sum(isinstance(result, BaseException) for result in results)
+
+        prices_refreshed = 0
+        if price_batch:
+            try:
+                prices_refreshed = await StockDataService.refresh_latest_prices(price_batch)
+            except Exception as e:
+                logger.warning(f"Refresh-ahead price fetch failed: {str(e)}")
+        shared_market_cache.flush()
+
+        # Keeps the latest completed daily bar stored; a no-op once checked today
+        try:
+            await price_store.ensure_history(hot)
+        except Exception as e:
+            logger.warning(f"Refresh-ahead price history update failed: {str(e)}")
+
+        summary = {
+            "info_refreshed": len(info_batch) - info_failed,
+            "info_failed": info_failed,
+            "price_refreshed": prices_refreshed,
+            "price_failed": len(price_batch) - prices_refreshed,
+            "deferred": len(due_info) - len(info_batch) + len(due_price) - len(price_batch),
+        }
+        refreshed_symbols.inc(summary["info_refreshed"], kind="info", outcome="refreshed")
+        refreshed_symbols.inc(summary["info_failed"], kind="info", outcome="failed")
+        refreshed_symbols.inc(summary["price_refreshed"], kind="price", outcome="refreshed")
+        refreshed_symbols.inc(summary["price_failed"], kind="price", outcome="failed")
+        refreshed_symbols.inc(summary["deferred"], kind="any", outcome="deferred")
+
+        self.runs += 1
+        self.last_run = summary
+        return summary
+
+    async def prefetch_seeds(self):
+        """Load the seed symbols' stock info and price history into the caches"""
+        if not self.seed_symbols:
+            return
+        logger.info(f"Prefetching {len(self.seed_symbols)} seed symbols")
+        symbol_access.record(self.seed_symbols)
+        await StockDataService.get_batch_stock_info(self.seed_symbols)
+        await price_store.ensure_history(self.seed_symbols)
+
+    async def _run(self):
+        try:
+            await self.prefetch_seeds()
+        except Exception as e:
+            logger.error(f"Seed prefetch failed: {str(e)}")
+
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Refresh-ahead pass failed: {str(e)}")
+
+    def start(self):
+        if settings.REFRESH_AHEAD_ENABLED and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "tracked_symbols": len(symbol_access),
+            "seed_symbols": len(self.seed_symbols),
+            "runs": self.runs,
+            "last_run": self.last_run,
+        }
+
+
+refresh_scheduler = RefreshAheadScheduler()
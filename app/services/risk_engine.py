@@ -0,0 +1,251 @@
+from dataclasses import dataclass, replace
+from statistics import NormalDist
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+TRADING_DAYS = 252
+
+
+@dataclass
+class RiskReport:
+    """Risk statistics for one portfolio, all percentages expressed as 0-100"""
+    volatility: float
+    annualized_volatility: float
+    var_historical: float
+    cvar_historical: float
+    var_parametric: float
+    cvar_parametric: float
+    max_drawdown: float
+    sharpe_ratio: Optional[float]
+    sortino_ratio: Optional[float]
+    marginal_risk: np.ndarray
+    component_risk: np.ndarray
+    risk_contribution_pct: np.ndarray
+
+
+def covariance(returns: np.ndarray) -> np.ndarray:
+    """Sample covariance of a (days x assets) returns matrix"""
+    centered = returns - returns.mean(axis=0)
+    return centered.T @ centered / (len(returns) - 1)
+
+
+def portfolio_variance(cov: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """wᵀΣw for a single weight vector, or diag(W Σ Wᵀ) for a (portfolios x assets) matrix"""
+    if weights.ndim == 1:
+        return weights @ cov @ weights
+    return np.einsum("ij,jk,ik->i", weights, cov, weights)
+
+
+def historical_var_cvar(portfolio_returns: np.ndarray, confidence: float) -> tuple:
+    """Historical VaR and CVaR as positive loss fractions, per column of a returns matrix"""
+    cutoff = np.quantile(portfolio_returns, 1 - confidence, axis=0)
+    tail = portfolio_returns <= cutoff
+    cvar = (portfolio_returns * tail).sum(axis=0) / tail.sum(axis=0)
+    return -cutoff, -cvar
+
+
+def parametric_var_cvar(mean: np.ndarray, std: np.ndarray, confidence: float) -> tuple:
+    """Gaussian VaR and CVaR as positive loss fractions"""
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - confidence)
+    var = -(mean + z * std)
+    cvar = -(mean - std * normal.pdf(z) / (1 - confidence))
+    return var, cvar
+
+
+def max_drawdown(portfolio_returns: np.ndarray) -> np.ndarray:
+    """Largest peak-to-trough fall of the compounded equity curve, per column, as a fraction"""
+    equity = np.cumprod(1 + portfolio_returns, axis=0)
+    start = np.ones((1,) + equity.shape[1:])
+    peaks = np.maximum.accumulate(np.concatenate((start, equity)), axis=0)[1:]
+    return np.max(1 - equity / peaks, axis=0)
+
+
+def analyze_many(
+    returns: np.ndarray,
+    weights: np.ndarray,
+    confidence: float = settings.RISK_VAR_CONFIDENCE,
+    risk_free_rate: float = settings.RISK_FREE_RATE,
+    cov: Optional[np.ndarray] = None
+) -> List[RiskReport]:
+    """Compute risk reports for a (portfolios x assets) weight matrix in one pass.
+
+    All portfolios share the (days x assets) ``returns`` matrix; pass ``cov`` to
+    reuse a covariance matrix already built for it. Per-asset arrays in each
+    report cover every column of ``returns``.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    portfolio_returns = returns @ weights.T
+
+    # ΣWᵀ is all the decomposition needs; without a cached Σ it is computed as
+    # Rcᵀ(Rc Wᵀ) / (T - 1), which avoids the O(T·N²) covariance build
+    if cov is None:
+        centered = returns - returns.mean(axis=0)
+        centered_portfolio = portfolio_returns - portfolio_returns.mean(axis=0)
+        cov_w = centered.T @ centered_portfolio / (len(returns) - 1)
+    else:
+        cov_w = cov @ weights.T
+
+    return _reports(weights, portfolio_returns, cov_w, confidence, risk_free_rate)
+
+
+def _reports(
+    weights: np.ndarray,
+    portfolio_returns: np.ndarray,
+    cov_w: np.ndarray,
+    confidence: float,
+    risk_free_rate: float
+) -> List[RiskReport]:
+    """Build reports from W (portfolios x assets), the return series R Wᵀ and Σ Wᵀ"""
+    # diag(W Σ Wᵀ) without forming the full portfolios x portfolios product
+    variance = np.einsum("pn,np->p", weights, cov_w)
+    sigma = np.sqrt(np.clip(variance, 0, None))
+    safe_sigma = np.where(sigma > 0, sigma, np.inf)
+
+    # Euler decomposition: component contributions sum to total volatility
+    marginal = cov_w / safe_sigma
+    component = weights.T * marginal
+    contribution_pct = component / safe_sigma * 100
+
+    mean = portfolio_returns.mean(axis=0)
+    var_h, cvar_h = historical_var_cvar(portfolio_returns, confidence)
+    var_p, cvar_p = parametric_var_cvar(mean, sigma, confidence)
+    drawdown = max_drawdown(portfolio_returns)
+
+    daily_rf = risk_free_rate / TRADING_DAYS
+    excess = mean - daily_rf
+    downside = np.minimum(portfolio_returns - daily_rf, 0)
+    downside_dev = np.sqrt(np.mean(downside ** 2, axis=0))
+    annualizer = TRADING_DAYS ** 0.5
+
+    return [
+        RiskReport(
+            volatility=float(sigma[p]) * 100,
+            annualized_volatility=float(sigma[p]) * annualizer * 100,
+            var_historical=float(var_h[p]) * 100,
+            cvar_historical=float(cvar_h[p]) * 100,
+            var_parametric=float(var_p[p]) * 100,
+            cvar_parametric=float(cvar_p[p]) * 100,
+            max_drawdown=float(drawdown[p]) * 100,
+            sharpe_ratio=float(excess[p] / sigma[p] * annualizer) if sigma[p] > 0 else None,
+            sortino_ratio=(
+                float(excess[p] / downside_dev[p] * annualizer) if downside_dev[p] > 0 else None
+            ),
+            marginal_risk=marginal[:, p] * 100,
+            component_risk=component[:, p] * 100,
+            risk_contribution_pct=contribution_pct[:, p],
+        )
+        for p in range(len(weights))
+    ]
+
+
+def analyze(
+    returns: np.ndarray,
+    weights: np.ndarray,
+    confidence: float = settings.RISK_VAR_CONFIDENCE,
+    risk_free_rate: float = settings.RISK_FREE_RATE,
+    cov: Optional[np.ndarray] = None
+) -> RiskReport:
+    """Compute the full risk report for one portfolio from a (days x assets) returns matrix"""
+    return analyze_many(returns, weights, confidence, risk_free_rate, cov)[0]
+
+
+class IncrementalRisk:
+    """Risk state of one portfolio that re-prices weight changes with low-rank updates.
+
+    Keeps the portfolio return series Rw and Σw. Moving k weights by Δ updates them
+    as Rw + R_K Δ_K and Σw + Σ_K Δ_K, where Σ_K (the k covariance columns involved)
+    is computed from the centered returns on first use and cached. A change costs
+    O(T·k + N·k) instead of a full O(T·N) rebuild.
+    """
+
+    # Periodic full rebuild so rounding error can't accumulate across many updates
+    FULL_REFRESH_EVERY = 64
+
+    def __init__(
+        self,
+        returns: np.ndarray,
+        weights: np.ndarray,
+        confidence: float = settings.RISK_VAR_CONFIDENCE,
+        risk_free_rate: float = settings.RISK_FREE_RATE
+    ):
+        self.mean = returns.mean(axis=0)
+        self.centered = returns - self.mean
+        self.confidence = confidence
+        self.risk_free_rate = risk_free_rate
+        self._cov_columns: dict = {}
+        self._rebuild(np.asarray(weights, dtype=float))
+
+    def _rebuild(self, weights: np.ndarray):
+        self.weights = weights.copy()
+        centered_portfolio = self.centered @ weights
+        self.portfolio_returns = centered_portfolio + self.mean @ weights
+        self.cov_w = self.centered.T @ centered_portfolio / (len(self.centered) - 1)
+        self.updates = 0
+
+    def _cov_column(self, column: int) -> np.ndarray:
+        cached = self._cov_columns.get(column)
+        if cached is None:
+            cached = self.centered.T @ self.centered[:, column] / (len(self.centered) - 1)
+            self._cov_columns[column] = cached
+        return cached
+
+    @property
+    def nbytes(self) -> int:
+        return self.centered.nbytes + sum(column.nbytes for column in self._cov_columns.values())
+
+    def update(self, weights: np.ndarray) -> RiskReport:
+        """Move to new weights and return the report for them"""
+        weights = np.asarray(weights, dtype=float)
+        delta = weights - self.weights
+        changed = np.flatnonzero(delta)
+
+        if len(changed) * 2 > len(weights) or self.updates >= self.FULL_REFRESH_EVERY:
+            self._rebuild(weights)
+        elif len(changed):
+            step = delta[changed]
+            cov_columns = np.column_stack([self._cov_column(j) for j in changed])
+            self.cov_w = self.cov_w + cov_columns @ step
+            self.portfolio_returns = self.portfolio_returns + (
+                self.centered[:, changed] + self.mean[changed]
+            ) @ step
+            self.weights = weights.copy()
+            self.updates += 1
+
+        return self.report()
+
+    def report(self) -> RiskReport:
+        return _reports(
+            self.weights[None, :], self.portfolio_returns[:, None], self.cov_w[:, None],
+            self.confidence, self.risk_free_rate
+        )[0]
+
+
+def select_assets(report: RiskReport, columns: List[int]) -> RiskReport:
+    """Restrict a report's per-asset arrays to the given columns"""
+    return replace(
+        report,
+        marginal_risk=report.marginal_risk[columns],
+        component_risk=report.component_risk[columns],
+        risk_contribution_pct=report.risk_contribution_pct[columns],
+    )
+
+
+def risk_contributions(report: RiskReport, symbols: List[str], weights: np.ndarray) -> List[dict]:
+    """Per-holding risk contributions in input order"""
+    return [
+        {
+            "symbol": symbol,
+            "weight": round(float(weight) * 100, 2),
+            "marginal_risk": round(float(marginal), 4),
+            "component_risk": round(float(component), 4),
+            "risk_contribution_pct": round(float(pct), 2),
+        }
+        for symbol, weight, marginal, component, pct in zip(
+            symbols, weights, report.marginal_risk, report.component_risk,
+            report.risk_contribution_pct
+        )
+    ]
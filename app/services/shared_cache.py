@@ -0,0 +1,287 @@
+import asyncio
+import os
+import time
+from datetime import date
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.market_data import DailyCloses
+
+logger = logging.getLogger(__name__)
+
+# Rows per statement when bulk upserting, to stay under driver parameter limits
+UPSERT_CHUNK = 2000
+
+
+@lru_cache(maxsize=None)
+def schema() -> SimpleNamespace:
+    """Table definitions, built on first use so SQLAlchemy stays out of cold start"""
+    from sqlalchemy import Column, Date, Float, JSON, MetaData, String, Table
+
+    metadata = MetaData()
+    return SimpleNamespace(
+        metadata=metadata,
+        # One row per symbol and stock info field class, stamped with when it was fetched
+        symbol_snapshots=Table(
+            "market_symbol_snapshots",
+            metadata,
+            Column("symbol", String(32), primary_key=True),
+            Column("field_class", String(16), primary_key=True),
+            Column("data", JSON, nullable=False),
+            Column("fetched_at", Float, nullable=False),
+        ),
+        daily_bars=Table(
+            "market_daily_bars",
+            metadata,
+            Column("symbol", String(32), primary_key=True),
+            Column("date", Date, primary_key=True),
+            Column("close", Float, nullable=False),
+        ),
+        # Last day each symbol's bars were checked against upstream, shared by all replicas
+        bar_checks=Table(
+            "market_bar_checks",
+            metadata,
+            Column("symbol", String(32), primary_key=True),
+            Column("checked_on", Date, nullable=False),
+        ),
+    )
+
+
+def async_database_url(url: str) -> str:
+    """Map a plain DATABASE_URL onto its async driver (psycopg for Postgres, aiosqlite for SQLite)"""
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    drivers = {"postgresql": "postgresql+psycopg", "sqlite": "sqlite+aiosqlite"}
+    if parsed.drivername in drivers:
+        parsed = parsed.set(drivername=drivers[parsed.drivername])
+    return parsed.render_as_string(hide_password=False)
+
+
+class SharedMarketCache:
+    """Cross-replica tier for stock info snapshots and daily bars in the configured database.
+
+    Sits between the in-process caches and the upstream provider: reads are one
+    bulk query for all requested symbols, and fetched data is written back with
+    bulk upserts. Writes run as tracked background tasks, so requests never wait
+    on them. Any database failure is logged and treated as a miss so requests
+    fall through to upstream.
+    """
+
+    def __init__(
+        self,
+        url: str = settings.DATABASE_URL,
+        enabled: bool = settings.SHARED_CACHE_ENABLED,
+        timeout: float = settings.SHARED_CACHE_TIMEOUT,
+        write_timeout: float = settings.SHARED_CACHE_WRITE_TIMEOUT
+    ):
+        self.url = url
+        self.enabled = enabled
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self._writes: Set["asyncio.Task[None]"] = set()
+        self._engine = None
+        self._ready: Optional[asyncio.Lock] = None
+        self._initialized = False
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def _get_engine(self):
+        if self._initialized:
+            return self._engine
+        if self._ready is None:
+            self._ready = asyncio.Lock()
+
+        async with self._ready:
+            if not self._initialized:
+                from sqlalchemy.engine import make_url
+                from sqlalchemy.ext.asyncio import create_async_engine
+
+                url = make_url(async_database_url(self.url))
+                options: Dict[str, Any] = {"pool_pre_ping": True}
+                if url.get_backend_name() == "sqlite":
+                    if url.database and url.database != ":memory:":
+                        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+                else:
+                    options.update(
+                        pool_size=settings.SHARED_CACHE_POOL_SIZE,
+                        max_overflow=settings.SHARED_CACHE_MAX_OVERFLOW
+                    )
+                self._engine = create_async_engine(url, **options)
+                async with self._engine.begin() as conn:
+                    await conn.run_sync(schema().metadata.create_all)
+                self._initialized = True
+        return self._engine
+
+    def _insert(self, table):
+        from sqlalchemy.dialects import postgresql, sqlite
+
+        dialect = postgresql if self._engine.dialect.name == "postgresql" else sqlite
+        return dialect.insert(table)
+
+    async def _upsert(self, table, rows: List[Dict[str, Any]], update: List[str]):
+        engine = await self._get_engine()
+        statement = self._insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={column: statement.excluded[column] for column in update}
+        )
+        # One transaction per chunk, so a large backfill keeps the chunks it finished
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            async with engine.begin() as conn:
+                await conn.execute(statement, rows[i:i + UPSERT_CHUNK])
+
+    async def _guard(self, operation: str, coro, default, timeout: Optional[float] = None):
+        """Run a database operation under the timeout, logging and swallowing failures"""
+        try:
+            return await asyncio.wait_for(coro, timeout or self.timeout)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache {operation} failed: {str(e) or type(e).__name__}")
+            return default
+
+    async def read_snapshots(
+        self, symbols: List[str], field_classes: List[str]
+    ) -> Dict[Tuple[str, str], Tuple[Dict[str, Any], float]]:
+        """Cached field-class data for many symbols in one query, as ``(data, fetched_at)``"""
+        if not self.enabled or not symbols:
+            return {}
+
+        async def query():
+            from sqlalchemy import select
+
+            symbol_snapshots = schema().symbol_snapshots
+            engine = await self._get_engine()
+            async with engine.connect() as conn:
+                result = await conn.execute(
+                    select(symbol_snapshots).where(
+                        symbol_snapshots.c.symbol.in_(symbols),
+                        symbol_snapshots.c.field_class.in_(field_classes)
+                    )
+                )
+                return {
+                    (row.symbol, row.field_class): (row.data, row.fetched_at)
+                    for row in result
+                }
+
+        found = await self._guard("snapshot read", query(), {})
+        self.hits += len(found)
+        self.misses += len(symbols) * len(field_classes) - len(found)
+        return found
+
+    def _write_behind(self, operation: str, coro):
+        """Run a write in a tracked background task instead of on the request path"""
+        task = asyncio.ensure_future(self._guard(operation, coro, None, self.write_timeout))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def queue_snapshot(self, symbol: str, field_class: str, data: Dict[str, Any]):
+        """Stage a freshly fetched field class for the next ``flush``"""
+        if self.enabled:
+            self._pending[(symbol, field_class)] = {
+                "symbol": symbol,
+                "field_class": field_class,
+                "data": data,
+                "fetched_at": time.time(),
+            }
+
+    def flush(self):
+        """Bulk upsert every staged snapshot in the background"""
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        self._write_behind(
+            "snapshot write", self._upsert(schema().symbol_snapshots, rows, ["data", "fetched_at"])
+        )
+
+    async def read_bars(
+        self, symbols: List[str], since: date
+    ) -> Tuple[Dict[str, DailyCloses], Dict[str, date]]:
+        """Stored daily closes since ``since`` and last upstream check date, per symbol"""
+        if not self.enabled or not symbols:
+            return {}, {}
+
+        async def query():
+            from sqlalchemy import select
+
+            daily_bars, bar_checks = schema().daily_bars, schema().bar_checks
+            engine = await self._get_engine()
+            async with engine.connect() as conn:
+                bars = await conn.execute(
+                    select(daily_bars.c.symbol, daily_bars.c.date, daily_bars.c.close)
+                    .where(daily_bars.c.symbol.in_(symbols), daily_bars.c.date >= since)
+                    .order_by(daily_bars.c.symbol, daily_bars.c.date)
+                )
+                rows = bars.all()
+                checks = await conn.execute(
+                    select(bar_checks).where(bar_checks.c.symbol.in_(symbols))
+                )
+                checked_on = {row.symbol: row.checked_on for row in checks}
+
+            grouped: Dict[str, List[Tuple[date, float]]] = {}
+            for symbol, day, close in rows:
+                grouped.setdefault(symbol, []).append((day, close))
+            closes = {
+                symbol: (
+                    np.array([day for day, _ in values], dtype="datetime64[D]"),
+                    np.array([close for _, close in values], dtype=float),
+                )
+                for symbol, values in grouped.items()
+            }
+            return closes, checked_on
+
+        return await self._guard("bar read", query(), ({}, {}))
+
+    def write_bars(self, closes: Dict[str, DailyCloses], checked: List[str], checked_on: date):
+        """Bulk upsert downloaded closes and mark ``checked`` symbols checked on a day, in the background"""
+        if not self.enabled:
+            return
+
+        rows = []
+        for symbol, (dates, values) in closes.items():
+            values = np.asarray(values, dtype=float)
+            kept = ~np.isnan(values)
+            days = np.asarray(dates, dtype="datetime64[D]")[kept].astype(object)
+            rows.extend(
+                {"symbol": symbol, "date": day, "close": close}
+                for day, close in zip(days, values[kept].tolist())
+            )
+        checks = [{"symbol": symbol, "checked_on": checked_on} for symbol in checked]
+
+        async def write():
+            if rows:
+                await self._upsert(schema().daily_bars, rows, ["close"])
+            if checks:
+                await self._upsert(schema().bar_checks, checks, ["checked_on"])
+
+        self._write_behind("bar write", write())
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "pending_writes": len(self._pending),
+            "writes_in_flight": len(self._writes),
+        }
+
+    async def aclose(self):
+        if self._writes:
+            # Let in-flight writes finish (each is bounded by the write timeout)
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        if self._engine is not None:
+            await self._engine.dispose()
+
+
+shared_market_cache = SharedMarketCache()
@@ -0,0 +1,285 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PASYMTB1"
+
+# Header: magic, slot count, slot size (a schema change reinitializes the file)
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("slots", "<u8"), ("slot_size", "<u8")])
+HEADER_SIZE = 64
+
+# Byte widths of the text fields; every other field is stored as float64
+TEXT_FIELDS = {"name": 120, "sector": 48, "industry": 96}
+
+# Numeric fields handed back as int, as the providers return them
+INT_FIELDS = {"market_cap"}
+
+# Slots examined per lookup before giving up (readers) or evicting the stalest (writers)
+MAX_PROBE = 32
+
+# Positions of the fixed leading fields in a slot tuple
+SEQ, SYMBOL, EXPIRES_AT = 0, 1, 2
+
+# Width of the symbol field; longer symbols are stored as a digest (see ``_key``)
+SYMBOL_SIZE = 16
+
+# Reads retried while a writer holds the slot before treating it as a miss
+MAX_READ_RETRIES = 100
+
+
+def default_table_path() -> str:
+    """Shared memory on Linux (/dev/shm), the temp directory elsewhere"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "portfolio-analyzer-symbols")
+
+
+class SharedSymbolTable:
+    """Fixed-schema stock info table in a memory-mapped file shared by every worker process.
+
+    Drop-in for the per-worker ``TTLCache`` of ``(symbol, field_class)`` entries:
+    each symbol owns one slot holding every field class plus its expiry, so memory
+    scales with the symbol universe rather than the worker count. Slots live in an
+    open-addressing hash table keyed by CRC32 of the symbol.
+
+    Writers serialize on an exclusive ``flock`` of the file. Readers take no lock:
+    each slot carries a sequence number that a writer makes odd while it writes and
+    even when done, and a reader retries until it copies the slot between two equal
+    even readings (a seqlock). A full probe window evicts its stalest slot.
+    """
+
+    def __init__(
+        self,
+        field_classes: Dict[str, Sequence[str]],
+        max_symbols: int,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.field_classes = {name: tuple(fields) for name, fields in field_classes.items()}
+        self.class_index = {name: i for i, name in enumerate(self.field_classes)}
+        self.max_symbols = max_symbols
+        self.path = path or default_table_path()
+        self._clock = clock
+        self._thread_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        columns = [("seq", "<u8"), ("symbol", f"S{SYMBOL_SIZE}"), ("expires_at", "<f8", (len(self.field_classes),))]
+        for fields in self.field_classes.values():
+            for field in fields:
+                columns.append((field, f"S{TEXT_FIELDS[field]}" if field in TEXT_FIELDS else "<f8"))
+        self.dtype = np.dtype(columns)
+        self._positions = {name: i for i, name in enumerate(self.dtype.names)}
+        # Twice the symbols, rounded up to a power of two, keeps probe chains short
+        self.slot_count = 1 << max(4, (2 * max_symbols - 1).bit_length())
+        self._open()
+
+    def _open(self):
+        size = HEADER_SIZE + self.slot_count * self.dtype.itemsize
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._write_lock():
+            header = os.pread(self._fd, HEADER_DTYPE.itemsize, 0)
+            expected = np.array([(MAGIC, self.slot_count, self.dtype.itemsize)], dtype=HEADER_DTYPE)
+            if header != expected.tobytes() or os.fstat(self._fd).st_size != size:
+                # New file, or one written with another schema: start empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, expected.tobytes(), 0)
+                logger.info(f"Initialized shared symbol table {self.path} ({size} bytes)")
+        self._map = mmap.mmap(self._fd, size)
+        self._slots = np.frombuffer(self._map, dtype=self.dtype, count=self.slot_count, offset=HEADER_SIZE)
+        self._seq = self._slots["seq"]
+        self._symbols = self._slots["symbol"]
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        # flock excludes other processes; the thread lock excludes this process's threads
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _probe(self, symbol: bytes) -> Iterator[int]:
+        start = zlib.crc32(symbol) & (self.slot_count - 1)
+        for offset in range(MAX_PROBE):
+            yield (start + offset) & (self.slot_count - 1)
+
+    def _read_slot(self, index: int) -> Optional[Tuple]:
+        """Consistent copy of one slot as a tuple of fields, or None if a writer kept it busy"""
+        for _ in range(MAX_READ_RETRIES):
+            before = int(self._seq[index])
+            if before & 1:
+                time.sleep(0)
+                continue
+            record = self._slots[index].item()
+            if int(self._seq[index]) == before:
+                return record
+        return None
+
+    def _find(self, symbol: bytes) -> Optional[Tuple]:
+        for index in self._probe(symbol):
+            # The unlocked symbol check only skips slots; a match is confirmed on the copy
+            seen = self._symbols[index]
+            if seen != symbol and seen != b"":
+                continue
+            record = self._read_slot(index)
+            if record is None or record[SYMBOL] == b"":
+                return None
+            if record[SYMBOL] == symbol:
+                return record
+        return None
+
+    @staticmethod
+    def _key(key: Hashable) -> Tuple[bytes, str]:
+        """Slot key and field class; a symbol too long for the slot is keyed by its digest.
+
+        Truncating instead would let symbols sharing a 16-byte prefix alias one slot.
+        The digest starts with 0xff, which never begins UTF-8 text, and is stored
+        without trailing NULs as numpy reads it back.
+        """
+        symbol, field_class = key
+        encoded = symbol.encode()
+        if len(encoded) > SYMBOL_SIZE:
+            digest = hashlib.blake2b(encoded, digest_size=SYMBOL_SIZE - 1).digest()
+            encoded = (b"\xff" + digest).rstrip(b"\x00")
+        return encoded, field_class
+
+    def _decode(self, record: Tuple, field_class: str) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for field in self.field_classes[field_class]:
+            value = record[self._positions[field]]
+            if field in TEXT_FIELDS:
+                values[field] = value.decode("utf-8", errors="ignore")
+            elif value != value:
+                values[field] = None
+            else:
+                values[field] = int(value) if field in INT_FIELDS else float(value)
+        return values
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Values of one field class for a symbol, or None if missing or expired"""
+        symbol, field_class = self._key(key)
+        record = self._find(symbol)
+        if record is None:
+            self.misses += 1
+            return None
+        if record[EXPIRES_AT][self.class_index[field_class]] <= self._clock():
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._decode(record, field_class)
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        symbol, field_class = self._key(key)
+        record = self._find(symbol)
+        if record is None:
+            return None
+        expires_at = float(record[EXPIRES_AT][self.class_index[field_class]])
+        return expires_at - self._clock() if expires_at > 0 else None
+
+    def set(self, key: Hashable, value: Dict[str, Any], ttl: float):
+        """Store one field class for a symbol, claiming (or evicting) a slot for new symbols"""
+        symbol, field_class = self._key(key)
+        with self._write_lock():
+            index = self._claim(symbol)
+            writing = self._begin_write(index)
+            if self._symbols[index] == symbol:
+                record = list(self._slots[index].item())
+            else:
+                record = list(np.zeros((), dtype=self.dtype).item())
+                record[SYMBOL] = symbol
+            record[SEQ] = writing
+            for field in self.field_classes[field_class]:
+                raw = value.get(field)
+                if field in TEXT_FIELDS:
+                    raw = str(raw or "").encode()[:TEXT_FIELDS[field]]
+                else:
+                    raw = self._number(raw)
+                record[self._positions[field]] = raw
+            record[EXPIRES_AT][self.class_index[field_class]] = self._clock() + ttl
+            self._slots[index] = tuple(record)
+            self._seq[index] = writing + 1
+
+    def _begin_write(self, index: int) -> int:
+        """Mark a slot as being written and return its odd sequence number; end with ``writing + 1``.
+
+        Forcing the odd bit, rather than adding one, recovers a slot left odd by a
+        writer that died mid-write: the next write makes it even again.
+        """
+        writing = (int(self._seq[index]) + 1) | 1
+        self._seq[index] = writing
+        return writing
+
+    @staticmethod
+    def _number(raw: Any) -> float:
+        """Numeric field as a finite float; anything else (None, 'Infinity', junk) as NaN, read back as None"""
+        try:
+            number = float(raw)
+        except (TypeError, ValueError):
+            return math.nan
+        return number if math.isfinite(number) else math.nan
+
+    def _claim(self, symbol: bytes) -> int:
+        """Slot holding ``symbol``, else the first empty one, else the stalest in the window"""
+        stalest, stalest_expiry = -1, float("inf")
+        for index in self._probe(symbol):
+            if self._symbols[index] == symbol or self._symbols[index] == b"":
+                return index
+            expiry = float(self._slots["expires_at"][index].max())
+            if expiry < stalest_expiry:
+                stalest, stalest_expiry = index, expiry
+        self.evictions += 1
+        return stalest
+
+    def invalidate(self, key: Hashable):
+        symbol, field_class = self._key(key)
+        with self._write_lock():
+            for index in self._probe(symbol):
+                if self._symbols[index] == b"":
+                    return
+                if self._symbols[index] == symbol:
+                    writing = self._begin_write(index)
+                    self._slots["expires_at"][index, self.class_index[field_class]] = 0
+                    self._seq[index] = writing + 1
+                    return
+
+    def clear(self):
+        with self._write_lock():
+            writing = (self._seq + 1) | 1
+            self._seq[:] = writing
+            self._symbols[:] = b""
+            self._slots["expires_at"] = 0
+            self._seq[:] = writing + 1
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._symbols != b""))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_symbols,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes": HEADER_SIZE + self.slot_count * self.dtype.itemsize,
+        }
@@ -1,72 +1,255 @@
-import yfinance as yf
-import pandas as pd
-from typing import Dict, List, Optional
+import asyncio
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 
+from app.core.config import settings
+from app.services.cache import AccessTracker, SingleFlight, TTLCache
+from app.services.fetch_engine import gather_ordered
+from app.services.market_data import STOCK_INFO_FIELDS, get_market_data_provider
+from app.services.price_store import period_to_days, price_store
+from app.services.shared_cache import shared_market_cache
+from app.services.shared_table import SharedSymbolTable
+from app.services import risk_engine
+
 logger = logging.getLogger(__name__)
 
+# Stock info fields grouped by how quickly they go stale
+FIELD_CLASSES = {
+    "profile": ("name", "sector", "industry"),
+    "fundamentals": (
+        "market_cap", "52_week_high", "52_week_low", "pe_ratio", "beta", "dividend_yield"
+    ),
+    "price": ("current_price",),
+}
+
+# One table in shared memory for every worker process, or a cache per worker
+stock_info_cache = (
+    SharedSymbolTable(
+        FIELD_CLASSES, settings.STOCK_CACHE_MAX_SYMBOLS, settings.SHARED_TABLE_PATH or None
+    )
+    if settings.SHARED_TABLE_ENABLED
+    else TTLCache(max_size=settings.STOCK_CACHE_MAX_SYMBOLS * len(FIELD_CLASSES))
+)
+stock_info_flights = SingleFlight()
+symbol_access = AccessTracker(max_keys=settings.STOCK_CACHE_MAX_SYMBOLS)
+
+
+def field_class_ttl(field_class: str) -> float:
+    """Configured TTL in seconds for a stock info field class"""
+    return {
+        "profile": settings.STOCK_CACHE_TTL_PROFILE,
+        "fundamentals": settings.STOCK_CACHE_TTL_FUNDAMENTALS,
+        "price": settings.STOCK_CACHE_TTL_PRICE,
+    }[field_class]
+
 
 class StockDataService:
-    """Service to fetch stock data using yfinance"""
+    """Service to fetch stock data from the configured market data provider"""
+
+    @staticmethod
+    def _unavailable_stock_info(symbol: str, error: Optional[Exception] = None) -> Dict:
+        """Placeholder for a symbol whose data could not be fetched"""
+        return {
+            "symbol": symbol,
+            "name": symbol,
+            "sector": "Unknown",
+            "industry": "Unknown",
+            "market_cap": 0,
+            "current_price": 0,
+            "52_week_high": 0,
+            "52_week_low": 0,
+            "pe_ratio": 0,
+            "beta": 1.0,
+            "dividend_yield": 0,
+            "available": False,
+        }
+
+    @staticmethod
+    def _store_stock_info(info: Dict):
+        """Write every field class of a freshly fetched record into the cache"""
+        for field_class, fields in FIELD_CLASSES.items():
+            StockDataService._store_field_class(
+                info["symbol"], field_class, {field: info[field] for field in fields}
+            )
+
+    @staticmethod
+    def _store_field_class(symbol: str, field_class: str, values: Dict):
+        """Cache freshly fetched values and stage them for the shared cross-replica cache"""
+        stock_info_cache.set((symbol, field_class), values, field_class_ttl(field_class))
+        shared_market_cache.queue_snapshot(symbol, field_class, values)
+
+    @staticmethod
+    async def load_shared_snapshots(symbols: List[str], min_remaining: float = 0.0):
+        """Fill the in-process cache from the shared cache in one query.
+
+        Symbols with any field class expiring within ``min_remaining`` seconds are
+        looked up, and a shared entry replaces the local one when it lives longer.
+        """
+        if not shared_market_cache.enabled:
+            return
+
+        def remaining(symbol: str, field_class: str) -> float:
+            left = stock_info_cache.expires_in((symbol, field_class))
+            return left if left is not None else 0.0
+
+        wanted = [
+            symbol for symbol in dict.fromkeys(symbols)
+            if any(remaining(symbol, field_class) <= min_remaining for field_class in FIELD_CLASSES)
+        ]
+        snapshots = await shared_market_cache.read_snapshots(wanted, list(FIELD_CLASSES))
+
+        now = time.time()
+        for (symbol, field_class), (values, fetched_at) in snapshots.items():
+            ttl = field_class_ttl(field_class) - (now - fetched_at)
+            if ttl > remaining(symbol, field_class):
+                stock_info_cache.set((symbol, field_class), values, ttl)
+
+    @staticmethod
+    async def _load_stock_info(symbol: str) -> Dict:
+        """Serve stock info from the cache, fetching only the field classes that expired"""
+        cached = {
+            field_class: stock_info_cache.get((symbol, field_class))
+            for field_class in FIELD_CLASSES
+        }
+
+        provider = get_market_data_provider()
+
+        if cached["profile"] is None or cached["fundamentals"] is None:
+            info = await stock_info_flights.do(
+                (symbol, "info"), lambda: provider.get_stock_info(symbol)
+            )
+            StockDataService._store_stock_info(info)
+            return {**info, "available": True}
+
+        if cached["price"] is None:
+            # Only the price expired, so skip the much heavier full info fetch
+            price = await stock_info_flights.do(
+                (symbol, "price"), lambda: provider.get_latest_price(symbol)
+            )
+            cached["price"] = {"current_price": price}
+            StockDataService._store_field_class(symbol, "price", cached["price"])
+
+        merged: Dict[str, Any] = {}
+        for values in cached.values():
+            merged.update(values)
+        return {
+            "symbol": symbol,
+            **{field: merged[field] for field in STOCK_INFO_FIELDS},
+            "available": True,
+        }
+
+    @staticmethod
+    async def refresh_stock_info(symbol: str):
+        """Fetch every field class of ``symbol`` upstream and overwrite the cached copy"""
+        provider = get_market_data_provider()
+        info = await stock_info_flights.do(
+            (symbol, "info"), lambda: provider.get_stock_info(symbol)
+        )
+        StockDataService._store_stock_info(info)
+
+    @staticmethod
+    async def refresh_latest_prices(symbols: List[str]) -> int:
+        """Fetch latest prices for ``symbols`` in one bulk call; returns how many were refreshed"""
+        prices = await get_market_data_provider().get_latest_prices(symbols)
+        for symbol, price in prices.items():
+            StockDataService._store_field_class(symbol, "price", {"current_price": price})
+        return len(prices)
 
     @staticmethod
     async def get_stock_info(symbol: str) -> Optional[Dict]:
         """Fetch stock information for a given symbol"""
+        symbol_access.record([symbol])
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-
-            return {
-                "symbol": symbol,
-                "name": info.get("longName", symbol),
-                "sector": info.get("sector", "Unknown"),
-                "industry": info.get("industry", "Unknown"),
-                "market_cap": info.get("marketCap", 0),
-                "current_price": info.get("currentPrice", info.get("regularMarketPrice", 0)),
-                "52_week_high": info.get("fiftyTwoWeekHigh", 0),
-                "52_week_low": info.get("fiftyTwoWeekLow", 0),
-                "pe_ratio": info.get("trailingPE", 0),
-                "beta": info.get("beta", 1.0),
-                "dividend_yield": info.get("dividendYield", 0),
-            }
+            await StockDataService.load_shared_snapshots([symbol])
+            info = await StockDataService._load_stock_info(symbol)
+            shared_market_cache.flush()
+            return info
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out fetching stock info for {symbol}")
+            return None
         except Exception as e:
             logger.error(f"Error fetching stock info for {symbol}: {str(e)}")
             return None
 
     @staticmethod
     async def get_batch_stock_info(symbols: List[str]) -> List[Dict]:
-        """Fetch stock information for multiple symbols"""
-        results = []
+        """Fetch stock information for multiple symbols concurrently.
+
+        Results are returned in the same order as ``symbols``; symbols that fail or
+        time out are represented by a placeholder with ``available`` set to False.
+        """
+        symbol_access.record(symbols)
+        await StockDataService.load_shared_snapshots(symbols)
+        details = await gather_ordered(
+            StockDataService._load_stock_info,
+            symbols,
+            placeholder=StockDataService._unavailable_stock_info,
+            label=get_market_data_provider().name
+        )
+        shared_market_cache.flush()
+        return details
+
+    @staticmethod
+    def is_cached(symbols: List[str]) -> bool:
+        """True if stock info and price history for ``symbols`` need no upstream call"""
         for symbol in symbols:
-            info = await StockDataService.get_stock_info(symbol)
-            if info:
-                results.append(info)
-        return results
+            for field_class in FIELD_CLASSES:
+                left = stock_info_cache.expires_in((symbol, field_class))
+                if left is None or left <= 0:
+                    return False
+        return price_store.is_current(symbols)
 
     @staticmethod
-    def calculate_portfolio_volatility(symbols: List[str], weights: List[float], period: str = "1y") -> float:
-        """Calculate portfolio volatility based on historical data"""
-        try:
-            # Download historical data
-            data = yf.download(symbols, period=period, progress=False)['Close']
+    def cache_stats() -> Dict[str, Any]:
+        """Hit/miss/eviction counters for the stock info cache"""
+        return {
+            **stock_info_cache.stats(),
+            **stock_info_flights.stats(),
+        }
+
+    @staticmethod
+    async def get_returns_window(symbols: List[str], period: str = "1y") -> np.ndarray:
+        """Aligned daily returns matrix (days x symbols) from the local price store"""
+        await price_store.ensure_history(symbols)
+        _, returns = price_store.returns_window(symbols, period_to_days(period))
+        return returns
 
-            # Calculate returns
-            returns = data.pct_change().dropna()
+    @staticmethod
+    async def get_covered_returns_window(
+        symbols: List[str], period: str = "1y", min_coverage: float = settings.RISK_MIN_HISTORY_COVERAGE
+    ) -> Tuple[np.ndarray, List[int]]:
+        """Aligned daily returns for the symbols with enough history, and their positions.
 
-            # Calculate weighted volatility
-            if len(symbols) == 1:
-                return returns.std() * 100
+        Returns are aligned on dates common to all included symbols, so a symbol with
+        fewer bars than ``min_coverage`` of the longest history is left out rather
+        than cutting every other symbol's window short (or emptying it).
+        """
+        await price_store.ensure_history(symbols)
+        days = period_to_days(period)
+        lengths = price_store.window_lengths(symbols, days)
+        covered = [i for i, length in enumerate(lengths) if length > 0 and length >= min_coverage * lengths.max()]
+        _, returns = price_store.returns_window([symbols[i] for i in covered], days)
+        return returns, covered
 
-            # Portfolio variance calculation
-            cov_matrix = returns.cov()
-            portfolio_variance = 0
+    @staticmethod
+    async def get_history_lengths(symbols: List[str], period: str = "1y") -> np.ndarray:
+        """Trading days of stored history per symbol over the period"""
+        await price_store.ensure_history(symbols)
+        return price_store.window_lengths(symbols, period_to_days(period))
 
-            for i, symbol_i in enumerate(symbols):
-                for j, symbol_j in enumerate(symbols):
-                    portfolio_variance += weights[i] * weights[j] * cov_matrix.iloc[i, j]
+    @staticmethod
+    async def calculate_portfolio_volatility(symbols: List[str], weights: List[float], period: str = "1y") -> float:
+        """Calculate portfolio volatility based on historical data"""
+        try:
+            returns = await StockDataService.get_returns_window(symbols, period)
+            if len(returns) < 2:
+                raise ValueError(f"Not enough price history for {', '.join(symbols)}")
 
-            portfolio_volatility = (portfolio_variance ** 0.5) * 100
-            return portfolio_volatility
+            cov_matrix = risk_engine.covariance(returns)
+            portfolio_variance = risk_engine.portfolio_variance(cov_matrix, np.asarray(weights, dtype=float))
+            return float(portfolio_variance ** 0.5) * 100
 
         except Exception as e:
             logger.error(f"Error calculating portfolio volatility: {str(e)}")
@@ -0,0 +1,211 @@
+import csv
+import difflib
+import os
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (symbol, name, exchange)
+SymbolEntry = Tuple[str, str, str]
+
+# NASDAQ Trader symbol directory: every US-listed stock and ETF
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+OTHER_EXCHANGES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+
+# Sorts after every character that appears in a symbol or name
+_PREFIX_END = "\uffff"
+
+# Yahoo-style ticker: share classes (BRK-B), exchange suffixes (VOD.L, RY.TO),
+# crypto and FX pairs (BTC-USD, EURUSD=X) and indices (^GSPC)
+SYMBOL_PATTERN = re.compile(r"\^?[A-Z0-9]{1,10}([.\-][A-Z0-9]{1,10}){0,2}(=[A-Z])?")
+
+
+# Plain US ticker with an optional share class (BRK-B, ABR-PD): the universe lists them all
+US_SYMBOL_PATTERN = re.compile(r"[A-Z]{1,5}(-[A-Z]{1,2})?")
+
+
+def well_formed(symbol: str) -> bool:
+    """Whether ``symbol`` looks like a ticker, whether or not the universe lists it"""
+    return SYMBOL_PATTERN.fullmatch(symbol) is not None
+
+
+def us_style(symbol: str) -> bool:
+    """Whether ``symbol`` has the shape of a US listing the universe should contain"""
+    return US_SYMBOL_PATTERN.fullmatch(symbol) is not None
+
+
+class SymbolUniverse:
+    """Sorted, read-only index of known ticker symbols for validation and autocomplete.
+
+    Symbols and lowercased names are kept in sorted lists, so a prefix lookup is
+    two binary searches plus a slice. The index is replaced wholesale on load,
+    so readers never see a partly built one.
+    """
+
+    def __init__(self, path: str = settings.SYMBOL_UNIVERSE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Optional[Tuple[List[str], Dict[str, SymbolEntry], List[Tuple[str, str]]]] = None
+        self._loaded = False
+
+    @staticmethod
+    def write(path: str, entries: Iterable[SymbolEntry]):
+        """Write a universe file from ``(symbol, name, exchange)`` entries"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["symbol", "name", "exchange"])
+            writer.writerows(entries)
+
+    def replace(self, entries: Iterable[SymbolEntry]):
+        """Swap in a new index built from ``(symbol, name, exchange)`` entries"""
+        by_symbol: Dict[str, SymbolEntry] = {}
+        for symbol, name, exchange in entries:
+            symbol = symbol.upper().strip()
+            if symbol:
+                by_symbol[symbol] = (symbol, name.strip(), exchange.strip())
+        symbols = sorted(by_symbol)
+        names = sorted((name.lower(), symbol) for symbol, name, _ in by_symbol.values() if name)
+        self._index = (symbols, by_symbol, names)
+        self._loaded = True
+
+    def load(self, path: Optional[str] = None):
+        """Load the universe file; without one, the index stays disabled and accepts every symbol"""
+        path = path or self.path
+        with self._lock:
+            if not os.path.exists(path):
+                logger.warning(f"Symbol universe file {path} not found; symbols are not validated")
+                self._index = None
+                self._loaded = True
+                return
+            with open(path, newline="") as f:
+                rows = [
+                    (row["symbol"], row.get("name") or "", row.get("exchange") or "")
+                    for row in csv.DictReader(f)
+                ]
+            self.replace(rows)
+            self.path = path
+            logger.info(f"Loaded {len(rows)} symbols from {path}")
+
+    def _current(self):
+        if not self._loaded:
+            self.load()
+        return self._index
+
+    @property
+    def enabled(self) -> bool:
+        return self._current() is not None
+
+    def unknown(self, symbols: Iterable[str]) -> List[str]:
+        """Symbols missing from the universe, in order (none when the index is disabled)"""
+        index = self._current()
+        if index is None:
+            return []
+        return [symbol for symbol in dict.fromkeys(symbols) if symbol not in index[1]]
+
+    def check(self, symbols: Iterable[str]):
+        """Raise ValueError, with suggestions, for the first symbol missing from the universe.
+
+        Tickers of shapes the US listings cannot contain (exchange suffixes such as
+        VOD.L, crypto and FX pairs, indices) pass with a warning instead, unless
+        SYMBOL_UNIVERSE_STRICT is set. Nothing is checked while the index is disabled.
+        """
+        for symbol in self.unknown(symbols):
+            if well_formed(symbol) and not us_style(symbol) and not settings.SYMBOL_UNIVERSE_STRICT:
+                logger.warning(f"Symbol {symbol} is outside the symbol universe; accepting it unchecked")
+                continue
+            suggestions = self.similar(symbol)
+            hint = f"; did you mean {', '.join(suggestions)}?" if suggestions else ""
+            raise ValueError(f"Unknown symbol {symbol}{hint}")
+
+    def similar(self, symbol: str, limit: int = 3) -> List[str]:
+        """Likely intended symbols for a typo (APPL -> AAPL), else ones sharing its prefix"""
+        index = self._current()
+        if index is None:
+            return []
+        # Only runs on the rejection path, so a scan of the universe is affordable
+        matches = difflib.get_close_matches(symbol, index[0], n=limit, cutoff=0.7)
+        if not matches and len(symbol) > 1:
+            matches = [entry[0] for entry in self.search(symbol[:-1], limit=limit)]
+        return matches
+
+    def search(self, prefix: str, limit: int = settings.SYMBOL_SEARCH_MAX_RESULTS) -> List[SymbolEntry]:
+        """Symbols starting with ``prefix``, then symbols whose name starts with it"""
+        index = self._current()
+        if index is None or not prefix.strip():
+            return []
+        symbols, by_symbol, names = index
+
+        upper = prefix.upper().strip()
+        start = bisect_left(symbols, upper)
+        stop = bisect_left(symbols, upper + _PREFIX_END, start)
+        matches = symbols[start:min(stop, start + limit)]
+
+        if len(matches) < limit:
+            lower = prefix.lower().strip()
+            start = bisect_left(names, (lower,))
+            stop = bisect_left(names, (lower + _PREFIX_END,), start)
+            seen = set(matches)
+            for _, symbol in names[start:stop]:
+                if len(matches) >= limit:
+                    break
+                if symbol not in seen:
+                    seen.add(symbol)
+                    matches.append(symbol)
+
+        return [by_symbol[symbol] for symbol in matches]
+
+    def stats(self) -> Dict[str, int]:
+        index = self._current()
+        return {"size": len(index[0]) if index is not None else 0}
+
+
+symbol_universe = SymbolUniverse()
+
+
+def _yahoo_symbol(symbol: str) -> Optional[str]:
+    """Map a NASDAQ Trader symbol onto Yahoo's spelling: BRK.B -> BRK-B, ABR$D -> ABR-PD"""
+    if "$" in symbol:
+        base, _, series = symbol.partition("$")
+        symbol = f"{base}-P{series}"
+    symbol = symbol.replace(".", "-")
+    return symbol if symbol.replace("-", "").isalnum() else None
+
+
+def download_us_listings(path: str = settings.SYMBOL_UNIVERSE_FILE) -> int:
+    """Build the universe file from the NASDAQ Trader symbol directory; returns the symbol count"""
+    import httpx
+
+    entries: List[SymbolEntry] = []
+    for url, symbol_column, exchange_column in (
+        (NASDAQ_LISTED_URL, "Symbol", None),
+        (OTHER_LISTED_URL, "ACT Symbol", "Exchange"),
+    ):
+        response = httpx.get(url, timeout=30)
+        response.raise_for_status()
+        # Pipe-delimited with a trailing "File Creation Time" line
+        lines = [line for line in response.text.splitlines() if not line.startswith("File Creation Time")]
+        for row in csv.DictReader(lines, delimiter="|"):
+            if row.get("Test Issue") == "Y":
+                continue
+            symbol = _yahoo_symbol(row[symbol_column])
+            if symbol is None:
+                continue
+            exchange = row[exchange_column] if exchange_column else "NASDAQ"
+            entries.append((symbol, row["Security Name"], OTHER_EXCHANGES.get(exchange, exchange)))
+
+    SymbolUniverse.write(path, entries)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count = download_us_listings()
+    print(f"Wrote {count} symbols to {settings.SYMBOL_UNIVERSE_FILE}")
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.services.market_data import get_market_data_provider
+from app.services.portfolio_analyzer import get_portfolio_analyzer
+from app.services.shared_cache import schema, shared_market_cache
+from app.services.symbol_universe import symbol_universe
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """Loads heavy libraries and clients off the event loop so /health answers immediately.
+
+    The service reports ready only once every step has run; a failing step is logged
+    and left to load lazily on first use rather than holding the pod out of rotation.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def _steps(self) -> List[Tuple[str, Callable[[], Any]]]:
+        return [
+            ("market_data", lambda: get_market_data_provider().warm_up()),
+            ("analyzer", get_portfolio_analyzer),
+            ("symbol_universe", symbol_universe.load),
+            ("shared_cache", lambda: schema() if shared_market_cache.enabled else None),
+        ]
+
+    def _run_step(self, name: str, step: Callable[[], Any]):
+        start = time.perf_counter()
+        error = None
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {str(e)}")
+            error = str(e)
+        self.steps[name] = {
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error,
+        }
+
+    async def run(self):
+        """Run every warm-up step in a worker thread, then flip readiness"""
+        self.started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        for name, step in self._steps():
+            await loop.run_in_executor(None, self._run_step, name, step)
+        self.duration = time.perf_counter() - self.started_at
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.duration * 1000:.0f}ms")
+
+    def start(self):
+        """Start warm-up in the background, or go ready at once when it is disabled"""
+        if not settings.STARTUP_WARMUP:
+            self.ready = True
+            return
+        self._task = asyncio.ensure_future(self.run())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "steps": self.steps,
+        }
+
+
+warm_up = WarmUp()
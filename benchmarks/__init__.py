@@ -0,0 +1,4 @@
+"""Performance benchmarks for the Portfolio Analyzer API.
+
+Run with ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import types
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.portfolio import PortfolioRequest, StockHolding
+from app.services.market_data import FixtureProvider
+from app.services.symbol_universe import SymbolUniverse
+
+SECTORS = [
+    "Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Industrials",
+    "Energy", "Utilities", "Real Estate", "Communication Services", "Consumer Defensive",
+    "Basic Materials",
+]
+
+INSIGHT_TEXT = (
+    "This portfolio is a benchmark fixture. Its composition, risk profile and sector "
+    "exposure are synthetic and the insight text is fixed so runs are comparable."
+)
+
+
+def universe_symbols(size: int) -> List[str]:
+    return [f"SYM{i:04d}" for i in range(size)]
+
+
+def build_universe(directory: str, size: int, seed: int = 7, history_days: int = 800) -> List[str]:
+    """Write a deterministic fixture universe of ``size`` symbols and return the symbols"""
+    rng = np.random.default_rng(seed)
+    symbols = universe_symbols(size)
+
+    end = np.datetime64(date.today(), "D")
+    all_days = np.arange(end - np.timedelta64(history_days, "D"), end, dtype="datetime64[D]")
+    trading_days = all_days[np.is_busday(all_days)]
+
+    # One market factor plus idiosyncratic noise gives realistic correlations
+    market = rng.normal(0.0003, 0.01, len(trading_days))
+    betas = rng.uniform(0.5, 1.8, size)
+    noise = rng.normal(0, 0.012, (len(trading_days), size))
+    returns = market[:, None] * betas + noise
+    closes = 100 * np.cumprod(1 + returns, axis=0)
+
+    stock_info: Dict[str, Dict] = {}
+    for i, symbol in enumerate(symbols):
+        stock_info[symbol] = {
+            "name": f"{symbol} Corp",
+            "sector": SECTORS[i % len(SECTORS)],
+            "industry": "Synthetic",
+            "market_cap": float(rng.uniform(1e9, 1e12)),
+            "current_price": float(closes[-1, i]),
+            "52_week_high": float(closes[-252:, i].max()),
+            "52_week_low": float(closes[-252:, i].min()),
+            "pe_ratio": float(rng.uniform(8, 45)),
+            "beta": round(float(betas[i]), 3),
+            "dividend_yield": float(rng.uniform(0, 0.04)),
+        }
+
+    FixtureProvider.write(
+        directory,
+        stock_info,
+        {symbol: (trading_days, closes[:, i]) for i, symbol in enumerate(symbols)}
+    )
+    SymbolUniverse.write(
+        os.path.join(directory, "symbols.csv"),
+        ((symbol, stock_info[symbol]["name"], "FIXTURE") for symbol in symbols)
+    )
+    return symbols
+
+
+def make_portfolio(symbols: List[str], holdings: int, offset: int = 0) -> PortfolioRequest:
+    """Equal-weight portfolio of ``holdings`` symbols starting at ``offset`` in the universe"""
+    chosen = [symbols[(offset + i) % len(symbols)] for i in range(holdings)]
+    allocation = round(100 / holdings, 6)
+    return PortfolioRequest(
+        holdings=[StockHolding(symbol=symbol, allocation=allocation) for symbol in chosen]
+    )
+
+
+class StubLLMClient:
+    """Stands in for a LangChain chat model with a fixed response and injected latency.
+
+    With probability ``spike_rate`` a call takes ``spike_latency`` extra seconds,
+    to model a provider's latency tail.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        chunks: int = 20,
+        spike_rate: float = 0.0,
+        spike_latency: float = 0.0,
+        seed: int = 7
+    ):
+        self.latency = latency
+        self.chunks = chunks
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self._rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def _latency(self) -> float:
+        if self.spike_rate > 0 and self._rng.random() < self.spike_rate:
+            return self.latency + self.spike_latency
+        return self.latency
+
+    async def ainvoke(self, prompt: List[Tuple[str, Any]]):
+        self.calls += 1
+        latency = self._latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return types.SimpleNamespace(content=INSIGHT_TEXT)
+
+    async def astream(self, prompt: List[Tuple[str, Any]]):
+        self.calls += 1
+        latency = self._latency()
+        words = INSIGHT_TEXT.split(" ")
+        step = max(1, len(words) // self.chunks)
+        for i in range(0, len(words), step):
+            if latency > 0:
+                await asyncio.sleep(latency / self.chunks)
+            yield types.SimpleNamespace(content=" ".join(words[i:i + step]) + " ")
@@ -0,0 +1,396 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fixtures import StubLLMClient, build_universe, make_portfolio
+
+DEFAULT_SIZES = [5, 50, 500]
+DEFAULT_CONCURRENCY = [1, 8, 32]
+
+# Imports app.main, runs the startup warm-up and prints its status as JSON
+COLD_START_SCRIPT = """
+import asyncio, json, logging
+logging.disable(logging.CRITICAL)
+import app.main
+from app.services.warmup import warm_up
+asyncio.run(warm_up.run())
+print(json.dumps(warm_up.status()))
+"""
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process right now (falls back to the peak off Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Samples RSS in the background to find the peak during one scenario"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss_bytes())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._task = asyncio.ensure_future(self._sample())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = np.asarray(samples_ms)
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(float(ordered.mean()), 3),
+        "p50_ms": round(float(np.percentile(ordered, 50)), 3),
+        "p95_ms": round(float(np.percentile(ordered, 95)), 3),
+        "p99_ms": round(float(np.percentile(ordered, 99)), 3),
+        "max_ms": round(float(ordered.max()), 3),
+    }
+
+
+def reset_caches():
+    """Drop in-process caches so every scenario starts cold"""
+    from app.services.stock_data_service import stock_info_cache
+
+    stock_info_cache.clear()
+
+
+async def bench_analyze(
+    client: httpx.AsyncClient,
+    symbols: List[str],
+    holdings: int,
+    concurrency: int,
+    requests: int
+) -> Dict[str, Any]:
+    """Drive POST /analyze with ``concurrency`` workers until ``requests`` have completed"""
+    reset_caches()
+    bodies = [
+        make_portfolio(symbols, holdings, offset=i * 7).model_dump(mode="json")
+        for i in range(requests)
+    ]
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post("/api/v1/analyze", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "holdings": holdings,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        **summarize(latencies),
+    }
+
+
+def profile_cold_start(top: int = 10) -> Dict[str, Any]:
+    """Import-time profile of ``app.main`` plus warm-up timings, in a fresh interpreter"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", COLD_START_SCRIPT],
+        capture_output=True, text=True, cwd=project_root, check=True
+    )
+
+    # stderr lines look like "import time:  self [us] | cumulative | <indent>module"
+    cumulative_us: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        name = module.strip()
+        cumulative_us[name] = max(cumulative_us.get(name, 0), int(cumulative))
+
+    packages = sorted(
+        ((name, us) for name, us in cumulative_us.items() if "." not in name),
+        key=lambda item: item[1], reverse=True
+    )
+    return {
+        "import_app_main_ms": round(cumulative_us.get("app.main", 0) / 1000, 1),
+        "top_packages_ms": {name: round(us / 1000, 1) for name, us in packages[:top]},
+        "warm_up": json.loads(proc.stdout.strip().splitlines()[-1]),
+    }
+
+
+async def time_async(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def time_sync(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+async def bench_components(analyzer, symbols: List[str], sizes: List[int], repeat: int) -> List[Dict]:
+    """Time the hot-path building blocks on their own, per portfolio size"""
+    from app.services.stock_data_service import StockDataService
+
+    results = []
+    for holdings in sizes:
+        portfolio = make_portfolio(symbols, holdings)
+        tickers = [holding.symbol for holding in portfolio.holdings]
+        weights = [holding.allocation / 100 for holding in portfolio.holdings]
+
+        # Warm the price store and stock cache so only computation is measured
+        stock_details = await StockDataService.get_batch_stock_info(tickers)
+        await StockDataService.calculate_portfolio_volatility(tickers, weights)
+        parts = analyzer._analyze_holdings(portfolio, stock_details, None)
+
+        results.append({
+            "holdings": holdings,
+            "calculate_portfolio_volatility": await time_async(
+                lambda: StockDataService.calculate_portfolio_volatility(tickers, weights), repeat
+            ),
+            "calculate_sector_breakdown": time_sync(
+                lambda: analyzer._calculate_sector_breakdown(stock_details, portfolio.holdings),
+                repeat
+            ),
+            "build_analysis_prompt": time_sync(
+                lambda: analyzer.llm_service._build_analysis_prompt(
+                    parts["portfolio_summary"], parts["sector_breakdown"], parts["risk_metrics"],
+                    stock_details, portfolio.holdings
+                ),
+                repeat
+            ),
+        })
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="portfolio-bench-")
+    universe_size = max(max(args.sizes) * 2, 100)
+    symbols = build_universe(os.path.join(workdir, "fixtures"), universe_size, seed=args.seed)
+
+    cold_start = profile_cold_start()
+    print(
+        f"cold start import app.main={cold_start['import_app_main_ms']}ms "
+        f"warm-up={cold_start['warm_up']['duration_ms']}ms"
+    )
+
+    from app.main import app
+    from app.services.portfolio_analyzer import get_portfolio_analyzer
+    from app.services.market_data import FixtureProvider, set_market_data_provider
+    from app.services.price_store import price_store
+    from app.services.symbol_universe import symbol_universe
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    set_market_data_provider(
+        FixtureProvider(os.path.join(workdir, "fixtures"), latency=args.data_latency)
+    )
+    price_store.directory = os.path.join(workdir, "prices")
+    symbol_universe.load(os.path.join(workdir, "fixtures", "symbols.csv"))
+    analyzer = get_portfolio_analyzer()
+    llm_client = StubLLMClient(
+        latency=args.llm_latency, spike_rate=args.llm_spike_rate,
+        spike_latency=args.llm_spike_latency, seed=args.seed
+    )
+    if args.llm_hedge:
+        from app.services.llm_hedging import HedgedClient
+        # The secondary answers a little slower than the primary usually does, without its spikes
+        llm_client = HedgedClient(
+            llm_client, StubLLMClient(latency=args.llm_latency * 1.5), "stub-primary", "stub-secondary"
+        )
+    analyzer.llm_service.client = llm_client
+    analyzer.llm_service.insight_cache = None
+
+    scenarios = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        for holdings in args.sizes:
+            for concurrency in args.concurrency:
+                result = await bench_analyze(client, symbols, holdings, concurrency, args.requests)
+                scenarios.append(result)
+                print(
+                    f"analyze holdings={holdings:<4} concurrency={concurrency:<3} "
+                    f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+                    f"p99={result['p99_ms']:.1f}ms rps={result['throughput_rps']} "
+                    f"rss={result['peak_rss_mb']}MB errors={result['errors']}"
+                )
+
+    hedging = analyzer.llm_service.hedge_stats()
+    if hedging is not None:
+        print(
+            f"llm hedging calls={hedging['calls']} hedged={hedging['hedged']} "
+            f"wins={hedging['wins']} delay={hedging['hedge_delay']['invoke']}s"
+        )
+
+    components = await bench_components(analyzer, symbols, args.sizes, args.repeat)
+    for component in components:
+        print(
+            f"components holdings={component['holdings']:<4} "
+            f"volatility p50={component['calculate_portfolio_volatility']['p50_ms']:.3f}ms "
+            f"sectors p50={component['calculate_sector_breakdown']['p50_ms']:.3f}ms "
+            f"prompt p50={component['build_analysis_prompt']['p50_ms']:.3f}ms"
+        )
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "sizes": args.sizes,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "repeat": args.repeat,
+            "data_latency": args.data_latency,
+            "llm_latency": args.llm_latency,
+            "llm_spike_rate": args.llm_spike_rate,
+            "llm_spike_latency": args.llm_spike_latency,
+            "llm_hedge": args.llm_hedge,
+            "seed": args.seed,
+        },
+        "cold_start": cold_start,
+        "analyze": scenarios,
+        "llm_hedging": hedging,
+        "components": components,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe p95 regressions larger than ``threshold`` (fractional) against a baseline run"""
+    regressions = []
+
+    old_import = baseline.get("cold_start", {}).get("import_app_main_ms")
+    new_import = current["cold_start"]["import_app_main_ms"]
+    if old_import and new_import > old_import * (1 + threshold):
+        regressions.append(f"import app.main: {old_import}ms -> {new_import}ms")
+
+    previous = {(s["holdings"], s["concurrency"]): s for s in baseline.get("analyze", [])}
+    for scenario in current["analyze"]:
+        old = previous.get((scenario["holdings"], scenario["concurrency"]))
+        if old and scenario["p95_ms"] > old["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"analyze holdings={scenario['holdings']} concurrency={scenario['concurrency']}: "
+                f"p95 {old['p95_ms']}ms -> {scenario['p95_ms']}ms"
+            )
+
+    previous = {c["holdings"]: c for c in baseline.get("components", [])}
+    for component in current["components"]:
+        old = previous.get(component["holdings"])
+        if not old:
+            continue
+        for name, stats in component.items():
+            if name == "holdings" or name not in old:
+                continue
+            if stats["p95_ms"] > old[name]["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name} holdings={component['holdings']}: "
+                    f"p95 {old[name]['p95_ms']}ms -> {stats['p95_ms']}ms"
+                )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark /api/v1/analyze in-process against stubbed market data and LLM"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Portfolio sizes (holdings) to benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY,
+                        help="Concurrent client counts to benchmark")
+    parser.add_argument("--requests", type=int, default=64,
+                        help="Requests per scenario")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="Repetitions per component micro-benchmark")
+    parser.add_argument("--data-latency", type=float, default=0.02,
+                        help="Injected latency per market data call (seconds)")
+    parser.add_argument("--llm-latency", type=float, default=0.2,
+                        help="Injected latency per LLM call (seconds)")
+    parser.add_argument("--llm-spike-rate", type=float, default=0.0,
+                        help="Fraction of LLM calls that take --llm-spike-latency longer")
+    parser.add_argument("--llm-spike-latency", type=float, default=0.0,
+                        help="Extra latency of a spiking LLM call (seconds)")
+    parser.add_argument("--llm-hedge", action="store_true",
+                        help="Hedge the stub LLM with a second stub provider")
+    parser.add_argument("--seed", type=int, default=7,
+                        help="Seed for the synthetic market data")
+    parser.add_argument("--output", default=None,
+                        help="Where to write the JSON results (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None,
+                        help="Baseline results JSON to check for p95 regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Fractional p95 slowdown that counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results",
+        f"{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No p95 regressions beyond {args.threshold:.0%} against {args.compare}")